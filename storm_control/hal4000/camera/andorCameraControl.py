@@ -39,10 +39,9 @@ class AndorCameraControl(cameraControl.HWCameraControl):
         self.camera_functionality.setEMCCDGain = self.setEMCCDGain
         self.camera_functionality.toggleShutter = self.toggleShutter
 
-        # Load Andor DLL & get the camera.
-        andor.loadAndorDLL(os.path.join(config.get("andor_path"), config.get("andor_dll")))
-        handle = andor.getCameraHandles()[config.get("camera_id")]
-        self.camera = andor.AndorCamera(config.get("andor_path"), handle)
+        # Load Andor DLL & get the camera, if this wasn't done already.
+        if self.camera is None:
+            self.camera = self.openCamera(config)
 
         # Dictionary of Andor camera properties we'll support.
         self.andor_props = {"adchannel" : True,
@@ -365,6 +364,15 @@ class AndorCameraControl(cameraControl.HWCameraControl):
 
             self.camera_functionality.parametersChanged.emit()
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Load Andor DLL & get the camera.
+        """
+        andor.loadAndorDLL(os.path.join(config.get("andor_path"), config.get("andor_dll")))
+        handle = andor.getCameraHandles()[config.get("camera_id")]
+        return andor.AndorCamera(config.get("andor_path"), handle)
+
     def openShutter(self):
         super().openShutter()
         if self.camera_working:
@@ -36,9 +36,9 @@ class AndorSDK3CameraControl(cameraControl.HWCameraControl):
                                                                             is_master = is_master,
                                                                             parameters = self.parameters)
         
-        # Load the library and start the camera.
-        andor.loadSDK3DLL(config.get("andor_sdk"))
-        self.camera = andor.SDK3Camera(config.get("camera_id"))
+        # Load the library and start the camera, if this wasn't done already.
+        if self.camera is None:
+            self.camera = self.openCamera(config)
 
         # Dictionary of the Andor settings we'll use and their types.
         #
@@ -233,6 +233,14 @@ class AndorSDK3CameraControl(cameraControl.HWCameraControl):
 
             self.camera_functionality.parametersChanged.emit()
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Load the library and start the camera.
+        """
+        andor.loadSDK3DLL(config.get("andor_sdk"))
+        return andor.SDK3Camera(config.get("camera_id"))
+
     def startFilm(self, film_settings, is_time_base):
         super().startFilm(film_settings, is_time_base)
         if self.camera_working and self.film_length is not None:
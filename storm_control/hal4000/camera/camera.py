@@ -20,6 +20,7 @@ Hazen 02/17
 """
 
 import importlib
+import threading
 
 from PyQt5 import QtCore
 
@@ -32,11 +33,16 @@ import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
 
 
+# Cameras that use the same camera control class are opened one at
+# a time, as the driver libraries are not necessarily thread safe.
+driver_locks = {}
+
+
 class Camera(halModule.HalModule):
     """
     Controller for a single camera.
     """
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
         self.film_settings = None
         self.is_master = None
@@ -44,7 +50,8 @@ class Camera(halModule.HalModule):
         camera_params = module_params.get("camera")
         a_module = importlib.import_module(camera_params.get("module_name"))
         a_class = getattr(a_module, camera_params.get("class_name"))
-        self.camera_control = a_class(camera_name = self.module_name,
+        self.camera_control = a_class(camera = hardware,
+                                      camera_name = self.module_name,
                                       config = camera_params.get("parameters"),
                                       is_master = camera_params.get("master"))
 
@@ -54,6 +61,17 @@ class Camera(halModule.HalModule):
         self.camera_control.cleanUp()
         super().cleanUp(qt_settings)
 
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Open the camera, see cameraControl.CameraControl.openCamera().
+        """
+        camera_params = module_params.get("camera")
+        a_module = importlib.import_module(camera_params.get("module_name"))
+        a_class = getattr(a_module, camera_params.get("class_name"))
+        with driver_locks.setdefault(a_class, threading.Lock()):
+            return a_class.openCamera(camera_params.get("parameters"))
+
     def processMessage(self, message):
 
         if message.isType("configuration"):
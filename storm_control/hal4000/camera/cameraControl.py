@@ -25,15 +25,16 @@ class CameraException(halExceptions.HardwareException):
 class CameraControl(QtCore.QThread):
     newData = QtCore.pyqtSignal(object)
 
-    def __init__(self, camera_name = None, config = None, **kwds):
+    def __init__(self, camera = None, camera_name = None, config = None, **kwds):
         """
+        camera - The camera from openCamera(), if it was already opened.
         camera_name - This is the name of this camera's section in the config XML file.        
         config - These are the values in the parameters section as a StormXMLObject().
         """
         super().__init__(**kwds)
 
         # This is the hardware module that will actually control the camera.
-        self.camera = None
+        self.camera = camera
 
         # Sub-classes should set this to a CameraFunctionality object.
         self.camera_functionality = None
@@ -50,6 +51,10 @@ class CameraControl(QtCore.QThread):
         # The current frame number, this gets reset by startCamera().
         self.frame_number = 0
 
+        # Preallocated frame buffers, see getFramePool().
+        self.frame_pool = None
+        self.frame_pool_size = config.get("frame_pool_size", 16)
+
         # The camera parameters.
         self.parameters = params.StormXMLObject()
 
@@ -223,6 +228,19 @@ class CameraControl(QtCore.QThread):
             raise CameraException(msg)
         return self.camera_functionality
 
+    def getFramePool(self):
+        """
+        Returns a frame buffer pool that matches the current frame size,
+        or None if frame pooling is disabled ('frame_pool_size' is 0).
+        """
+        if (self.frame_pool_size <= 0):
+            return None
+        n_pixels = int(self.parameters.get("bytes_per_frame")/2)
+        if (self.frame_pool is None) or (self.frame_pool.n_pixels != n_pixels):
+            self.frame_pool = frame.FramePool(n_buffers = self.frame_pool_size,
+                                              n_pixels = n_pixels)
+        return self.frame_pool
+
     def getParameters(self):
         return self.parameters
 
@@ -242,6 +260,10 @@ class CameraControl(QtCore.QThread):
         """
         Data from the camera should go through this method on it's
         way to the camera functionality object.
+
+        The camera's reference to each frame is released once the
+        newFrame signal has been handled, consumers that keep the
+        frame will have called frame.retain().
         """
         for frame in frames:
             if self.film_length is not None:
@@ -253,6 +275,9 @@ class CameraControl(QtCore.QThread):
                 
             self.camera_functionality.newFrame.emit(frame)
 
+        for frame in frames:
+            frame.release()
+
     def newParameters(self, parameters):
         """
         Notes: (1) The parameters that the camera receives are already
@@ -298,6 +323,18 @@ class CameraControl(QtCore.QThread):
         self.parameters.setv("extension", parameters.get("extension"))
         self.parameters.setv("saved", parameters.get("saved"))
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Override this to load the camera library and open the camera.
+        camera.Camera calls this from its initializeHardware() method,
+        so it runs in a thread pool thread and must not create any Qt
+        objects.
+
+        The return value is passed to the constructor as 'camera'.
+        """
+        return None
+
     def openShutter(self):
         """
         Open the shutter.
@@ -374,11 +411,22 @@ class HWCameraControl(CameraControl):
         #
         self.camera_mutex = QtCore.QMutex()
 
+        # How long to wait for new frames. Drivers that don't have a
+        # waitForFrames() method are polled at poll_interval instead.
+        self.poll_interval = 5
+        self.wait_timeout = 100
+
     def cleanUp(self):
         super().cleanUp()
         self.camera.shutdown()
 
     def run(self):
+
+        # Drivers that support it copy frames into our buffer pool
+        # instead of allocating a new buffer for each frame.
+        if hasattr(self.camera, "setFramePool"):
+            self.camera.setFramePool(self.getFramePool())
+
         #
         # Note: The order is important here, we need to start the camera and
         #       only then set self.running. Otherwise HAL might think the
@@ -387,24 +435,37 @@ class HWCameraControl(CameraControl):
         self.camera.startAcquisition()
         self.running = True
         self.thread_started = True
+        have_frames = True
         while(self.running):
 
+            # If the last call returned frames there might already be more,
+            # so we only wait if it did not.
+            if not have_frames:
+                self.waitForFrames()
+
             # Get data from camera and create frame objects.
             self.camera_mutex.lock()
             [frames, frame_size] = self.camera.getFrames()
             self.camera_mutex.unlock()
+            timestamp = time.perf_counter()
 
             # Check if we got new frame data.
-            if (len(frames) > 0):
+            have_frames = (len(frames) > 0)
+            if have_frames:
 
                 # Create frame objects.
                 frame_data = []
                 for cam_frame in frames:
+                    pool_buffer = None
+                    if isinstance(cam_frame, frame.PoolBuffer):
+                        pool_buffer = cam_frame
                     aframe = frame.Frame(cam_frame.getData(),
                                          self.frame_number,
                                          frame_size[0],
                                          frame_size[1],
-                                         self.camera_name)
+                                         self.camera_name,
+                                         pool_buffer = pool_buffer,
+                                         timestamp = timestamp)
                     frame_data.append(aframe)
                     self.frame_number += 1
 
@@ -414,9 +475,19 @@ class HWCameraControl(CameraControl):
                             
                 # Emit new data signal.
                 self.newData.emit(frame_data)
-            self.msleep(5)
 
         self.camera.stopAcquisition()
+
+    def waitForFrames(self):
+        """
+        Block until the camera (probably) has new frames, or the wait
+        times out. This uses the drivers waitForFrames() method if it has
+        one, otherwise we just sleep for a bit.
+        """
+        if hasattr(self.camera, "waitForFrames"):
+            self.camera.waitForFrames(self.wait_timeout)
+        else:
+            self.msleep(self.poll_interval)
             
 #    def startCamera(self):
 #        print(">start", self.camera_name, self.running)
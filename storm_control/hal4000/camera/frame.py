@@ -6,17 +6,149 @@ or the data from a feed and it's meta-information.
 Notes: 
  (1) The numpy data field (np_data) is expected to
      be of type numpy.uint16.
+
+ (2) Frames can be backed by a buffer from a FramePool. In
+     this case the buffer is re-used once all the consumers
+     that called retain() have also called release(). Any
+     consumer that keeps a frame (or it's data) after it's
+     newFrame slot returns must retain() it.
+
+ (3) Frames are time stamped (time.perf_counter()) when they
+     are received from the camera, this is used to measure
+     how long it takes for them to be displayed / saved.
  
 Hazen 3/17
 """
+import collections
+import numpy
+import time
+
+from PyQt5 import QtCore
+
+
+class FramePool(object):
+    """
+    A fixed number of preallocated frame buffers with reference
+    counting, so that cameras don't have to allocate (and the
+    garbage collector free) a new buffer for every frame.
+
+    If all the buffers are in use acquire() returns None and the
+    camera should fall back to allocating a buffer. This way a slow
+    consumer never stalls the camera.
+    """
+    def __init__(self, n_buffers = 16, n_pixels = 0, **kwds):
+        super().__init__(**kwds)
+        self.buffers = []
+        self.counts = [0] * n_buffers
+        self.data = numpy.zeros((n_buffers, n_pixels), dtype = numpy.uint16)
+        self.free = collections.deque(range(n_buffers))
+        self.misses = 0
+        self.mutex = QtCore.QMutex()
+        self.n_pixels = n_pixels
+
+        for i in range(n_buffers):
+            self.buffers.append(PoolBuffer(index = i,
+                                           np_data = self.data[i],
+                                           pool = self))
+
+    def acquire(self):
+        """
+        Returns a PoolBuffer with a reference count of 1, or None
+        if all of the buffers are in use.
+        """
+        self.mutex.lock()
+        if (len(self.free) == 0):
+            self.misses += 1
+            self.mutex.unlock()
+            return None
+        index = self.free.popleft()
+        self.counts[index] = 1
+        self.mutex.unlock()
+        return self.buffers[index]
+
+    def decRef(self, index):
+        self.mutex.lock()
+        self.counts[index] -= 1
+        assert (self.counts[index] >= 0), "Frame buffer " + str(index) + " released too many times."
+        if (self.counts[index] == 0):
+            self.free.append(index)
+        self.mutex.unlock()
+
+    def getNumberFree(self):
+        self.mutex.lock()
+        n_free = len(self.free)
+        self.mutex.unlock()
+        return n_free
+
+    def incRef(self, index):
+        self.mutex.lock()
+        assert (self.counts[index] > 0), "Frame buffer " + str(index) + " is not in use."
+        self.counts[index] += 1
+        self.mutex.unlock()
+
+
+class LatencyCounter(object):
+    """
+    Accumulates (frame) latencies, in seconds.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.reset()
+
+    def add(self, latency):
+        self.count += 1
+        self.total += latency
+        if (latency > self.max_latency):
+            self.max_latency = latency
+
+    def getMaxMs(self):
+        return 1000.0 * self.max_latency
+
+    def getMeanMs(self):
+        if (self.count == 0):
+            return 0.0
+        return 1000.0 * self.total/self.count
+
+    def reset(self):
+        self.count = 0
+        self.max_latency = 0.0
+        self.total = 0.0
+
+
+class PoolBuffer(object):
+    """
+    A single buffer from a FramePool. This has the same getData()
+    and getDataPtr() methods as the camera driver data objects so
+    drivers can copy frames directly into it.
+    """
+    __slots__ = ["index", "np_data", "pool"]
+
+    def __init__(self, index = None, np_data = None, pool = None):
+        self.index = index
+        self.np_data = np_data
+        self.pool = pool
+
+    def getData(self):
+        return self.np_data
+
+    def getDataPtr(self):
+        return self.np_data.ctypes.data
+
+    def release(self):
+        self.pool.decRef(self.index)
+
+    def retain(self):
+        self.pool.incRef(self.index)
+
 
 class Frame(object):
     """
     Class for the storage of a single frame of camera data
     and it's meta-information.
     """
+    __slots__ = ["image_x", "image_y", "np_data", "frame_number", "pool_buffer", "timestamp", "which_camera"]
 
-    def __init__(self, np_data, frame_number, image_x, image_y, which_camera):
+    def __init__(self, np_data, frame_number, image_x, image_y, which_camera, pool_buffer = None, timestamp = None):
         """
         Create a camera frame object.
         FIXME: Are we consistent in the use of master vs. camera1?
@@ -25,12 +157,18 @@ class Frame(object):
         frame_number - The frame number of this frame.
         image_x - The size of the frame in pixels in x.
         image_y - The size of the frame in pixels in y.
+        pool_buffer - The PoolBuffer that np_data is a view of (if any).
+        timestamp - When the frame was received from the camera, defaults to now.
         """
+        if timestamp is None:
+            timestamp = time.perf_counter()
 
         self.image_x = image_x
         self.image_y = image_y
         self.np_data = np_data
         self.frame_number = frame_number
+        self.pool_buffer = pool_buffer
+        self.timestamp = timestamp
         self.which_camera = which_camera
 
     def getData(self):
@@ -46,6 +184,20 @@ class Frame(object):
         """
         return self.np_data.ctypes.data
 
+    def release(self):
+        """
+        Release a reference to the frame buffer (if pooled).
+        """
+        if self.pool_buffer is not None:
+            self.pool_buffer.release()
+
+    def retain(self):
+        """
+        Hold on to the frame buffer (if pooled) until release() is called.
+        """
+        if self.pool_buffer is not None:
+            self.pool_buffer.retain()
+
 
 #
 # The MIT License
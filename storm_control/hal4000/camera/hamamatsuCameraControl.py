@@ -26,8 +26,9 @@ class HamamatsuCameraControl(cameraControl.HWCameraControl):
                                                                             is_master = is_master,
                                                                             parameters = self.parameters)
 
-        # Load the library and start the camera.
-        self.camera = hcam.HamamatsuCameraMR(camera_id = config.get("camera_id"))
+        # Load the library and start the camera, if this wasn't done already.
+        if self.camera is None:
+            self.camera = self.openCamera(config)
 
         # Dictionary of the Hamamatsu camera properties we'll support.
         self.hcam_props = {"binning" : True,
@@ -194,6 +195,13 @@ class HamamatsuCameraControl(cameraControl.HWCameraControl):
                 
             self.camera_functionality.parametersChanged.emit()
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Load the library and start the camera.
+        """
+        return hcam.HamamatsuCameraMR(camera_id = config.get("camera_id"))
+
     def startFilm(self, film_settings, is_time_base):
         super().startFilm(film_settings, is_time_base)
         if self.camera_working:
@@ -17,8 +17,20 @@ import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
 import storm_control.hal4000.camera.frame as frame
 
 
+def createFakeFrame(size_x, size_y):
+    """
+    Returns the (flattened) test pattern used by the emulated camera.
+    """
+    x = numpy.arange(size_x) % 128
+    y = numpy.arange(size_y) % 128
+    return (y[:,None] + x[None,:]).astype(numpy.uint16).reshape(-1)
+
+
 class NoneCameraControl(cameraControl.CameraControl):
 
+    # The shortest exposure time (in seconds) that we will emulate.
+    min_exposure_time = 0.010
+
     def __init__(self, config = None, is_master = False, **kwds):
         kwds["config"] = config
         super().__init__(**kwds)
@@ -27,6 +39,11 @@ class NoneCameraControl(cameraControl.CameraControl):
         self.fake_frame_size = [0,0]
         self.pause_time = config.get("mean_pause", 0.1)
 
+        # These are used to time the frames, and to wake the camera
+        # thread up when the camera is stopped.
+        self.stop_condition = QtCore.QWaitCondition()
+        self.stop_mutex = QtCore.QMutex()
+
         #
         # The camera functionality. Note the connection to self.parameters
         # which should not be changed to point to some other parameters
@@ -94,6 +111,10 @@ class NoneCameraControl(cameraControl.CameraControl):
 
         self.newParameters(self.parameters, initialization = True)
 
+    def cleanUp(self):
+        self.stopCamera()
+        super().cleanUp()
+
     def newParameters(self, parameters, initialization = False):
         size_x = parameters.get("x_end") - parameters.get("x_start") + 1
         size_y = parameters.get("y_end") - parameters.get("y_start") + 1
@@ -126,36 +147,55 @@ class NoneCameraControl(cameraControl.CameraControl):
 
             # Configure camera.
             p = self.parameters
-            if (p.get("exposure_time") < 0.010):
-                p.set("exposure_time", 0.010)
+            if (p.get("exposure_time") < self.min_exposure_time):
+                p.set("exposure_time", self.min_exposure_time)
 
             p.set("fps", 1.0/p.get("exposure_time"))
 
             self.fake_frame_size = [size_x, size_y]
-            self.fake_frame = numpy.zeros(size_x * size_y, dtype = numpy.uint16)
-            for i in range(size_x):
-                for j in range(size_y):
-                    self.fake_frame[j*size_x+i] = i % 128 + j % 128
+            self.newFakeFrames(size_x, size_y)
 
             if running:
                 self.startCamera()
 
             self.camera_functionality.parametersChanged.emit()
         
+    def newFakeFrames(self, size_x, size_y):
+        """
+        Create the fake frame data for the current frame size.
+        """
+        self.fake_frame = createFakeFrame(size_x, size_y)
+
     def run(self):
         
         # Pause a random amount of time on start. 
         time.sleep(random.expovariate(1.0/self.pause_time))
         
+        frame_pool = self.getFramePool()
         self.running = True
         self.thread_started = True
+        next_time = time.perf_counter()
         while(self.running):
-            aframe = frame.Frame(numpy.roll(self.fake_frame,
-                                            int(self.frame_number * self.parameters.get("roll"))),
+            shift = int(self.frame_number * self.parameters.get("roll"))
+            pool_buffer = None
+            if frame_pool is not None:
+                pool_buffer = frame_pool.acquire()
+
+            # Roll the fake frame directly into the pool buffer.
+            if pool_buffer is not None:
+                np_data = pool_buffer.getData()
+                shift = shift % np_data.size
+                np_data[shift:] = self.fake_frame[:np_data.size - shift]
+                np_data[:shift] = self.fake_frame[np_data.size - shift:]
+            else:
+                np_data = numpy.roll(self.fake_frame, shift)
+
+            aframe = frame.Frame(np_data,
                                  self.frame_number,
                                  self.fake_frame_size[0],
                                  self.fake_frame_size[1],
-                                 self.camera_name)
+                                 self.camera_name,
+                                 pool_buffer = pool_buffer)
             self.frame_number += 1
 
             if self.film_length is not None:
@@ -165,13 +205,40 @@ class NoneCameraControl(cameraControl.CameraControl):
             # Emit new data signal.
             self.newData.emit([aframe])
 
-            # Sleep if we're still running.
-            if self.running:
-                self.msleep(int(1000.0 * self.parameters.get("exposure_time")))
+            # Wait until it is time for the next frame. If we've fallen
+            # behind we start over rather than trying to catch up.
+            exposure_time = self.parameters.get("exposure_time")
+            next_time += exposure_time
+            if (next_time < (time.perf_counter() - exposure_time)):
+                next_time = time.perf_counter()
+            self.waitUntil(next_time)
 
         # Also pause on stop.
         #time.sleep(random.expovariate(1.0/self.pause_time))
 
+    def stopCamera(self):
+        """
+        Wake the camera thread up so that we don't have to wait
+        for the current 'exposure' to finish.
+        """
+        if self.running:
+            self.stop_mutex.lock()
+            self.running = False
+            self.stop_condition.wakeAll()
+            self.stop_mutex.unlock()
+            self.wait()
+
+    def waitUntil(self, deadline):
+        """
+        This is the emulated camera's 'frame ready' event. It blocks until
+        deadline (a time.perf_counter() value), or until the camera is stopped.
+        """
+        self.stop_mutex.lock()
+        wait_ms = int(1000.0 * (deadline - time.perf_counter()))
+        if self.running and (wait_ms > 0):
+            self.stop_condition.wait(self.stop_mutex, wait_ms)
+        self.stop_mutex.unlock()
+
 #
 # The MIT License
 #
@@ -30,18 +30,10 @@ class PhotometricsCameraControl(cameraControl.HWCameraControl):
         super().__init__(**kwds)
         self.is_master = is_master
 
-        # Load the library and start the camera.
+        # Load the library and start the camera, if this wasn't done already.
         #
-        pvcam.loadPVCAMDLL(config.get("pvcam_sdk"))
-        pvcam.initPVCAM()
-
-        names = pvcam.getCameraNames()
-        if not config.get("camera_name") in names:
-            msg = "Camera " + config.get("camera_name") + " is not available. "
-            msg += "Available cameras are " + ",".join(str(names)) + "."
-            raise halExceptions.HardwareException(msg)
-            
-        self.camera = pvcam.PVCAMCamera(camera_name = config.get("camera_name"))
+        if self.camera is None:
+            self.camera = self.openCamera(config)
         
         # Create the camera functionality.
         #
@@ -170,6 +162,22 @@ class PhotometricsCameraControl(cameraControl.HWCameraControl):
                 
             self.camera_functionality.parametersChanged.emit()
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Load the library and start the camera.
+        """
+        pvcam.loadPVCAMDLL(config.get("pvcam_sdk"))
+        pvcam.initPVCAM()
+
+        names = pvcam.getCameraNames()
+        if not config.get("camera_name") in names:
+            msg = "Camera " + config.get("camera_name") + " is not available. "
+            msg += "Available cameras are " + ",".join(str(names)) + "."
+            raise halExceptions.HardwareException(msg)
+            
+        return pvcam.PVCAMCamera(camera_name = config.get("camera_name"))
+
     # FIXME: For short films we should configure for fixed length acquisition.
     #
     def startFilm(self, film_settings, is_time_base):
@@ -29,11 +29,9 @@ class PointGreyCameraControl(cameraControl.HWCameraControl):
                                                                             is_master = self.is_master,
                                                                             parameters = self.parameters)
 
-        # Initialize library.
-        spinnaker.pySpinInitialize(verbose = False)
-
-        # Get the camera & set some defaults.
-        self.camera = spinnaker.getCamera(config.get("camera_id"))
+        # Initialize library & get the camera, if this wasn't done already.
+        if self.camera is None:
+            self.camera = self.openCamera(config)
           
         # Set FLIR-specific camera properties to control relationship between
         # exposure time and frame rate: This dictionary will allow extension in the future if needed
@@ -329,6 +327,14 @@ class PointGreyCameraControl(cameraControl.HWCameraControl):
                 
             self.camera_functionality.parametersChanged.emit()
 
+    @classmethod
+    def openCamera(cls, config):
+        """
+        Initialize library & get the camera.
+        """
+        spinnaker.pySpinInitialize(verbose = False)
+        return spinnaker.getCamera(config.get("camera_id"))
+
     def startCamera(self):
         #
         # Start the camera, then change the source for the line. There
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+A faster emulated camera for throughput and soak testing. This
+can emulate a large sCMOS camera running at 100+ frames per second.
+
+Unlike the none camera the frames are not created on the fly, instead
+a bank of frames is rendered when the camera parameters change. These
+frames contain (moving) Gaussian emitters on a constant background
+with Poisson noise, and are the same for the same random seed.
+
+Camera specific config options (all optional):
+  bank_size - The number of pre-rendered frames (default 16).
+  burst_frames - The number of frames per newData signal (default 1).
+  chip_size - The size of the (square) chip in pixels (default 2048).
+  emitters - The number of emitters (default 200).
+  emitter_intensity - Photons per emitter (default 2000.0).
+  seed - Random number generator seed (default 0).
+"""
+import math
+import numpy
+import time
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+
+
+def renderFrameBank(size_x, size_y, n_frames = 16, n_emitters = 200, intensity = 2000.0,
+                    background = 100.0, sigma = 1.5, velocity = 0.5, seed = 0):
+    """
+    Returns a (n_frames, size_x * size_y) numpy.uint16 array of frames.
+
+    The emitters move in straight lines at (on average) velocity pixels
+    per frame, wrapping around at the edges of the frame.
+    """
+    rng = numpy.random.default_rng(seed)
+    frame_size = numpy.array([size_x, size_y])
+    start = rng.uniform(size = (n_emitters, 2)) * frame_size
+    step = rng.normal(size = (n_emitters, 2)) * velocity
+
+    # Each emitter is drawn in a small box around it's center.
+    r = int(math.ceil(3.0 * sigma))
+    offsets = numpy.arange(-r, r + 1)
+    norm = intensity/(2.0 * math.pi * sigma * sigma)
+
+    bank = numpy.zeros((n_frames, size_y * size_x), dtype = numpy.uint16)
+    for i in range(n_frames):
+        pos = numpy.mod(start + i * step, frame_size)
+        xx = numpy.floor(pos[:,0]).astype(int)[:,None,None] + offsets[None,None,:]
+        yy = numpy.floor(pos[:,1]).astype(int)[:,None,None] + offsets[None,:,None]
+        [xx, yy] = numpy.broadcast_arrays(xx, yy)
+
+        dx = xx - pos[:,0,None,None]
+        dy = yy - pos[:,1,None,None]
+        values = norm * numpy.exp(-(dx*dx + dy*dy)/(2.0 * sigma * sigma))
+        mask = (xx >= 0) & (xx < size_x) & (yy >= 0) & (yy < size_y)
+
+        image = numpy.full((size_y, size_x), background)
+        numpy.add.at(image, (yy[mask], xx[mask]), values[mask])
+        bank[i] = numpy.clip(rng.poisson(image), 0, 65535).reshape(-1)
+
+    return bank
+
+
+class SyntheticCameraControl(noneCameraControl.NoneCameraControl):
+
+    min_exposure_time = 0.001
+
+    # These are the defaults for the frame bank that is rendered
+    # when the NoneCameraControl is initialized.
+    bank_size = 2
+    emitter_intensity = 2000.0
+    emitters = 200
+    seed = 0
+
+    def __init__(self, config = None, **kwds):
+        super().__init__(config = config, **kwds)
+
+        self.bank_size = config.get("bank_size", 16)
+        self.burst_frames = config.get("burst_frames", 1)
+        self.emitter_intensity = config.get("emitter_intensity", 2000.0)
+        self.emitters = config.get("emitters", 200)
+        self.seed = config.get("seed", 0)
+
+        #
+        # Override none camera defaults with values that are more
+        # like a sCMOS camera.
+        #
+        self.parameters.setv("exposure_time", 0.01)
+        self.parameters.setv("max_intensity", 65536)
+
+        chip_size = config.get("chip_size", 2048)
+        for pname in ["x_start", "x_end", "y_start", "y_end"]:
+            self.parameters.getp(pname).setMaximum(chip_size)
+
+        self.parameters.setv("x_end", chip_size)
+        self.parameters.setv("y_end", chip_size)
+        self.parameters.setv("x_chip", chip_size)
+        self.parameters.setv("y_chip", chip_size)
+
+        self.newParameters(self.parameters, initialization = True)
+
+    def newFakeFrames(self, size_x, size_y):
+        self.frame_bank = renderFrameBank(size_x,
+                                          size_y,
+                                          n_frames = self.bank_size,
+                                          n_emitters = self.emitters,
+                                          intensity = self.emitter_intensity,
+                                          seed = self.seed)
+
+    def run(self):
+        frame_pool = self.getFramePool()
+        self.running = True
+        self.thread_started = True
+        next_time = time.perf_counter()
+        while(self.running):
+
+            # Create burst_frames frames by copying from the frame bank.
+            frame_data = []
+            timestamp = time.perf_counter()
+            for i in range(self.burst_frames):
+                bank_frame = self.frame_bank[self.frame_number % self.bank_size]
+                pool_buffer = None
+                if frame_pool is not None:
+                    pool_buffer = frame_pool.acquire()
+
+                if pool_buffer is not None:
+                    np_data = pool_buffer.getData()
+                    numpy.copyto(np_data, bank_frame)
+                else:
+                    np_data = bank_frame.copy()
+
+                frame_data.append(frame.Frame(np_data,
+                                              self.frame_number,
+                                              self.fake_frame_size[0],
+                                              self.fake_frame_size[1],
+                                              self.camera_name,
+                                              pool_buffer = pool_buffer,
+                                              timestamp = timestamp))
+                self.frame_number += 1
+
+                if self.film_length is not None:
+                    if (self.frame_number == self.film_length):
+                        self.running = False
+                        break
+
+            # Emit new data signal.
+            self.newData.emit(frame_data)
+
+            # Wait until it is time for the next burst.
+            exposure_time = self.parameters.get("exposure_time")
+            next_time += len(frame_data) * exposure_time
+            if (next_time < (time.perf_counter() - exposure_time)):
+                next_time = time.perf_counter()
+            self.waitUntil(next_time)
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
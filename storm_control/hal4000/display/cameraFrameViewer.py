@@ -21,11 +21,13 @@ import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.colorTables.colorTables as colorTables
+import storm_control.hal4000.display.displayRenderer as displayRenderer
 import storm_control.hal4000.halLib.halFunctionality as halFunctionality
 import storm_control.hal4000.halLib.halMessage as halMessage
 
 import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
 import storm_control.hal4000.qtWidgets.qtColorGradient as qtColorGradient
+import storm_control.hal4000.qtWidgets.qtHistogram as qtHistogram
 import storm_control.hal4000.qtWidgets.qtRangeSlider as qtRangeSlider
 
 import storm_control.hal4000.qtdesigner.camera_display_ui as cameraDisplayUi
@@ -112,8 +114,11 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.filming = False
         self.frame = False
         self.parameters = False
+        self.renderer = displayRenderer.DisplayRenderer(name = "display renderer " + str(display_name),
+                                                        parent = self)
         self.rubber_band_rect = None
         self.show_grid = False
+        self.show_histogram = False
         self.show_info = True
         self.show_target = False
         self.stage_functionality = None
@@ -151,11 +156,21 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.ui.rangeSliderWidget.setLayout(layout)
         self.ui.rangeSlider.setEmitWhileMoving(True)
 
+        # Histogram, this is next to the range slider but is
+        # not shown unless the user asks for it.
+        self.ui.histogram = qtHistogram.QtHistogram(parent = self.ui.slideWidget)
+        self.ui.histogram.setFixedWidth(24)
+        self.ui.histogram.hide()
+        self.ui.horizontalLayout.addWidget(self.ui.histogram)
+        self.scale_widget_widths = [self.ui.scaleWidget.minimumWidth(),
+                                    self.ui.scaleWidget.maximumWidth()]
+
         # Color tables combo box.
         for color_name in sorted(self.color_tables.getColorTableNames()):
             self.ui.colorComboBox.addItem(color_name[:-5])
 
         self.ui.gridAct = QtWidgets.QAction(self.tr("Show Grid"), self)
+        self.ui.histogramAct = QtWidgets.QAction(self.tr("Show Histogram"), self)
         self.ui.infoAct = QtWidgets.QAction(self.tr("Hide Info"), self)
         self.ui.targetAct = QtWidgets.QAction(self.tr("Show Target"), self)
 
@@ -175,15 +190,20 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.camera_view.newCenter.connect(self.handleNewCenter)
         self.camera_view.newScale.connect(self.handleNewScale)
         self.camera_view.verticalScrollBar().sliderReleased.connect(self.handleScrollBar)
+        self.camera_view.horizontalScrollBar().valueChanged.connect(self.handleViewChange)
+        self.camera_view.verticalScrollBar().valueChanged.connect(self.handleViewChange)
 
         self.camera_view.dragMove.connect(self.handleDragMove)
         self.camera_view.dragStart.connect(self.handleDragStart)
         self.camera_view.rubberBandChanged.connect(self.handleRubberBandChanged)
 
+        self.renderer.imageReady.connect(self.handleImageReady)
+
         self.ui.autoScaleButton.clicked.connect(self.handleAutoScale)
         self.ui.colorComboBox.currentIndexChanged[str].connect(self.handleColorTableChange)
         self.ui.feedComboBox.currentIndexChanged[str].connect(self.handleFeedChange)
         self.ui.gridAct.triggered.connect(self.handleGrid)
+        self.ui.histogramAct.triggered.connect(self.handleHistogram)
         self.ui.infoAct.triggered.connect(self.handleInfo)        
         self.ui.rangeSlider.doubleClick.connect(self.handleAutoScale)        
         self.ui.rangeSlider.rangeChanged.connect(self.handleRangeChange)
@@ -195,11 +215,26 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.display_timer.timeout.connect(self.handleDisplayTimer)
         self.display_timer.start()
 
+    def cleanUp(self):
+        """
+        Stop rendering and give back the frame that we are holding.
+        """
+        self.display_timer.stop()
+        if self.cam_fn is not None:
+            try:
+                self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+            except TypeError:
+                pass
+        self.renderer.imageReady.disconnect(self.handleImageReady)
+        self.renderer.cleanUp()
+        self.releaseFrame()
+
     def contextMenuEvent(self, event):
         menu = QtWidgets.QMenu(self)
         menu.addAction(self.ui.infoAct)
         menu.addAction(self.ui.targetAct)
         menu.addAction(self.ui.gridAct)
+        menu.addAction(self.ui.histogramAct)
         menu.exec_(event.globalPos())
 
     def createParameters(self, cam_fn, parameters_from_file):
@@ -218,6 +253,18 @@ class CameraFrameViewer(QtWidgets.QFrame):
         p = self.parameters.addSubSection(self.getFeedName())
 
         # Add display specific parameters.
+        p.add(params.ParameterRangeFloat(description = "Autoscale maximum (percentile)",
+                                         name = "autoscale_high",
+                                         value = 99.9,
+                                         min_value = 0.0,
+                                         max_value = 100.0))
+
+        p.add(params.ParameterRangeFloat(description = "Autoscale minimum (percentile)",
+                                         name = "autoscale_low",
+                                         value = 0.1,
+                                         min_value = 0.0,
+                                         max_value = 100.0))
+
         p.add(params.ParameterFloat(name = "center_x",
                                     value = 0.0,
                                     is_mutable = False))
@@ -276,6 +323,14 @@ class CameraFrameViewer(QtWidgets.QFrame):
                 if p.has(attr):
                     p.setv(attr, parameters_from_file.get(attr))
 
+    def getDecimation(self):
+        """
+        Returns how many frame pixels there are per screen pixel, rounded
+        down. There is no point in rendering more pixels than this.
+        """
+        frame_scale = min(self.camera_widget.scale_x, self.camera_widget.scale_y)
+        return max(1, int(self.camera_view.getSceneScale()/frame_scale))
+
     def getDefaultParameters(self):
         """
         Return a copy of the default parameters. These are used when we change
@@ -308,7 +363,8 @@ class CameraFrameViewer(QtWidgets.QFrame):
         return self.parameters
 
     def handleAutoScale(self, bool):
-        [scalemin, scalemax] = self.camera_widget.getAutoScale()
+        [scalemin, scalemax] = self.camera_widget.getAutoScale([self.getParameter("autoscale_low"),
+                                                                self.getParameter("autoscale_high")])
         if scalemin < 0:
             scalemin = 0
         if scalemax > self.getParameter("max_intensity"):
@@ -323,13 +379,16 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.color_gradient.newColorTable(color_table)
 
     def handleDisplayTimer(self):
+        """
+        The frame is rendered in the renderers thread, handleImageReady()
+        is called when it is done. Only the part of the frame that is
+        visible is rendered, at (approximately) the resolution of the
+        screen.
+        """
         if self.frame:
-            self.camera_widget.updateImageWithFrame(self.frame)
-            if self.show_info:
-                self.handleIntensityInfo(*self.camera_widget.getIntensityInfo())
-            if self.cfv_functionality.isConnected():
-                q_pixmap = self.camera_view.grab()
-                self.cfv_functionality.handleNewPixmap(q_pixmap)
+            self.renderer.render(self.frame,
+                                 self.camera_widget.getRenderSettings(self.getDecimation(),
+                                                                      self.camera_view.getVisibleRect()))
 
     def handleDragMove(self, dx, dy):
         self.stage_functionality.dragMove(dx, dy)
@@ -361,6 +420,9 @@ class CameraFrameViewer(QtWidgets.QFrame):
                 self.cam_fn.newFrame.disconnect(self.handleNewFrame)
             except TypeError:
                 pass
+
+        # The current frame belongs to the old feed.
+        self.releaseFrame()
             
         self.parameters.setv("feed_name", str(feed_name))
         self.feedChange.emit(feed_name)
@@ -374,6 +436,38 @@ class CameraFrameViewer(QtWidgets.QFrame):
             self.ui.gridAct.setText("Hide Grid")
         self.camera_widget.setShowGrid(self.show_grid)
 
+    def handleHistogram(self, boolean):
+        #
+        # The histogram goes in the scale widget next to the range slider,
+        # so this has to get wider by the width of the histogram (and the
+        # layout spacing) to make room for it.
+        #
+        [min_width, max_width] = self.scale_widget_widths
+        if self.show_histogram:
+            self.show_histogram = False
+            self.ui.histogramAct.setText("Show Histogram")
+            self.ui.histogram.hide()
+        else:
+            self.show_histogram = True
+            self.ui.histogramAct.setText("Hide Histogram")
+            self.ui.histogram.newHistogram(self.camera_widget.getHistogram())
+            self.ui.histogram.show()
+            extra = self.ui.histogram.minimumWidth() + max(0, self.ui.horizontalLayout.spacing())
+            min_width += extra
+            max_width = min(max_width + extra, QtWidgets.QWIDGETSIZE_MAX)
+        self.ui.scaleWidget.setMinimumWidth(min_width)
+        self.ui.scaleWidget.setMaximumWidth(max_width)
+
+    def handleImageReady(self, rendered_image):
+        self.camera_widget.newImage(rendered_image)
+        if self.show_histogram:
+            self.ui.histogram.newHistogram(rendered_image.histogram)
+        if self.show_info:
+            self.handleIntensityInfo(*self.camera_widget.getIntensityInfo())
+        if self.cfv_functionality.isConnected():
+            q_pixmap = self.camera_view.grab()
+            self.cfv_functionality.handleNewPixmap(q_pixmap)
+
     def handleInfo(self, boolean):
         if self.show_info:
             self.show_info = False
@@ -398,9 +492,9 @@ class CameraFrameViewer(QtWidgets.QFrame):
     def handleNewFrame(self, frame):
         if self.filming and (self.getParameter("sync") != 0):
             if((frame.frame_number % self.cycle_length) == (self.getParameter("sync") - 1)):
-                self.frame = frame
+                self.setFrame(frame)
         else:
-            self.frame = frame
+            self.setFrame(frame)
 
     def handleNewScale(self, scale):
         self.setParameter("scale", scale)
@@ -435,6 +529,21 @@ class CameraFrameViewer(QtWidgets.QFrame):
             self.ui.targetAct.setText("Hide Target")
         self.camera_widget.setShowTarget(self.show_target)
 
+    def handleViewChange(self, value = None):
+        """
+        The visible part of the frame changed, re-render the current
+        frame rather than waiting for the display timer.
+        """
+        self.handleDisplayTimer()
+
+    def hideEvent(self, event):
+        """
+        Don't hold on to a frame (and it's pool buffer) while hidden, for
+        example when a feed viewer is closed.
+        """
+        self.releaseFrame()
+        super().hideEvent(event)
+
     def newParameters(self, parameters):
         """
         How this is supposed to work..
@@ -463,6 +572,11 @@ class CameraFrameViewer(QtWidgets.QFrame):
             if not self.parameters.has(attr):
                 self.parameters.add(attr, self.default_parameters.getp(attr).copy())
 
+    def releaseFrame(self):
+        if self.frame:
+            self.frame.release()
+        self.frame = False
+
     def setCameraFunctionality(self, camera_functionality):
         """
         This method gets called when the view changes it's current feed. The
@@ -554,6 +668,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
 
         # General settings.
         self.ui.rangeSlider.setRange([0.0, self.getParameter("max_intensity"), 1.0])
+        self.ui.histogram.setMaxIntensity(self.getParameter("max_intensity"))
         self.ui.rangeSlider.setValues([float(self.getParameter("display_min")),
                                        float(self.getParameter("display_max"))])
 
@@ -584,6 +699,16 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # Switch to the correct feed.
         self.handleFeedChange(self.getFeedName())
 
+    def setFrame(self, frame):
+        """
+        We keep the frame until the next display update, so we
+        need to hold on to it's buffer (if it has one).
+        """
+        frame.retain()
+        if self.frame:
+            self.frame.release()
+        self.frame = frame
+
     def setParameter(self, pname, pvalue):
         """
         Wrapper to make it easier to set the appropriate parameter value.
@@ -634,6 +759,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.ui.scaleMax.setText(str(self.getParameter("display_max")))
         self.ui.scaleMin.setText(str(self.getParameter("display_min")))
         self.camera_widget.newRange(self.getParameter("display_min"), self.getParameter("display_max"))
+        self.ui.histogram.newRange(self.getParameter("display_min"), self.getParameter("display_max"))
 
 
 #
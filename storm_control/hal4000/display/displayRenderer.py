@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Renders camera frames for display in a worker thread.
+
+Rescaling a large (i.e. sCMOS) frame, mapping it through the color
+table and down-sampling it takes long enough that doing it in the
+GUI thread makes HAL sluggish while filming. Instead the frame
+viewer hands frames to a DisplayRenderer, which renders them with
+qtCameraGraphicsScene.renderFrame() in a halExecutor.SerialExecutor
+and emits the result with the imageReady signal.
+
+Only the newest frame is rendered. If a new frame arrives before
+the previous one was rendered the previous one is dropped.
+"""
+from PyQt5 import QtCore
+
+import storm_control.hal4000.halLib.halExecutor as halExecutor
+import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+
+
+class DisplayRenderer(QtCore.QObject):
+    """
+    This should be created in the GUI thread, so that imageReady
+    is delivered there.
+    """
+    imageReady = QtCore.pyqtSignal(object)
+
+    def __init__(self, name = "display renderer", **kwds):
+        super().__init__(**kwds)
+        self.executor = halExecutor.SerialExecutor(name = name)
+        self.mutex = QtCore.QMutex()
+        self.n_dropped = 0
+        self.n_rendered = 0
+        self.next_frame = None
+
+    def cleanUp(self):
+        """
+        Stop the executor, waiting for the frame that is being (or is
+        about to be) rendered. Frames are not rendered after this.
+        """
+        self.executor.stop()
+        self.releaseNextFrame()
+
+    def getStatistics(self):
+        self.mutex.lock()
+        stats = {"dropped" : self.n_dropped,
+                 "rendered" : self.n_rendered}
+        self.mutex.unlock()
+        return stats
+
+    def isBusy(self):
+        return self.executor.isBusy()
+
+    def releaseNextFrame(self):
+        self.mutex.lock()
+        if self.next_frame is not None:
+            self.next_frame[0].release()
+            self.next_frame = None
+        self.mutex.unlock()
+
+    def render(self, frame, settings):
+        """
+        Render frame using settings, the keyword arguments
+        for qtCameraGraphicsScene.renderFrame().
+        """
+        frame.retain()
+        self.mutex.lock()
+        if self.next_frame is not None:
+            self.next_frame[0].release()
+            self.n_dropped += 1
+        self.next_frame = [frame, settings]
+        self.mutex.unlock()
+        if not self.executor.submit(self.renderNextFrame, key = "render"):
+            self.releaseNextFrame()
+
+    def renderNextFrame(self):
+        """
+        This is what runs in the executor's thread.
+        """
+        self.mutex.lock()
+        next_frame = self.next_frame
+        self.next_frame = None
+        self.mutex.unlock()
+        if next_frame is None:
+            return
+
+        [frame, settings] = next_frame
+        try:
+            rendered_image = qtCameraGraphicsScene.renderFrame(frame, **settings)
+        finally:
+            frame.release()
+
+        if rendered_image is not None:
+            self.mutex.lock()
+            self.n_rendered += 1
+            self.mutex.unlock()
+            self.imageReady.emit(rendered_image)
+
+    def waitForDone(self):
+        self.executor.waitForDone()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -8,9 +8,17 @@ different cameras / feeds are available for each parameter
 file, whether the cameras / feeds should be saved when
 filming and what extension to use when saving.
 
+By default the feeds process frames in threads from the HAL
+thread pool, one frame at a time per feed so that the order
+of the frames is preserved, and the results are emitted from
+the GUI thread. Set 'threaded' to False in the feeds module
+section of the configuration file to process the frames in
+the GUI thread instead.
+
 Hazen 03/17
 """
 
+import collections
 import copy
 import numpy
 
@@ -60,6 +68,19 @@ class FeedException(halExceptions.HalException):
     pass
 
 
+class FeedWorker(QtCore.QRunnable):
+    """
+    Processes the queued frames of a single feed. The feed makes
+    sure that only one of these is running at any one time.
+    """
+    def __init__(self, feed = None, **kwds):
+        super().__init__(**kwds)
+        self.feed = feed
+
+    def run(self):
+        self.feed.processQueue()
+
+
 class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     """
     Feed functionality in a form that other modules can interact with. These have
@@ -70,18 +91,40 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
 
     Some functionality is explicitly blocked so we get an error if we accidentally
     try and use this exactly like a camera functionality.
+
+    Sub-classes implement processFrame(), which is called in a worker thread
+    if the feed is threaded. The started / stopped signals from the camera
+    go through the same queue as the frames so that they stay in order.
     """
-    def __init__(self, feed_name = None, **kwds):
+    feedProcessed = QtCore.pyqtSignal(object)
+
+    # The number of preallocated buffers for the feed frames.
+    frame_pool_size = 8
+
+    def __init__(self, feed_name = None, threaded = False, **kwds):
         super().__init__(**kwds)
         self.cam_fn = None
         self.feed_name = feed_name
         self.feed_parameters = self.parameters
         self.frame_number = 0
+        self.frame_pool = None
         self.frame_slice = None
         self.number_connections = 0
+        self.threaded = threaded
         self.x_pixels = 0
         self.y_pixels = 0
 
+        # Worker thread queue.
+        self.mutex = QtCore.QMutex()
+        self.queue = collections.deque()
+        self.queue_mutex = QtCore.QMutex()
+        self.worker = FeedWorker(feed = self)
+        self.worker.setAutoDelete(False)
+        self.worker_busy = False
+        self.worker_idle = QtCore.QWaitCondition()
+
+        self.feedProcessed.connect(self.handleFeedProcessed)
+
         # We're going to change some of the parameters in this class, but we don't
         # want the new values to appear in the editor or when saved. In order to
         # do this we change self.parameters to be a copy of self.feed_parameters.
@@ -113,6 +156,30 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
             self.cam_fn.started.disconnect(self.handleStarted)
             self.cam_fn.stopped.disconnect(self.handleStopped)
 
+        # Wait for the worker to finish with any frames from the camera.
+        self.queue_mutex.lock()
+        while self.worker_busy:
+            self.worker_idle.wait(self.queue_mutex)
+        self.queue_mutex.unlock()
+
+    def copyFrame(self, new_frame, frame_number):
+        """
+        Returns a feed frame with the (sliced) data from new_frame. If
+        there is no slicing this just refers to the data in new_frame.
+        """
+        if self.frame_slice is None:
+            return frame.Frame(new_frame.np_data,
+                               frame_number,
+                               self.x_pixels,
+                               self.y_pixels,
+                               self.camera_name,
+                               pool_buffer = new_frame.pool_buffer,
+                               timestamp = new_frame.timestamp)
+        else:
+            feed_frame = self.newFeedFrame(frame_number, new_frame.timestamp)
+            numpy.copyto(self.getImage(feed_frame), self.sliceFrame(new_frame))
+            return feed_frame
+
     def getCameraFunctionality(self):
         """
         Return the camera functionality this feed is using.
@@ -125,19 +192,49 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         """
         return self.feed_name
 
+    def getImage(self, feed_frame):
+        """
+        Returns the data in a feed frame as a 2D array.
+        """
+        return numpy.reshape(feed_frame.np_data, (self.y_pixels, self.x_pixels))
+
+    def handleFeedProcessed(self, item):
+        """
+        Called in the GUI thread with the results from the worker.
+        """
+        if isinstance(item, str):
+            if (item == "started"):
+                self.started.emit()
+            else:
+                self.stopped.emit()
+        else:
+            self.newFrame.emit(item)
+            item.release()
+
     def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
-        self.newFrame.emit(frame.Frame(sliced_data,
-                                       new_frame.frame_number,
-                                       self.x_pixels,
-                                       self.y_pixels,
-                                       self.camera_name))
+        if self.threaded:
+            new_frame.retain()
+            self.queueItem(new_frame)
+        else:
+            self.mutex.lock()
+            feed_frame = self.processFrame(new_frame)
+            self.mutex.unlock()
+            if feed_frame is not None:
+                self.newFrame.emit(feed_frame)
+                if (feed_frame.pool_buffer is not new_frame.pool_buffer):
+                    feed_frame.release()
 
     def handleStarted(self):
-        self.started.emit()
+        if self.threaded:
+            self.queueItem("started")
+        else:
+            self.started.emit()
 
     def handleStopped(self):
-        self.stopped.emit()
+        if self.threaded:
+            self.queueItem("stopped")
+        else:
+            self.stopped.emit()
 
     def hasEMCCD(self):
         assert False
@@ -160,8 +257,84 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     def isMaster(self):
         return False
 
+    def newFeedFrame(self, frame_number, timestamp):
+        """
+        Returns a new feed frame, using a buffer from the feed's frame
+        pool if one is available.
+        """
+        pool_buffer = self.frame_pool.acquire()
+        if pool_buffer is None:
+            np_data = numpy.empty(self.x_pixels * self.y_pixels, dtype = numpy.uint16)
+        else:
+            np_data = pool_buffer.getData()
+        return frame.Frame(np_data,
+                           frame_number,
+                           self.x_pixels,
+                           self.y_pixels,
+                           self.camera_name,
+                           pool_buffer = pool_buffer,
+                           timestamp = timestamp)
+
+    def processFrame(self, new_frame):
+        """
+        Returns the feed frame for new_frame, or None if there isn't one.
+        """
+        return self.copyFrame(new_frame, new_frame.frame_number)
+
+    def processQueue(self):
+        """
+        This is called by the worker (in a different thread).
+        """
+        while True:
+            self.queue_mutex.lock()
+            if (len(self.queue) == 0):
+                self.worker_busy = False
+                self.worker_idle.wakeAll()
+                self.queue_mutex.unlock()
+                return
+            item = self.queue.popleft()
+            self.queue_mutex.unlock()
+
+            if isinstance(item, str):
+                self.feedProcessed.emit(item)
+                continue
+
+            self.mutex.lock()
+            feed_frame = self.processFrame(item)
+            self.mutex.unlock()
+
+            # If the feed frame refers to the data in the camera frame
+            # then it takes over our reference to the camera frame.
+            if (feed_frame is None) or (feed_frame.pool_buffer is not item.pool_buffer):
+                item.release()
+            if feed_frame is not None:
+                self.feedProcessed.emit(feed_frame)
+
+    def queueItem(self, item):
+        """
+        Add a frame (or signal name) to the queue, starting the worker
+        if necessary.
+        """
+        self.queue_mutex.lock()
+        self.queue.append(item)
+        start_worker = not self.worker_busy
+        self.worker_busy = True
+        self.queue_mutex.unlock()
+
+        if start_worker:
+            halModule.threadpool.start(self.worker)
+
     def reset(self):
+        self.mutex.lock()
         self.frame_number = 0
+        self.resetFeed()
+        self.mutex.unlock()
+
+    def resetFeed(self):
+        """
+        Sub-classes should override this to reset their state.
+        """
+        pass
 
     def setCameraFunctionality(self, camera_functionality):
         self.cam_fn = camera_functionality
@@ -195,6 +368,10 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
             self.frame_slice  = (slice(p.get("y_start") - 1, p.get("y_end")),
                                  slice(p.get("x_start") - 1, p.get("x_end")))
 
+        self.frame_pool = frame.FramePool(n_buffers = self.frame_pool_size,
+                                          n_pixels = self.x_pixels * self.y_pixels)
+        self.resetFeed()
+
         # Adjust / add parameters from the camera so that the feed will be
         # displayed properly.
         p.add(self.cam_fn.parameters.getp("x_chip").copy())
@@ -226,15 +403,15 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
 
     def sliceFrame(self, new_frame):
         """
-        Slices out a part of the frame based on self.frame_slice.
+        Returns a (2D) view of the part of the frame based on self.frame_slice.
         """
+        w = new_frame.image_x
+        h = new_frame.image_y
+        image = numpy.reshape(new_frame.np_data, (h,w))
         if self.frame_slice is None:
-            return new_frame.np_data
+            return image
         else:
-            w = new_frame.image_x
-            h = new_frame.image_y
-            sliced_frame = numpy.reshape(new_frame.np_data, (h,w))[self.frame_slice]
-            return numpy.ascontiguousarray(sliced_frame)
+            return image[self.frame_slice]
 
     def toggleShutter(self):
         assert False
@@ -251,29 +428,24 @@ class FeedFunctionalityAverage(FeedFunctionality):
         self.counts = 0
         self.frames_to_average = self.parameters.get("frames_to_average")
 
-    def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
-
-        if self.average_frame is None:
-            self.average_frame = sliced_data.astype(numpy.uint32)
-        else:
-            self.average_frame += sliced_data
+    def processFrame(self, new_frame):
+        numpy.add(self.average_frame, self.sliceFrame(new_frame), out = self.average_frame)
         self.counts += 1
 
         if (self.counts == self.frames_to_average):
-            average_frame = self.average_frame/self.frames_to_average
-            self.newFrame.emit(frame.Frame(average_frame.astype(numpy.uint16),
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
-            self.average_frame = None
+            numpy.floor_divide(self.average_frame, self.frames_to_average, out = self.average_frame)
+            feed_frame = self.newFeedFrame(self.frame_number, new_frame.timestamp)
+            numpy.copyto(self.getImage(feed_frame), self.average_frame, casting = "unsafe")
+            self.average_frame.fill(0)
             self.counts = 0
             self.frame_number += 1
+            return feed_frame
 
-    def reset(self):
-        super().reset()
-        self.average_frame = None
+    def resetFeed(self):
+        if (self.average_frame is None) or (self.average_frame.shape != (self.y_pixels, self.x_pixels)):
+            self.average_frame = numpy.zeros((self.y_pixels, self.x_pixels), dtype = numpy.uint32)
+        else:
+            self.average_frame.fill(0)
         self.counts = 0
         
     
@@ -288,16 +460,81 @@ class FeedFunctionalityInterval(FeedFunctionality):
         self.capture_frames = list(map(int, temp.split(",")))
         self.cycle_length = self.parameters.get("cycle_length")
 
-    def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
-        
+    def processFrame(self, new_frame):
         if (new_frame.frame_number % self.cycle_length) in self.capture_frames:
-            self.newFrame.emit(frame.Frame(sliced_data,
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
+            feed_frame = self.copyFrame(new_frame, self.frame_number)
+            self.frame_number += 1
+            return feed_frame
+
+
+class FeedFunctionalityMaxProjection(FeedFunctionality):
+    """
+    The feed functionality for the maximum projection of groups of frames.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.counts = 0
+        self.frames_to_project = self.parameters.get("frames_to_project")
+        self.max_frame = None
+
+    def processFrame(self, new_frame):
+        if (self.counts == 0):
+            numpy.copyto(self.max_frame, self.sliceFrame(new_frame))
+        else:
+            numpy.maximum(self.max_frame, self.sliceFrame(new_frame), out = self.max_frame)
+        self.counts += 1
+
+        if (self.counts == self.frames_to_project):
+            feed_frame = self.newFeedFrame(self.frame_number, new_frame.timestamp)
+            numpy.copyto(self.getImage(feed_frame), self.max_frame)
+            self.counts = 0
             self.frame_number += 1
+            return feed_frame
+
+    def resetFeed(self):
+        if (self.max_frame is None) or (self.max_frame.shape != (self.y_pixels, self.x_pixels)):
+            self.max_frame = numpy.zeros((self.y_pixels, self.x_pixels), dtype = numpy.uint16)
+        self.counts = 0
+
+
+class FeedFunctionalityRunningMedian(FeedFunctionality):
+    """
+    The feed functionality for the median of the last N frames. There
+    is one feed frame for every camera frame once there are N frames.
+
+    numpy.median() partially sorts its input, so the recent frames are
+    copied to a scratch stack which it is allowed to overwrite.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.counts = 0
+        self.frames_to_median = self.parameters.get("frames_to_median")
+        self.median_frame = None
+        self.recent_frames = None
+        self.scratch_frames = None
+
+    def processFrame(self, new_frame):
+        index = self.counts % self.frames_to_median
+        numpy.copyto(self.recent_frames[index], self.sliceFrame(new_frame))
+        self.counts += 1
+
+        if (self.counts >= self.frames_to_median):
+            numpy.copyto(self.scratch_frames, self.recent_frames)
+            numpy.median(self.scratch_frames, axis = 0, out = self.median_frame, overwrite_input = True)
+            feed_frame = self.newFeedFrame(self.frame_number, new_frame.timestamp)
+            numpy.copyto(self.getImage(feed_frame), self.median_frame, casting = "unsafe")
+            self.frame_number += 1
+            return feed_frame
+
+    def resetFeed(self):
+        shape = (self.frames_to_median, self.y_pixels, self.x_pixels)
+        if (self.recent_frames is None) or (self.recent_frames.shape != shape):
+            self.median_frame = numpy.zeros(shape[1:], dtype = numpy.float32)
+            self.recent_frames = numpy.zeros(shape, dtype = numpy.uint16)
+            self.scratch_frames = numpy.zeros(shape, dtype = numpy.uint16)
+        self.counts = 0
 
 
 class FeedFunctionalitySlice(FeedFunctionality):
@@ -311,9 +548,10 @@ class FeedController(object):
     """
     Feed controller.
     """
-    def __init__(self, parameters = None, **kwds):
+    def __init__(self, parameters = None, threaded = False, **kwds):
         """
         parameters - This is just the 'feed' section of the parameters.
+        threaded - Process the feed frames in worker threads.
         """
         super().__init__(**kwds)
 
@@ -392,6 +630,20 @@ class FeedController(object):
                                                        name = "capture_frames",
                                                        value = "1"))
 
+            elif (feed_type == "max_projection"):
+                fclass = FeedFunctionalityMaxProjection
+
+                feed_params.add(params.ParameterInt(description = "Number of frames to project.",
+                                                    name = "frames_to_project",
+                                                    value = 1))
+
+            elif (feed_type == "running_median"):
+                fclass = FeedFunctionalityRunningMedian
+
+                feed_params.add(params.ParameterInt(description = "Number of frames in the running median.",
+                                                    name = "frames_to_median",
+                                                    value = 3))
+
             elif (feed_type == "slice"):
                 fclass = FeedFunctionalitySlice
             else:
@@ -411,7 +663,8 @@ class FeedController(object):
             camera_name = feed_params.get("source") + "." + feed_name
             self.feeds[camera_name] = fclass(feed_name = feed_name,
                                              camera_name = camera_name,
-                                             parameters = feed_params)
+                                             parameters = feed_params,
+                                             threaded = threaded)
 
     def allFeedsFunctional(self):
         for feed in self.getFeeds():
@@ -447,17 +700,29 @@ class Feeds(halModule.HalModule):
     """
     Feeds controller.
     """
+    message_types = ["configuration",
+                     "configure1",
+                     "configure2",
+                     "get feed names",
+                     "get functionality",
+                     "new parameters",
+                     "start film",
+                     "stop film",
+                     "updated parameters"]
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.camera_names = []
         self.feed_controller = None
         self.feed_names = []
+        self.threaded = module_params.get("threaded", True)
         
         # This message comes from the display.display when it creates a new
         # viewer.
         halMessage.addMessage("get feed names",
                               validator = {"data" : {"extra data" : [False, str]},
-                                           "resp" : {"feed names" : [True, list]}})
+                                           "resp" : {"feed names" : [True, list]}},
+                              lane = "cosmetic")
         
     def broadcastCurrentFeeds(self):
         """
@@ -472,6 +737,12 @@ class Feeds(halModule.HalModule):
         self.sendMessage(halMessage.HalMessage(m_type = "configuration",
                                                data = {"properties" : props}))
 
+    def cleanUp(self, qt_settings):
+        # Stop processing frames from the cameras.
+        if self.feed_controller is not None:
+            self.feed_controller.disconnectFeeds()
+            self.feed_controller = None
+
     def handleResponse(self, message, response):
         if message.isType("get functionality"):
             feed = self.feed_controller.getFeed(message.getData()["extra data"])
@@ -528,7 +799,8 @@ class Feeds(halModule.HalModule):
                                                                   data = {"old parameters" : self.feed_controller.getParameters().copy()}))
                 self.feed_controller = None
             if params.has("feeds"):
-                self.feed_controller = FeedController(parameters = params.get("feeds"))
+                self.feed_controller = FeedController(parameters = params.get("feeds"),
+                                                      threaded = self.threaded)
             
         elif message.isType("updated parameters"):
             self.feed_names = copy.copy(self.camera_names)
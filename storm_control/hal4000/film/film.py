@@ -20,6 +20,7 @@ from PyQt5 import QtCore, QtWidgets
 
 import storm_control.sc_library.hgit as hgit
 import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.hdebug as hdebug
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.film.filmRequest as filmRequest
@@ -341,9 +342,30 @@ class Film(halModule.HalModule):
         self.timing_functionality = None
         self.wait_for = []
         self.waiting_on = []
+        self.writer_statistics = []
         self.writers = None
         self.writers_stopped_timer = QtCore.QTimer(self)
 
+        # Image writer configuration. With a queue depth of 0 the frames
+        # are saved in the GUI thread, otherwise they are buffered and saved
+        # by one thread per feed. The drop policy is what to do when the
+        # buffer is full, either "block" or "drop".
+        #
+        # The batch and preallocate settings only apply to .dax files, the
+        # chunk and compression settings only apply to .zarr files and the
+        # fast_bigtiff setting only applies to .big.tif files.
+        #
+        self.writer_kwds = {"batch_frames" : module_params.get("writer_batch_frames", 0),
+                            "batch_mb" : module_params.get("writer_batch_mb", 0.0),
+                            "chunk_frames" : module_params.get("writer_chunk_frames", 1),
+                            "compression_level" : module_params.get("writer_compression_level", 5),
+                            "compression_threads" : module_params.get("writer_compression_threads", 4),
+                            "compressor" : module_params.get("writer_compressor", "zstd"),
+                            "drop_policy" : module_params.get("writer_drop_policy", "block"),
+                            "fast_bigtiff" : module_params.get("writer_fast_bigtiff", False),
+                            "preallocate" : module_params.get("writer_preallocate", False),
+                            "queue_depth" : module_params.get("writer_queue_depth", 0)}
+
         try:
             self.logfile_fp = open(module_params.get("directory") + "image_log.txt", "a")
         except FileNotFoundError:
@@ -408,24 +430,45 @@ class Film(halModule.HalModule):
         # Stop a camera.
         halMessage.addMessage("stop camera",
                               validator = {"data" : {"master" : [True, bool]},
-                                           "resp" : None})
+                                           "resp" : None},
+                              lane = "control")
 
         # Stop filming.
         halMessage.addMessage("stop film",
                               validator = {"data" : {"film settings" : [True, filmSettings.FilmSettings],
                                                      "number frames" : [True, int]},
                                            "resp" : {"parameters" : [False, params.StormXMLObject],
-                                                     "acquisition" : [False, list]}})
+                                                     "acquisition" : [False, list]}},
+                              lane = "control")
 
         # Request to stop filming.
         halMessage.addMessage("stop film request",
                               validator = {"data" : None,
-                                           "resp" : None})
+                                           "resp" : None},
+                              lane = "control")
 
     def cleanUp(self, qt_settings):
         if self.logfile_fp is not None:
             self.logfile_fp.close()
 
+    def getWriterStatistics(self, writer):
+        """
+        Returns a parameter summarizing the performance of a writer.
+        """
+        stats = writer.getStatistics()
+        text = ",".join(["queued=" + str(stats["queued"]),
+                         "written=" + str(stats["written"]),
+                         "dropped=" + str(stats["dropped"]),
+                         "max_queue_depth=" + str(stats["max queue depth"]),
+                         "MB/s={0:.1f}".format(stats["bytes/s"] * 0.000000953674),
+                         "delivery_ms={0:.2f}".format(stats["delivery ms"]),
+                         "delivery_max_ms={0:.2f}".format(stats["delivery max ms"]),
+                         "write_ms={0:.2f}".format(stats["write ms"]),
+                         "write_max_ms={0:.2f}".format(stats["write max ms"])])
+        hdebug.logText("writer " + writer.filename + " " + text)
+        name = "writer_" + writer.cam_fn.getCameraName().replace(".", "_")
+        return params.ParameterString(name = name, value = text)
+
     def handleLiveModeChange(self, state):
         if state:
             self.startCameras()
@@ -499,6 +542,10 @@ class Film(halModule.HalModule):
 
                 to_save.saveToFile(film_settings.getBasename() + ".xml")
 
+                # Some movie formats can also store the parameters.
+                for writer in self.writers:
+                    writer.addMetadata(to_save)
+
                 if self.logfile_fp is not None:
                     msg = ",".join([str(datetime.datetime.now()),
                                     film_settings.getBasename(),
@@ -616,7 +663,8 @@ class Film(halModule.HalModule):
 
         elif message.isType("stop film"):
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
-                                                              data = {"parameters" : self.view.getParameters()}))
+                                                              data = {"parameters" : self.view.getParameters(),
+                                                                      "acquisition" : self.writer_statistics}))
 
         elif message.isType("stop film request"):
             if (self.film_state != "run"):
@@ -691,7 +739,9 @@ class Film(halModule.HalModule):
         if self.film_settings.isSaved():
             for camera in self.camera_functionalities:
                 if camera.getParameter("saved"):
-                    self.writers.append(imagewriters.createFileWriter(camera, self.film_settings))
+                    self.writers.append(imagewriters.createFileWriter(camera,
+                                                                      self.film_settings,
+                                                                      **self.writer_kwds))
         if (len(self.writers) == 0):
             self.view.updateSize(0.0)
         
@@ -747,9 +797,17 @@ class Film(halModule.HalModule):
                 self.writers_stopped_timer.start()
                 return
 
-        # Close writers.
+        # Close writers, and record how well they kept up. All the writers
+        # are closed even if one of them fails so that we always finish
+        # the film.
+        self.writer_statistics = []
+        writer_errors = []
         for writer in self.writers:
-            writer.closeWriter()
+            try:
+                writer.closeWriter()
+            except Exception as exception:
+                writer_errors.append(str(exception))
+            self.writer_statistics.append(self.getWriterStatistics(writer))
 
         # Enable the UI.
         self.view.enableUI(True)
@@ -773,6 +831,14 @@ class Film(halModule.HalModule):
             if self.view.soundBell():
                 print("\7\7")
 
+        # Report writer errors.
+        if (len(writer_errors) > 0):
+            e_msg = "Saving the film failed!\n\n" + "\n".join(writer_errors)
+            print(">> Warning " + e_msg)
+            hdebug.logText(e_msg)
+            if not self.film_settings.isTCPRequest():
+                halMessageBox.halMessageBoxInfo(e_msg, is_error = True)
+
         #raise halExceptions.HalException("done now!")
 
 #
@@ -45,6 +45,9 @@ class FilmSettings(object):
         # Whether or not to overwrite an existing file. If this is not True
         # and the file already exists HAL is expected to crash.
         self.overwrite = overwrite
+
+        # The pixel size in microns, this is saved in (some) tif files.
+        self.pixel_size = pixel_size
         
         # Whether or not to run the shutters.
         self.run_shutters = run_shutters
@@ -7,7 +7,6 @@ Hazen 04/17
 """
 
 from PyQt5 import QtCore
-import tifffile
 
 import storm_control.hal4000.halLib.halMessage as halMessage
 
@@ -319,6 +318,7 @@ class LockControl(QtCore.QObject):
                 # Only save images when in diagnostics mode and only for a QPDCameraFunctionality.
                 if self.diagnostics_mode and (self.qpd_functionality.getType() == "camera"):
                     self.tiff_counter = 0
+                    import tifffile
                     self.tiff_fp = tifffile.TiffWriter(film_settings.getBasename() + "_qpd.tif",
                                                        bigtiff = True)
 
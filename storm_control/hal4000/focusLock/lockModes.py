@@ -7,8 +7,6 @@ Hazen 05/15
 """
 import math
 import numpy
-import scipy.optimize
-import tifffile
 import time
 
 from PyQt5 import QtCore
@@ -793,6 +791,8 @@ class OptimalLockMode(AlwaysOnLockMode):
                                   numpy.max(fvalues) - numpy.min(fvalues),
                                   zvalues[numpy.argmax(fvalues)],
                                   9.0] # empirically determined width parameter
+                            # scipy is slow to import and only used here.
+                            import scipy.optimize
                             p1, success = scipy.optimize.leastsq(errfunc, p0[:])
                             if (success == 1):
                                 optimum = p1[2]
@@ -1059,6 +1059,7 @@ class DiagnosticsLockMode(NoLockMode):
         self.ld_data_fp = open(fname_base + ".txt", "w")
 
         if self.ld_take_movie:
+            import tifffile
             self.ld_movie_fp = tifffile.TiffWriter(fname_base + ".tif")
 
     def stopFilm(self):
@@ -18,9 +18,7 @@ Hazen 01/17
 
 """
 
-from collections import deque
 import faulthandler
-import importlib
 import os
 import signal
 import time
@@ -33,9 +31,13 @@ import storm_control.sc_library.hgit as hgit
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.halLib.halDialog as halDialog
+import storm_control.hal4000.halLib.halExecutor as halExecutor
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
+import storm_control.hal4000.halLib.halMessageQueue as halMessageQueue
 import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.halLib.halStartup as halStartup
+import storm_control.hal4000.halLib.halStatistics as halStatistics
 import storm_control.hal4000.qtWidgets.qtAppIcon as qtAppIcon
 
 
@@ -64,6 +66,10 @@ class HalController(halModule.HalModule):
             self.view = ClassicView(module_params = module_params,
                                     qt_settings = qt_settings,
                                     **kwds)
+        elif (module_params.get("ui_type") == "headless"):
+            self.view = HeadlessView(module_params = module_params,
+                                     qt_settings = qt_settings,
+                                     **kwds)
         else:
             self.view = DetachedView(module_params = module_params,
                                      qt_settings = qt_settings,
@@ -366,7 +372,62 @@ class DetachedView(HalView):
 
     def stopFilm(self):
         self.ui.recordButton.stopFilm()
-        
+
+
+class HeadlessView(QtCore.QObject):
+    """
+    This stands in for the main window when HAL is run without
+    a GUI, i.e. when HAL is controlled using TCP/IP. The other
+    modules can still add widgets and menu items, these are just
+    ignored.
+    """
+    guiMessage = QtCore.pyqtSignal(object)
+
+    def __init__(self, module_name = None, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.film_directory = module_params.get("directory")
+        self.module_name = module_name
+
+    def addMenuItem(self, item_name, item_data):
+        pass
+
+    def addMenuItems(self):
+        pass
+
+    def addUiWidget(self, parent_widget_name, ui_widget, ui_order):
+        pass
+
+    def addWidgets(self):
+        pass
+
+    def cleanUp(self, qt_settings):
+        """
+        There is no main window to close, so we have to tell Qt to quit.
+        """
+        QtCore.QCoreApplication.instance().quit()
+
+    def close(self):
+        self.guiMessage.emit(halMessage.HalMessage(m_type = "close event",
+                                                   sync = True))
+
+    def getFilmDirectory(self):
+        return self.film_directory
+
+    def getNotesEditText(self):
+        return ""
+
+    def setFilmDirectory(self, film_directory):
+        self.film_directory = film_directory
+
+    def show(self):
+        pass
+
+    def startFilm(self, film_settings):
+        pass
+
+    def stopFilm(self):
+        pass
+
 
 #
 # The core..
@@ -385,12 +446,15 @@ class HalCore(QtCore.QObject):
 
         self.modules = []
         self.module_name = "core"
+        self.print_messages = config.get("print_messages", True)
         self.qt_settings = QtCore.QSettings("storm-control", "hal4000" + config.get("setup_name").lower())
-        self.queued_messages = deque()
+        self.queued_messages = halMessageQueue.MessageQueue()
         self.queued_messages_timer = QtCore.QTimer(self)
         self.running = True # This is solely for the benefit of unit tests.
-        self.sent_messages = []
+        self.sent_messages = {}
         self.strict = config.get("strict", False)
+        self.strict_samples = config.get("strict_samples", 0)
+        self.subscribers = {}
 
         self.queued_messages_timer.setInterval(0)
         self.queued_messages_timer.timeout.connect(self.handleSendMessage)
@@ -399,6 +463,10 @@ class HalCore(QtCore.QObject):
         # Initialize messages.
         halMessage.initializeMessages()
 
+        # Reset message statistics.
+        halStatistics.statistics.enabled = config.get("message_statistics", True)
+        halStatistics.statistics.reset()
+
         # In strict mode we all workers must finish in 60 seconds.
         if self.strict:
             halModule.max_job_time = 60000
@@ -429,32 +497,43 @@ class HalCore(QtCore.QObject):
         # Need to load HAL's main window first so that other GUI windows will
         # have the correct Qt parent.
         #
+        # The modules are created in this thread, but their hardware is
+        # initialized in parallel in the thread pool. See halLib.halStartup.
+        #
+        # When HAL is run without a GUI (ui_type 'headless') the modules that
+        # only provide a GUI (gui_only True) are not loaded at all.
+        #
+        headless = (config.get("ui_type") == "headless")
+        scheduler = halStartup.StartupScheduler(qt_settings = self.qt_settings)
         module_names = sorted(config.get("modules").getAttrs())
         module_names.insert(0, module_names.pop(module_names.index("hal")))        
         for module_name in module_names:
-            print("  " + module_name)
 
             # Get module specific parameters.
             module_params = config.get("modules").get(module_name)
 
+            if headless and module_params.get("gui_only", False):
+                print("  " + module_name + " (skipped, gui only)")
+                continue
+
             # Add the 'root' parameters to this module parameters
             # so that they are visible to the module.
             for root_param in config.getAttrs():
                 if (root_param != "modules"):
                     module_params.add(root_param, config.getp(root_param))
 
-            # Load the module.
-            a_module = importlib.import_module(module_params.get("module_name"))
-            a_class = getattr(a_module, module_params.get("class_name"))
-            a_object = a_class(module_name = module_name,
-                               module_params = module_params,
-                               qt_settings = self.qt_settings)
+            scheduler.addModule(module_name, module_params)
+
+        def moduleCreated(module_name, a_object):
+            print("  " + module_name)
 
             # If this is HAL's main window set the HalDialog qt_parent class
             # attribute so that any GUI QDialogs will have the correct Qt parent.
-            if (module_name == "hal"):
+            if (module_name == "hal") and not headless:
                 halDialog.HalDialog.qt_parent = a_object.view
-                
+
+        # Load the modules.
+        for [module_name, a_object] in scheduler.createModules(moduleCreated):
             self.modules.append(a_object)
             if testing_mode:
                 all_modules[module_name] = a_object
@@ -462,11 +541,20 @@ class HalCore(QtCore.QObject):
                 all_modules[module_name] = True
 
         print("")
+        scheduler.printStartupTimes()
+        if halStartup.import_profiler is not None:
+            halStartup.import_profiler.printProfile()
+        halStatistics.statistics.startup_times = scheduler.startup_times
 
         # Connect signals.
         for module in self.modules:
             module.newMessage.connect(self.handleMessage)
 
+        # Figure out which modules handle which messages. Modules that
+        # don't say what messages they handle get all of them.
+        for m_type in halMessage.valid_messages:
+            self.getSubscribers(m_type)
+
         # Create messages.
         #
         # We do it this way with finalizers because otherwise all of these messages
@@ -551,6 +639,7 @@ class HalCore(QtCore.QObject):
             module.cleanUp(self.qt_settings)
         print("Waiting for QThreadPool to finish.")
         halModule.threadpool.waitForDone()
+        halExecutor.waitForDone()
         self.running = False
         print(" Dave? What are you doing Dave?")
         print("  ...")
@@ -567,6 +656,19 @@ class HalCore(QtCore.QObject):
                 return m_child
         assert False, "UI element " + name + " not found."
 
+    def getSubscribers(self, m_type):
+        """
+        Returns the list of modules that handle messages of type m_type.
+        """
+        if not m_type in self.subscribers:
+            subscribers = []
+            for module in self.modules:
+                m_types = module.getMessageTypes()
+                if (m_types is None) or (m_type in m_types):
+                    subscribers.append(module)
+            self.subscribers[m_type] = subscribers
+        return self.subscribers[m_type]
+
     def handleErrors(self, message):
         """
         Handle errors in messages from 'core'
@@ -584,6 +686,18 @@ class HalCore(QtCore.QObject):
                 msg = "Got a warning" + msg
                 halMessageBox.halMessageBoxInfo(msg)
 
+    def handleGetStatistics(self, message):
+        """
+        Respond to a 'get statistics' message.
+        """
+        statistics = halStatistics.statistics.getStatistics()
+        statistics["executors"] = halExecutor.getStatistics()
+        message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                          data = {"statistics" : statistics}))
+        data = message.getData()
+        if (data is not None) and data.get("reset", False):
+            halStatistics.statistics.reset()
+
     def handleMessage(self, message):
         """
         Adds a message to the queue of images to send.
@@ -595,10 +709,13 @@ class HalCore(QtCore.QObject):
                 msg += "' received from " + message.getSourceName()
                 raise halExceptions.HalException(msg)
 
-            validator = halMessage.valid_messages[message.m_type].get("data")
-            halMessage.validateData(validator, message)
+            validator = halMessage.message_validators[message.m_type]
+            if validator.shouldValidate(self.strict_samples):
+                validator.validateData(message)
+                message.validated = True
             
         message.logEvent("queued")
+        message.time_queued = time.perf_counter()
 
         self.queued_messages.append(message)
 
@@ -612,13 +729,14 @@ class HalCore(QtCore.QObject):
         """
 
         # Remove message from list of sent messages.
-        self.sent_messages.remove(message)
+        del self.sent_messages[message.m_id]
 
         # Disconnect messages processed signal.
         message.processed.disconnect(self.handleProcessed)
         
         # Call message finalizer.
         message.finalize()
+        halStatistics.statistics.addFinalized(message)
 
         # Always exit on exceptions in strict mode.
         if self.strict and message.hasErrors():
@@ -638,10 +756,10 @@ class HalCore(QtCore.QObject):
 
 
         # Check the responses if we are in strict mode.
-        if self.strict:
-            validator = halMessage.valid_messages[message.m_type].get("resp")
+        if message.validated:
+            validator = halMessage.message_validators[message.m_type]
             for response in message.getResponses():
-                halMessage.validateResponse(validator, message, response)
+                validator.validateResponse(message, response)
 
         # Notify the sender of any responses to the message.
         message.getSource().handleResponses(message)
@@ -669,26 +787,33 @@ class HalCore(QtCore.QObject):
         """
         # Process the next message.
         if (len(self.queued_messages) > 0):
-            cur_message = self.queued_messages.popleft()
+            cur_message = self.queued_messages.next()
             
             #
             # If this message requested synchronization and there are
-            # pending messages then push it back into the queue.
+            # pending messages then leave it in the queue. This blocks
+            # the messages in its lane and the lower priority lanes.
             #
             if cur_message.sync and (len(self.sent_messages) > 0):
-                print("> waiting for the following to be processed:")
-                for message in self.sent_messages:
-                    text = "  '" + message.m_type + "' from " + message.getSourceName() + ", "
-                    text += str(message.getRefCount()) + " module(s) have not responded yet."
-                    print(text)
-                print("")
-                self.queued_messages.appendleft(cur_message)
+                if cur_message.time_blocked is None:
+                    cur_message.time_blocked = time.perf_counter()
+                if self.print_messages:
+                    print("> waiting for the following to be processed:")
+                    for message in self.sent_messages.values():
+                        text = "  '" + message.m_type + "' from " + message.getSourceName() + ", "
+                        text += str(message.getRefCount()) + " module(s) have not responded yet."
+                        print(text)
+                    print("")
             
             #
             # Otherwise process the message.
             #
             else:
-                print(cur_message.source.module_name + " '" + cur_message.m_type + "'")
+                self.queued_messages.remove(cur_message)
+                halStatistics.statistics.addUnblocked(cur_message)
+
+                if self.print_messages:
+                    print(cur_message.source.module_name + " '" + cur_message.m_type + "'")
 
                 # Check for "closeEvent" message from the main window.
                 if cur_message.isType("close event") and (cur_message.getSourceName() == "hal"):
@@ -703,13 +828,23 @@ class HalCore(QtCore.QObject):
                     # Otherwise send the message.
                     else:
                         cur_message.logEvent("sent")
+                        halStatistics.statistics.addSent(cur_message)
+
+                        # We respond to requests for the statistics.
+                        if cur_message.isType("get statistics"):
+                            self.handleGetStatistics(cur_message)
 
                         cur_message.processed.connect(self.handleProcessed)
-                        self.sent_messages.append(cur_message)
-                        for module in self.modules:
-                            cur_message.ref_count += 1
+                        self.sent_messages[cur_message.m_id] = cur_message
+                        subscribers = self.getSubscribers(cur_message.m_type)
+                        cur_message.ref_count += len(subscribers)
+                        for module in subscribers:
                             module.handleMessage(cur_message)
 
+                        # Finalize messages that none of the modules handle.
+                        if (len(subscribers) == 0):
+                            self.handleProcessed(cur_message)
+
                     # Process any remaining messages with immediate timeout.
                     if (len(self.queued_messages) > 0):
                         self.startMessageTimer()
@@ -731,9 +866,20 @@ if (__name__ == "__main__"):
     parser.add_argument('config', type = str, help = "The name of the configuration file to use.")
     parser.add_argument('--xml', dest = 'default_xml', type = str, required = False, default = None,
                         help = "The name of a settings xml file to use as the default.")
+    parser.add_argument('--headless', dest = 'headless', action = 'store_true',
+                        help = "Run without a GUI, for example when HAL is controlled using TCP/IP.")
+    parser.add_argument('--import-profile', dest = 'import_profile', action = 'store_true',
+                        help = "Print how long it took to import each Python module.")
 
     args = parser.parse_args()
-    
+
+    if args.import_profile:
+        halStartup.startImportProfile()
+
+    # Qt still needs a display unless we tell it otherwise.
+    if args.headless:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
     # Start..
     app = QtWidgets.QApplication(sys.argv)
 
@@ -742,23 +888,30 @@ if (__name__ == "__main__"):
     app.setQuitOnLastWindowClosed(False)
 
     # Splash Screen.
-    pixmap = QtGui.QPixmap("splash.png")
-    splash = QtWidgets.QSplashScreen(pixmap)
-    splash.show()
-    app.processEvents()
+    if not args.headless:
+        pixmap = QtGui.QPixmap("splash.png")
+        splash = QtWidgets.QSplashScreen(pixmap)
+        splash.show()
+        app.processEvents()
 
     # Load configuration.
     config = params.config(args.config)
+    if args.headless:
+        config.set("ui_type", "headless")
 
     # Start logger.
-    hdebug.startLogging(config.get("directory") + "logs/", "hal4000")
+    hdebug.startLogging(config.get("directory") + "logs/",
+                        "hal4000",
+                        asynchronous = config.get("async_logging", False))
     
     # Setup HAL and all of the modules.
     hal = HalCore(config = config,
-                  parameters_file_name = args.default_xml)
+                  parameters_file_name = args.default_xml,
+                  show_gui = not args.headless)
 
     # Hide splash screen and start.
-    splash.hide()
+    if not args.headless:
+        splash.hide()
 
     # Configure ctrl-c handling.
     signal.signal(signal.SIGINT, ctrlCHandler)
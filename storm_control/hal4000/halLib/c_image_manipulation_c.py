@@ -10,6 +10,7 @@ Hazen 09/15
 """
 
 import ctypes
+import functools
 import math
 import numpy
 from numpy.ctypeslib import ndpointer
@@ -47,7 +48,7 @@ try:
     image_manip.rescaleImage111.argtypes = rescale_fn_arg_types
 
 except OSError:
-    print("C image manipulation library not found, reverting to numpy.")
+    print("C image manipulation library not found, reverting to look up tables.")
     image_manip = None
 
 
@@ -79,11 +80,25 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
     transpose - Transpose image.
     display_range - [image value that equals 0, image value that equals 255].
     saturated_value - The value above which the image has saturated the camera.
-    use_numpy - (optional) Use numpy even if the C library exists, defaults to False.
+    use_numpy - (optional) Use numpy arithmetic (rescaleImageNumpy()) even if
+                the C library exists, defaults to False.
+
+    If the C library does not exist this uses rescaleImageLUT().
 
     return [numpy.uint8 image, original image minimum, original image maximum]
     """
-    
+    if use_numpy:
+        return rescaleImageNumpy(image, flip_h, flip_v, transpose, display_range, saturated_value)
+    elif (image_manip is not None):
+        return rescaleImageC(image, flip_h, flip_v, transpose, display_range, saturated_value)
+    else:
+        return rescaleImageLUT(image, flip_h, flip_v, transpose, display_range, saturated_value)
+
+
+def rescaleImageC(image, flip_h, flip_v, transpose, display_range, saturated_value):
+    """
+    rescaleImage() using the C library.
+    """
     # Create a string specifying the operations that will be performed on the image.
     op_code = ""
     for op in [flip_h, flip_v, transpose]:
@@ -98,64 +113,135 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
     else:
         saturated_value = 65536
         max_range = 255.0
-        
-    # Use C library for image manipulation, this will be faster and less memory intensive.
-    if (image_manip is not None) and (not use_numpy):
 
-        if transpose:
-            rescaled = numpy.empty((image.shape[1], image.shape[0]), dtype = numpy.uint8)
-        else:
-            rescaled = numpy.empty((image.shape[0], image.shape[1]), dtype = numpy.uint8)
+    if transpose:
+        rescaled = numpy.empty((image.shape[1], image.shape[0]), dtype = numpy.uint8)
+    else:
+        rescaled = numpy.empty((image.shape[0], image.shape[1]), dtype = numpy.uint8)
+
+    image_min = ctypes.c_int(0)
+    image_max = ctypes.c_int(0)
 
-        image_min = ctypes.c_int(0)
-        image_max = ctypes.c_int(0)
+    # Get the appropriate C function based on the op_code.
+    image_fn = getattr(image_manip, "rescaleImage" + op_code)
 
-        # Get the appropriate C function based on the op_code.
-        image_fn = getattr(image_manip, "rescaleImage" + op_code)
+    image_fn(rescaled,
+             image,
+             image.shape[0],
+             image.shape[1],
+             display_range[0],
+             display_range[1],
+             saturated_value,
+             max_range,
+             ctypes.byref(image_min),
+             ctypes.byref(image_max))
 
-        image_fn(rescaled,
-                 image,
-                 image.shape[0],
-                 image.shape[1],
-                 display_range[0],
-                 display_range[1],
-                 saturated_value,
-                 max_range,
-                 ctypes.byref(image_min),
-                 ctypes.byref(image_max))
+    return [rescaled, image_min.value, image_max.value]
 
-        image_min = image_min.value
-        image_max = image_max.value
 
-    # Fall back to using numpy.
+def rescaleImageLUT(image, flip_h, flip_v, transpose, display_range, saturated_value):
+    """
+    rescaleImage() using a look up table (see rescaleTable()). This is
+    a single (numpy) pass over the image plus one each for the minimum
+    and the maximum, so it is several times faster than the numpy
+    arithmetic version and does not need the C library.
+    """
+    table = rescaleTable(display_range[0], display_range[1], saturated_value)
+
+    image_min = int(numpy.min(image))
+    image_max = int(numpy.max(image))
+
+    # The flips are free as the look up works on a view of the image
+    # and returns a contiguous array.
+    if flip_h:
+        image = numpy.fliplr(image)
+
+    if flip_v:
+        image = numpy.flipud(image)
+
+    rescaled = table[image]
+
+    if transpose:
+        rescaled = transposeImage(rescaled)
+
+    return [rescaled, image_min, image_max]
+
+
+def rescaleImageNumpy(image, flip_h, flip_v, transpose, display_range, saturated_value):
+    """
+    rescaleImage() using numpy arithmetic.
+    """
+    # Determine maximum in the rescaled image.
+    if saturated_value is not None:
+        max_range = 254.0
     else:
-        image_min = numpy.min(image)
-        image_max = numpy.max(image)
+        saturated_value = 65536
+        max_range = 255.0
+
+    image_min = numpy.min(image)
+    image_max = numpy.max(image)
             
-        if flip_h:
-            image = numpy.fliplr(image)
+    if flip_h:
+        image = numpy.fliplr(image)
             
-        if flip_v:
-            image = numpy.flipud(image)
+    if flip_v:
+        image = numpy.flipud(image)
 
-        if transpose:
-            image = numpy.transpose(image)
+    if transpose:
+        image = numpy.transpose(image)
         
-        rescaled = image.astype(numpy.float64)
-        rescaled = max_range*(rescaled - display_range[0])/(display_range[1] - display_range[0])
-        rescaled[(rescaled > max_range)] = max_range 
-        rescaled[(rescaled < 0.0)] = 0.0
+    rescaled = image.astype(numpy.float64)
+    rescaled = max_range*(rescaled - display_range[0])/(display_range[1] - display_range[0])
+    rescaled[(rescaled > max_range)] = max_range 
+    rescaled[(rescaled < 0.0)] = 0.0
         
-        # Check for saturated pixels
-        if saturated_value is not None:
-            rescaled[(image >= saturated_value)] = 255.0
+    # Check for saturated pixels
+    if saturated_value is not None:
+        rescaled[(image >= saturated_value)] = 255.0
 
-        # Convert to contiguous uint8 array.
-        rescaled += 0.5
-        rescaled = rescaled.astype(numpy.uint8, order='C')
+    # Convert to contiguous uint8 array.
+    rescaled += 0.5
+    rescaled = rescaled.astype(numpy.uint8, order='C')
 
     return [rescaled, image_min, image_max]
 
+
+@functools.lru_cache(maxsize = 16)
+def rescaleTable(display_min, display_max, saturated_value):
+    """
+    Returns a 65536 entry numpy.uint8 look up table that does the same
+    conversion as rescaleImageNumpy(). The tables are cached as the
+    display range does not change very often.
+    """
+    if saturated_value is not None:
+        max_range = 254.0
+    else:
+        saturated_value = 65536
+        max_range = 255.0
+
+    table = numpy.arange(65536, dtype = numpy.float64)
+    table = max_range*(table - display_min)/(display_max - display_min)
+    numpy.clip(table, 0.0, max_range, out = table)
+    table += 0.5
+    table = table.astype(numpy.uint8)
+    table[int(saturated_value):] = 255
+
+    # The tables are shared, so make sure they don't get changed.
+    table.flags.writeable = False
+    return table
+
+
+def transposeImage(image, band = 256):
+    """
+    Returns a contiguous transposed copy of image. This copies bands
+    of rows, which is several times faster than numpy.ascontiguousarray()
+    of the transpose for large images.
+    """
+    transposed = numpy.empty((image.shape[1], image.shape[0]), dtype = image.dtype)
+    for i in range(0, image.shape[0], band):
+        transposed[:,i:i+band] = image[i:i+band,:].T
+    return transposed
+
             
 #
 # The MIT License
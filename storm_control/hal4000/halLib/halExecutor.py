@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""
+Serial executors, these run tasks one at a time in the order in
+which they were submitted in a long-lived thread.
+
+Each HalModule has one of these for its workers (runWorkerTask()),
+and so does each hardwareModule.BufferedFunctionality. This avoids
+creating a QRunnable (and a QObject for its signals) for every task,
+which adds up for things like stage and QPD polling.
+
+Tasks that are submitted with a key replace any task with the same
+key that is still waiting to run, i.e. only the latest one is run
+(in the position of the latest one). A task that is submitted when
+the executor is idle is not replaced as it runs immediately. This
+is what maybeRun() in BufferedFunctionality uses.
+
+The thread exits if there is nothing to do for 'idle_time' seconds
+and is re-started by the next submit().
+
+The number of tasks that are waiting to run can be limited with
+'max_queue'. What happens to a task that is submitted when the queue
+is full depends on the 'policy', one of:
+
+  "block" - submit() waits until there is space in the queue.
+  "drop oldest" - The oldest waiting task is dropped.
+  "fail" - The task is not queued and submit() returns False.
+  "merge" - A task that is identical to the last task in the queue
+            (same function and arguments) is merged with it, whether
+            or not the queue is full. Other tasks are handled as with
+            "block".
+"""
+import threading
+import time
+import traceback
+import weakref
+
+from collections import deque
+
+import storm_control.hal4000.halLib.halStatistics as halStatistics
+
+
+# All the executors, for getStatistics().
+executors = weakref.WeakSet()
+
+policies = ["block", "drop oldest", "fail", "merge"]
+
+def waitForDone():
+    """
+    Wait until all the executors have run all their tasks.
+    """
+    for executor in list(executors):
+        executor.waitForDone()
+
+
+def getStatistics():
+    """
+    Returns a dictionary of the statistics of all the executors. Executors
+    with the same name are numbered.
+    """
+    stats = {}
+    for executor in sorted(list(executors), key = lambda x: x.name):
+        name = executor.name
+        i = 2
+        while name in stats:
+            name = executor.name + " " + str(i)
+            i += 1
+        stats[name] = executor.getStatistics()
+    return stats
+
+
+class SerialExecutor(object):
+
+    def __init__(self, name = "", idle_time = 5.0, max_queue = 0, policy = "fail", **kwds):
+        """
+        max_queue is the maximum number of tasks that can be waiting to run,
+        0 is no limit. policy is what to do when the queue is full.
+        """
+        super().__init__(**kwds)
+        if not policy in policies:
+            raise ValueError("Unknown executor policy '" + str(policy) + "'")
+        self.accepting = True
+        self.busy = False
+        self.condition = threading.Condition()
+        self.idle_time = idle_time
+        self.max_queue = max_queue
+        self.name = name
+        self.pending = {}
+        self.policy = policy
+        self.queue = deque()
+        self.thread = None
+
+        # Counters.
+        self.max_queue_length = 0
+        self.n_blocked = 0
+        self.n_coalesced = 0
+        self.n_dropped = 0
+        self.n_merged = 0
+        self.n_rejected = 0
+        self.n_run = 0
+        self.n_threads = 0
+        self.run_time = halStatistics.Histogram()
+        self.wait_time = halStatistics.Histogram()
+
+        executors.add(self)
+
+    def getQueueLength(self):
+        return len(self.queue)
+
+    def getStatistics(self):
+        with self.condition:
+            return {"queue length" : len(self.queue),
+                    "max queue length" : self.max_queue_length,
+                    "policy" : self.policy,
+                    "blocked" : self.n_blocked,
+                    "coalesced" : self.n_coalesced,
+                    "dropped" : self.n_dropped,
+                    "merged" : self.n_merged,
+                    "rejected" : self.n_rejected,
+                    "run" : self.n_run,
+                    "threads started" : self.n_threads,
+                    "run time" : self.run_time.toDict(),
+                    "wait time" : self.wait_time.toDict()}
+
+    def isBusy(self):
+        """
+        Returns True if a task is running or waiting to run.
+        """
+        with self.condition:
+            return self.busy or (len(self.queue) > 0)
+
+    def isDuplicate(self, task, args):
+        """
+        Returns True if task(*args) is the same as the last task in the queue.
+        """
+        if (len(self.queue) == 0):
+            return False
+        last = self.queue[-1]
+        return (last[0] is None) and (last[1] == task) and (last[2] == args)
+
+    def isFull(self):
+        return (self.max_queue > 0) and (len(self.queue) >= self.max_queue)
+
+    def run(self):
+        while True:
+            with self.condition:
+                if (len(self.queue) == 0) and self.accepting:
+                    self.condition.wait(self.idle_time)
+
+                if (len(self.queue) == 0):
+                    self.thread = None
+                    self.condition.notify_all()
+                    return
+
+                [key, task, args, submit_time] = self.queue.popleft()
+                if key is not None:
+                    del self.pending[key]
+                self.busy = True
+
+                # Wake up anyone that is blocked in submit().
+                self.condition.notify_all()
+
+            start_time = time.perf_counter()
+            self.wait_time.add(start_time - submit_time)
+            try:
+                task(*args)
+            except Exception:
+                print("Exception in '" + self.name + "' executor task:")
+                traceback.print_exc()
+            finally:
+                self.run_time.add(time.perf_counter() - start_time)
+                with self.condition:
+                    self.busy = False
+                    self.n_run += 1
+                    self.condition.notify_all()
+
+    def stop(self):
+        """
+        Stop accepting tasks and wait for the ones that are queued to run.
+        """
+        with self.condition:
+            self.accepting = False
+            self.condition.notify_all()
+        self.waitForDone()
+
+    def submit(self, task, args = (), key = None):
+        """
+        Run task(*args), returns False if the task was not queued
+        because the queue is full or the executor was stopped.
+        """
+        with self.condition:
+            if not self.accepting:
+                return False
+
+            if (key is not None) and (key in self.pending):
+                self.queue.remove(self.pending[key])
+                self.n_coalesced += 1
+
+            elif (self.policy == "merge") and self.isDuplicate(task, args):
+                self.n_merged += 1
+                return True
+
+            elif self.isFull():
+                if (self.policy == "block") or (self.policy == "merge"):
+
+                    # Don't block the executor's own thread, this would
+                    # never return.
+                    if (self.thread is not threading.current_thread()):
+                        self.n_blocked += 1
+                        while self.isFull() and self.accepting:
+                            self.condition.wait()
+                        if not self.accepting:
+                            return False
+
+                elif (self.policy == "drop oldest"):
+                    dropped = self.queue.popleft()
+                    if dropped[0] is not None:
+                        del self.pending[dropped[0]]
+                    self.n_dropped += 1
+
+                else:
+                    self.n_rejected += 1
+                    return False
+
+            # If the executor is idle the task will start now, so it
+            # won't be replaced.
+            entry = [key, task, args, time.perf_counter()]
+            if (key is not None) and (self.busy or (len(self.queue) > 0)):
+                self.pending[key] = entry
+            else:
+                entry[0] = None
+            self.queue.append(entry)
+            if (len(self.queue) > self.max_queue_length):
+                self.max_queue_length = len(self.queue)
+
+            if self.thread is None:
+                self.n_threads += 1
+                self.thread = threading.Thread(target = self.run,
+                                               name = self.name,
+                                               daemon = True)
+                self.thread.start()
+            else:
+                self.condition.notify()
+        return True
+
+    def waitForDone(self):
+        """
+        Wait until all the tasks have run.
+        """
+        with self.condition:
+            while self.busy or (len(self.queue) > 0):
+                self.condition.wait()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -37,14 +37,33 @@ message_id = 0
 #
 valid_messages = {}
 
-def addMessage(name, validator = {}, check_exists = True):
+#
+# The MessageValidator for each of the valid messages, these are
+# created by addMessage() and initializeMessages().
+#
+message_validators = {}
+
+#
+# The priority lanes of HalCore's message queue, highest priority
+# first (see halLib.halMessageQueue), and the lane of each message
+# type that is not in the 'normal' lane.
+#
+lanes = ["control", "normal", "cosmetic"]
+message_lanes = {}
+
+def addMessage(name, validator = {}, check_exists = True, lane = "normal"):
     """
     Modules should call this function at initialization to add additional messages.
     """
     global valid_messages
     if check_exists and name in valid_messages:
         raise halExceptions.HalException("Message " + name + " already exists!")
+    if not lane in lanes:
+        raise halExceptions.HalException("Unknown lane " + lane + " for message " + name + ".")
     valid_messages[name] = validator
+    message_validators[name] = MessageValidator(validator)
+    if (lane != "normal"):
+        message_lanes[name] = lane
     
 
 def chainMessages(send_fn, messages):
@@ -125,6 +144,12 @@ def initializeMessages():
         'get functionality' : {"data" : {"name" : [True, str],
                                          "extra data" : [False, str]},
                                "resp" : {"functionality" : [True, halFunctionality.HalFunctionality]}},
+
+        # Query HAL's message passing statistics, see halLib.halStatistics.
+        # HalCore responds to this message. If 'reset' is True the statistics
+        # are reset after they are returned.
+        'get statistics' : {"data" : {"reset" : [False, bool]},
+                            "resp" : {"statistics" : [True, dict]}},
         
         'initial parameters' :  {"data" : {"parameters" : [True, params.StormXMLObject]},
                                  "resp" : None},
@@ -149,7 +174,75 @@ def initializeMessages():
         'wait for' : {"data" : {"module names" : [True, list]}, "resp" : None}
     }
 
+    global message_lanes
+    message_lanes = {'show' : "cosmetic"}
+
+    global message_validators
+    message_validators = {}
+    for [name, validator] in valid_messages.items():
+        message_validators[name] = MessageValidator(validator)
+
     
+def compileValidator(validator):
+    """
+    Returns a function that does the same checks as validate(), but
+    faster. The function returns None if the data (or response) is
+    valid, otherwise it returns the end of the error message.
+    """
+    if validator is None:
+        def check(data):
+            if data is not None:
+                return "' should not have data."
+        return check
+
+    items = list(validator)
+    required = frozenset(filter(lambda x: validator[x][0], items))
+    types = dict(map(lambda x: [x, validator[x][1]], items))
+
+    def check(data):
+        if data is None:
+            if (len(required) > 0):
+                return "' should have data."
+            return None
+
+        # The usual case, everything is fine.
+        try:
+            for [item, value] in data.items():
+                a_type = types.get(item)
+                if (a_type is None) or not isinstance(value, a_type):
+                    break
+            else:
+                if (required <= data.keys()):
+                    return None
+        except AttributeError:
+            pass
+
+        # Find the same error that validate() would have found.
+        for item in data:
+            if not item in types:
+                return "' has an unexpected field '" + item + "'."
+
+        for item in items:
+            if (not item in data) and (item in required):
+                return "' does not have required item '" + item + "'."
+
+            if item in data:
+                if not isinstance(data[item], types[item]):
+                    msg = "' is not the expected type, got '"
+                    msg += str(type(data[item])) + "' expected '" + str(types[item])
+                    msg += " for item '" + item + "'."
+                    return msg
+
+    return check
+
+
+def getLane(m_type):
+    """
+    Returns the priority lane of a message type.
+    """
+    return message_lanes.get(m_type, "normal")
+
+
 def isValidMessageName(name):
     """
     Modules can call this function to verify that 'name' is a message
@@ -226,6 +319,46 @@ class HalMessageException(halExceptions.HalException):
     pass
 
 
+class MessageValidator(object):
+    """
+    The compiled data and response validators for a message type.
+
+    HalCore uses these in strict mode. It can also be configured to
+    only check the first N messages of each type (see 'strict_samples'
+    in xml/exampleScopeConfig/none_config.xml), n_validated is the
+    number of messages of this type that have been checked.
+    """
+    def __init__(self, validator, **kwds):
+        super().__init__(**kwds)
+        self.check_data = compileValidator(validator.get("data"))
+        self.check_response = compileValidator(validator.get("resp"))
+        self.n_validated = 0
+
+    def shouldValidate(self, n_samples):
+        """
+        Returns True if the message should be validated, n_samples
+        is the number to check, 0 means check all of them.
+        """
+        if (n_samples == 0) or (self.n_validated < n_samples):
+            self.n_validated += 1
+            return True
+        return False
+
+    def validateData(self, message):
+        error = self.check_data(message.getData())
+        if error is not None:
+            base_string = "Data in message '" + message.m_type + "' from '"
+            base_string += message.getSourceName()
+            raise HalMessageException(base_string + error)
+
+    def validateResponse(self, message, response):
+        error = self.check_response(response.getData())
+        if error is not None:
+            base_string = "Response from '" + response.source + "' in message '"
+            base_string += message.m_type + "' from '" + message.getSourceName()
+            raise HalMessageException(base_string + error)
+
+
 class HalMessage(QtCore.QObject):
     istype_warned = {}    
     processed = QtCore.pyqtSignal(object)
@@ -276,6 +409,13 @@ class HalMessage(QtCore.QObject):
         self.source = source
         self.sync = sync
 
+        # These are set by HalCore, for the statistics and validation.
+        self.lane = None
+        self.time_blocked = None
+        self.time_queued = None
+        self.time_sent = None
+        self.validated = False
+
         global message_id
         self.m_id = message_id
         message_id += 1
@@ -294,7 +434,7 @@ class HalMessage(QtCore.QObject):
 
         # This is helpful for debugging who has not responded to the message.
         if True:
-            hdebug.logText(",".join(["handled by", str(self.m_id), str(name), self.m_type]))
+            hdebug.logText("handled by,{0},{1},{2}", self.m_id, name, self.m_type)
             
         self.ref_count -= 1
         if (self.ref_count == 0):
@@ -352,8 +492,16 @@ class HalMessage(QtCore.QObject):
                 self.istype_warned[m_type] = True
         return (self.m_type == m_type)
 
-    def logEvent(self, event_name):
-        hdebug.logText(",".join([event_name, str(self.m_id), self.source.module_name, self.m_type]))
+    def logEvent(self, event_name, *args):
+        """
+        args are any additional fields, for example the name of
+        the module whose worker started.
+        """
+        if (len(args) == 0):
+            hdebug.logText("{0},{1},{2},{3}", event_name, self.m_id, self.source.module_name, self.m_type)
+        else:
+            a_format = "{0},{1},{2},{3}" + "".join(map(lambda x: ",{" + str(x + 4) + "}", range(len(args))))
+            hdebug.logText(a_format, event_name, self.m_id, self.source.module_name, self.m_type, *args)
 
 #    def refCountIsZero(self):
 #        return (self.ref_count == 0)
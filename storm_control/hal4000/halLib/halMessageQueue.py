@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+HalCore's queue of messages that are waiting to be sent.
+
+Each message type has a priority lane (see halMessage.lanes), these
+are 'control' for messages like 'stop film' that should not wait
+behind anything else, 'normal' for most messages, and 'cosmetic'
+for messages that only update the GUI.
+
+The next message is the oldest message in the highest priority lane,
+with one exception. Messages from the same module are always sent in
+the order in which the module sent them. Modules often send several
+messages in a row that depend on each other (or a 'sync' message
+between them), so a message can't overtake an earlier message from
+the same module even if it has a higher priority.
+"""
+from collections import deque
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+
+
+class MessageQueue(object):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.lanes = {}
+        self.n_messages = 0
+        self.sources = {}
+
+        for lane in halMessage.lanes:
+            self.lanes[lane] = deque()
+
+    def __len__(self):
+        return self.n_messages
+
+    def append(self, message):
+        message.lane = halMessage.getLane(message.m_type)
+        self.lanes[message.lane].append(message)
+
+        source_name = message.getSourceName()
+        if not source_name in self.sources:
+            self.sources[source_name] = deque()
+        self.sources[source_name].append(message)
+        self.n_messages += 1
+
+    def next(self):
+        """
+        Returns the next message to send, but does not remove it
+        from the queue, or None if the queue is empty.
+        """
+        for lane in halMessage.lanes:
+            for message in self.lanes[lane]:
+                if self.sources[message.getSourceName()][0] is message:
+                    return message
+        return None
+
+    def remove(self, message):
+        """
+        Remove a message that was returned by next().
+        """
+        self.lanes[message.lane].remove(message)
+
+        source_name = message.getSourceName()
+        self.sources[source_name].popleft()
+        if (len(self.sources[source_name]) == 0):
+            del self.sources[source_name]
+        self.n_messages -= 1
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -7,6 +7,7 @@ Hazen 01/17
 """
 
 import faulthandler
+import time
 import traceback
 
 from collections import deque
@@ -15,8 +16,10 @@ from PyQt5 import QtCore, QtWidgets
 
 import storm_control.sc_library.halExceptions as halExceptions
 
+import storm_control.hal4000.halLib.halExecutor as halExecutor
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
+import storm_control.hal4000.halLib.halStatistics as halStatistics
 
 
 threadpool = QtCore.QThreadPool.globalInstance()
@@ -26,6 +29,16 @@ threadpool = QtCore.QThreadPool.globalInstance()
 # benefit of QT signalling.
 max_job_time = -1
 
+def createHalWorker(module):
+    """
+    Returns a HalWorker that is connected to module.
+    """
+    hal_worker = HalWorker()
+    hal_worker.hwsignaler.workerDone.connect(module.handleWorkerDone)
+    hal_worker.hwsignaler.workerError.connect(module.handleWorkerError)
+    hal_worker.hwsignaler.workerStarted.connect(module.handleWorkerStarted)
+    return hal_worker
+
 def runWorkerTask(module, message, task, job_time_ms = None):
     """
     Use this to handle long running (non-GUI) tasks. See
@@ -35,6 +48,10 @@ def runWorkerTask(module, message, task, job_time_ms = None):
 
     Note: Only one of these can be run at a time (per module) in order 
           to gaurantee that messages are handled serially.
+
+    The worker is run by the module's executor, and the module re-uses
+    the same HalWorker for all its tasks. If the module's worker is still
+    busy with another task a new HalWorker is used instead.
     """
     if job_time_ms is None:
         job_time_ms = max_job_time
@@ -42,27 +59,27 @@ def runWorkerTask(module, message, task, job_time_ms = None):
     # Increment the count because once this message is handed off
     # HalModule will automatically decrement the count.
     message.incRefCount()
-    ct_task = HalWorker(job_time_ms = job_time_ms,
-                        message = message,
-                        task = task)
-    ct_task.hwsignaler.workerDone.connect(module.handleWorkerDone)
-    ct_task.hwsignaler.workerError.connect(module.handleWorkerError)
-    ct_task.hwsignaler.workerStarted.connect(module.handleWorkerStarted)
-
-    # We need to manage the tasks ourselves because otherwise we'll
-    # experience strange/sporadic errors like the GUI freezing.
-    ct_task.setAutoDelete(False)
+    if module.worker is not None:
+        ct_task = createHalWorker(module)
+    else:
+        if module.hal_worker is None:
+            module.hal_worker = createHalWorker(module)
+        ct_task = module.hal_worker
+
+    ct_task.setTask(job_time_ms = job_time_ms,
+                    message = message,
+                    task = task)
     module.worker = ct_task
 
     # Run worker.
-    threadpool.start(ct_task)
+    module.executor.submit(ct_task.run)
 
 
 class HalWorkerSignaler(QtCore.QObject):
     """
     A signaler class for HalWorker.
     """
-    workerDone = QtCore.pyqtSignal(object)
+    workerDone = QtCore.pyqtSignal(object, float)
     workerError = QtCore.pyqtSignal(object, object, str)
     workerStarted = QtCore.pyqtSignal(object, int)
 
@@ -81,6 +98,7 @@ class HalWorker(QtCore.QRunnable):
         super().__init__(**kwds)
         self.job_time_ms = job_time_ms
         self.message = message
+        self.run_time = 0.0
         self.task = task
         self.task_complete = False
             
@@ -90,9 +108,11 @@ class HalWorker(QtCore.QRunnable):
         return self.task_complete
     
     def run(self):
+        self.task_complete = False
         self.hwsignaler.workerStarted.emit(self.message,
                                            self.job_time_ms)
         
+        start_time = time.perf_counter()
         try:
             self.task()
         except Exception as exception:
@@ -100,9 +120,20 @@ class HalWorker(QtCore.QRunnable):
                                              exception,
                                              traceback.format_exc())
         finally:
+            self.run_time = time.perf_counter() - start_time
             self.task_complete = True
             
-        self.hwsignaler.workerDone.emit(self.message)
+        self.hwsignaler.workerDone.emit(self.message, self.run_time)
+
+    def setTask(self, job_time_ms = -1, message = None, task = None):
+        """
+        For re-using this worker for another task.
+        """
+        self.job_time_ms = job_time_ms
+        self.message = message
+        self.run_time = 0.0
+        self.task = task
+        self.task_complete = False
 
     def timeout(self, signum, frame):
         raise halExceptions.HalException("Job timed out!")        
@@ -128,13 +159,20 @@ class HalModule(QtCore.QObject):
        1. self.view is the GUI view, if any that is associated with this module.
        2. self.control is the controller, if any.
 
+    Modules that only handle a few types of messages can list them in
+    message_types, then HAL will only send them those messages. The
+    default (None) is to send them every message.
     """
     newMessage = QtCore.pyqtSignal(object)
 
+    message_types = None
+
     def __init__(self, module_name = "", **kwds):
         super().__init__(**kwds)
         self.module_name = module_name
 
+        self.executor = halExecutor.SerialExecutor(name = module_name)
+        self.hal_worker = None
         self.queued_messages = deque()
         self.worker = None
 
@@ -160,11 +198,8 @@ class HalModule(QtCore.QObject):
 
     def cleanUpWorker(self):
         """
-        Disconnects any workers that have finished and discard them.
+        Called when the worker has finished.
         """
-        self.worker.hwsignaler.workerDone.disconnect(self.handleWorkerDone)
-        self.worker.hwsignaler.workerError.disconnect(self.handleWorkerError)
-        self.worker.hwsignaler.workerStarted.disconnect(self.handleWorkerStarted)
         self.worker = None
 
         # Stop the worker timer.
@@ -187,6 +222,13 @@ class HalModule(QtCore.QObject):
             else:
                 return self.view.findChild(qt_type, name, options)
 
+    def getMessageTypes(self):
+        """
+        Returns the types of messages that this module handles, or
+        None if it should get all the messages.
+        """
+        return self.message_types
+
     def handleError(self, message, m_error):
         """
         Override this with class specific error handling.
@@ -247,17 +289,22 @@ class HalModule(QtCore.QObject):
         """
         return False
 
-    def handleWorkerDone(self, message):
+    def handleWorkerDone(self, message, run_time):
         """
         You probably don't want to override this..
+
+        run_time is how long the task took in seconds.
         """
         message.decRefCount(name = self.module_name)
 
         # Log when the worker finished.
-        message.logEvent("worker done")
+        message.logEvent("worker done", self.module_name)
+        halStatistics.statistics.addWorker(self.module_name, message.m_type, run_time)
 
-        # Cleanup the worker.
-        self.cleanUpWorker()
+        # Cleanup the worker, unless this was an earlier worker that
+        # finished while another one is running.
+        if self.isCurrentWorker(message):
+            self.cleanUpWorker()
         
     def handleWorkerError(self, message, exception, stack_trace):
         """
@@ -272,16 +319,18 @@ class HalModule(QtCore.QObject):
         message.decRefCount(name = self.module_name)
 
         # Log when the worker failed.
-        message.logEvent("worker failed")
+        message.logEvent("worker failed", self.module_name)
 
-        # Cleanup the worker.
-        self.cleanUpWorker()
+        # Cleanup the worker, unless this was an earlier worker that
+        # finished while another one is running.
+        if self.isCurrentWorker(message):
+            self.cleanUpWorker()
 
     def handleWorkerStarted(self, message, job_time_ms):
         """
         You probably don't want to override this..
         """
-        message.logEvent("worker started {0:0d}".format(job_time_ms))
+        message.logEvent("worker started", self.module_name, job_time_ms)
         if (job_time_ms > 0):
             self.worker_timer.setInterval(job_time_ms)
             self.worker_timer.start()
@@ -303,6 +352,25 @@ class HalModule(QtCore.QObject):
         e_string = "HALWorker for '" + self.module_name + "' module timed out handling '" + self.worker.message.m_type + "'!"
         raise halExceptions.HalException(e_string)
         
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Override this to do slow hardware initialization (such as opening
+        a serial port) before the module is created. HAL does this in a
+        thread pool thread, in parallel with the creation of the other
+        modules, so this must not create any Qt objects.
+
+        The return value is passed to the module's constructor as the
+        'hardware' keyword argument.
+        """
+        return None
+
+    def isCurrentWorker(self, message):
+        """
+        Returns True if message is being handled by self.worker.
+        """
+        return (self.worker is not None) and (self.worker.message is message)
+
     def processMessage(self, message):
         """
         Override with class specific handling of messages.
@@ -319,6 +387,7 @@ class HalModule(QtCore.QObject):
         # Get the next message from the queue.
         message = self.queued_messages.popleft()
 
+        start_time = time.perf_counter()
         try:
             self.processMessage(message)
         except Exception as exception:
@@ -326,6 +395,7 @@ class HalModule(QtCore.QObject):
                                                         message = str(exception),
                                                         m_exception = exception,
                                                         stack_trace = traceback.format_exc()))
+        halStatistics.statistics.addProcessed(self.module_name, message.m_type, time.perf_counter() - start_time)
         message.decRefCount(name = self.module_name)
 
         # Check if this is being handled by a worker. If it is then we
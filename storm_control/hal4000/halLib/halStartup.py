@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""
+Creates HAL's modules at start up.
+
+Modules are created one at a time in HAL's main thread, as they
+create Qt objects (and possibly GUI elements). However modules can
+override HalModule.initializeHardware() to do slow hardware
+initialization, such as opening a camera or a serial port, before
+they are created. This is done in a thread pool thread, so the
+hardware of all the modules is initialized in parallel and in
+parallel with the creation of the other modules.
+
+A module can list modules that need to be created before it is
+initialized and created using 'start_after' in its configuration,
+for example if two modules share the same hardware controller.
+Other than this modules don't depend on each other when they are
+being created, they only start talking to each other (and asking
+for each other's functionalities) in the 'configure1' message.
+
+The start up time of each module is recorded in 'startup_times'.
+
+ImportProfiler records how long it takes to import each Python
+module (like 'python -X importtime'). HAL uses this when it is
+started with the --import-profile option.
+"""
+import importlib
+import sys
+import threading
+import time
+import traceback
+
+from PyQt5 import QtCore
+
+import storm_control.sc_library.halExceptions as halExceptions
+
+import storm_control.hal4000.halLib.halModule as halModule
+
+
+import_profiler = None
+
+def hasHardware(a_class):
+    """
+    Returns True if a_class overrides HalModule.initializeHardware().
+    """
+    return (a_class.initializeHardware.__func__ != halModule.HalModule.initializeHardware.__func__)
+
+
+def startImportProfile():
+    """
+    Start recording how long imports take.
+    """
+    global import_profiler
+    import_profiler = ImportProfiler()
+    sys.meta_path.insert(0, import_profiler)
+
+
+class ImportProfiler(object):
+    """
+    This is a meta path finder that doesn't find anything itself, it
+    wraps the exec_module() method of the loaders that the other finders
+    find in order to time how long each module takes to execute.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.stacks = {}
+        self.times = {}
+
+    def find_spec(self, fullname, path, target = None):
+        for finder in sys.meta_path:
+            if (finder is self) or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+
+                # Some loaders (i.e. for built-in modules) are classes and
+                # are shared by all the modules they load, don't touch these.
+                loader = spec.loader
+                if (loader is not None) and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+                    self.wrapLoader(fullname, loader)
+                return spec
+        return None
+
+    def printProfile(self, n_modules = 20):
+        print("Import profile (ms), the " + str(n_modules) + " slowest modules:")
+        print("  {0:40s} {1:>8s} {2:>8s}".format("module", "self", "total"))
+        for [name, [self_time, total_time]] in sorted(self.times.items(), key = lambda x: -x[1][0])[:n_modules]:
+            print("  {0:40s} {1:8.1f} {2:8.1f}".format(name, 1000.0 * self_time, 1000.0 * total_time))
+        total = sum(map(lambda x: x[0], self.times.values()))
+        print("  {0:40s} {1:8.1f}".format("total (" + str(len(self.times)) + " modules)", 1000.0 * total))
+        print("")
+
+    def wrapLoader(self, fullname, loader):
+        exec_module = loader.exec_module
+
+        def timedExecModule(module):
+            # The time spent importing other modules is subtracted from
+            # this modules 'self' time. Modules can be imported in more
+            # than one thread, so there is a stack for each thread.
+            stack = self.stacks.setdefault(threading.get_ident(), [])
+            stack.append(0.0)
+            start_time = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                total_time = time.perf_counter() - start_time
+                self_time = total_time - stack.pop()
+                if (len(stack) > 0):
+                    stack[-1] += total_time
+                self.times[fullname] = [self_time, total_time]
+                del loader.exec_module
+
+        loader.exec_module = timedExecModule
+
+
+class HardwareInitializer(QtCore.QRunnable):
+    """
+    Calls a module's initializeHardware() method in a thread pool thread.
+    """
+    def __init__(self, a_class = None, module_name = None, module_params = None, scheduler = None, **kwds):
+        super().__init__(**kwds)
+        self.a_class = a_class
+        self.exception = None
+        self.hardware = None
+        self.hardware_time = 0.0
+        self.module_name = module_name
+        self.module_params = module_params
+        self.scheduler = scheduler
+        self.stack_trace = None
+
+        self.setAutoDelete(False)
+
+    def run(self):
+        start_time = time.perf_counter()
+        try:
+            self.hardware = self.a_class.initializeHardware(self.module_params)
+        except Exception as exception:
+            self.exception = exception
+            self.stack_trace = traceback.format_exc()
+        self.hardware_time = time.perf_counter() - start_time
+        self.scheduler.initializerDone(self)
+
+
+class StartupScheduler(object):
+    """
+    Creates the modules, this is used by HalCore.
+    """
+    def __init__(self, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.done = []
+        self.initializers = []
+        self.modules = []
+        self.mutex = QtCore.QMutex()
+        self.qt_settings = qt_settings
+        self.startup_times = {}
+        self.total_time = 0.0
+        self.wait_condition = QtCore.QWaitCondition()
+
+    def addModule(self, module_name, module_params):
+        """
+        Modules are returned by createModules() in the order in which
+        they were added.
+        """
+        start_after = module_params.get("start_after", "")
+        if (len(start_after) > 0):
+            start_after = list(map(lambda x: x.strip(), start_after.split(",")))
+        else:
+            start_after = []
+        self.modules.append({"name" : module_name,
+                             "params" : module_params,
+                             "start after" : start_after})
+
+    def createModule(self, module, created, created_fn):
+        """
+        Create a module (in the main thread).
+        """
+        kwds = {}
+        if hasHardware(module["class"]):
+            kwds["hardware"] = module["hardware"]
+
+        start_time = time.perf_counter()
+        a_object = module["class"](module_name = module["name"],
+                                   module_params = module["params"],
+                                   qt_settings = self.qt_settings,
+                                   **kwds)
+        self.startup_times[module["name"]]["create ms"] = 1000.0 * (time.perf_counter() - start_time)
+
+        created[module["name"]] = a_object
+        if created_fn is not None:
+            created_fn(module["name"], a_object)
+
+    def createModules(self, created_fn = None):
+        """
+        Create all the modules and return them as a list of
+        [module_name, module] pairs. created_fn is called (in the
+        main thread) as soon as each module is created.
+        """
+        module_names = list(map(lambda x: x["name"], self.modules))
+        for module in self.modules:
+            for name in module["start after"]:
+                if not name in module_names:
+                    raise halExceptions.HalException("Module '" + module["name"] + "' starts after unknown module '" + name + "'.")
+
+        start_time = time.perf_counter()
+
+        # Import the modules.
+        for module in self.modules:
+            import_start = time.perf_counter()
+            a_module = importlib.import_module(module["params"].get("module_name"))
+            module["class"] = getattr(a_module, module["params"].get("class_name"))
+            module["started"] = False
+            self.startup_times[module["name"]] = {"import ms" : 1000.0 * (time.perf_counter() - import_start),
+                                                  "hardware ms" : 0.0,
+                                                  "create ms" : 0.0}
+
+        #
+        # Initializing hardware is mostly waiting for the hardware to respond,
+        # so we want a thread for every module that does this even if the
+        # computer does not have that many cores.
+        #
+        max_thread_count = halModule.threadpool.maxThreadCount()
+        n_hardware = len(list(filter(lambda x: hasHardware(x["class"]), self.modules)))
+        halModule.threadpool.setMaxThreadCount(max(max_thread_count, n_hardware))
+
+        try:
+            created = {}
+            n_running = 0
+            pending = list(self.modules)
+            while (len(pending) > 0):
+                ready = list(filter(lambda x: all(map(lambda y: y in created, x["start after"])), pending))
+
+                # Start initializing the hardware of all the modules that are ready.
+                for module in ready:
+                    if hasHardware(module["class"]) and not module["started"]:
+                        module["started"] = True
+                        n_running += 1
+
+                        # We need to keep a reference to the initializer, otherwise
+                        # Python will garbage collect it.
+                        initializer = HardwareInitializer(a_class = module["class"],
+                                                          module_name = module["name"],
+                                                          module_params = module["params"],
+                                                          scheduler = self)
+                        self.initializers.append(initializer)
+                        halModule.threadpool.start(initializer)
+
+                # Create the first module that is ready.
+                ready = list(filter(lambda x: (not hasHardware(x["class"])) or ("hardware" in x), ready))
+                if (len(ready) > 0):
+                    pending.remove(ready[0])
+                    self.createModule(ready[0], created, created_fn)
+
+                # Otherwise wait for some hardware to be initialized.
+                elif (n_running > 0):
+                    self.mutex.lock()
+                    if (len(self.done) == 0):
+                        self.wait_condition.wait(self.mutex)
+                    done = self.done
+                    self.done = []
+                    self.mutex.unlock()
+
+                    for initializer in done:
+                        n_running -= 1
+                        if initializer.exception is not None:
+                            print("Failed to initialize hardware for module '" + initializer.module_name + "'")
+                            print(initializer.stack_trace)
+                            raise initializer.exception
+                        module = self.modules[module_names.index(initializer.module_name)]
+                        module["hardware"] = initializer.hardware
+                        self.startup_times[module["name"]]["hardware ms"] = 1000.0 * initializer.hardware_time
+
+                else:
+                    names = ", ".join(map(lambda x: x["name"], pending))
+                    raise halExceptions.HalException("Circular 'start_after' dependencies in modules " + names + ".")
+
+        finally:
+            halModule.threadpool.setMaxThreadCount(max_thread_count)
+            self.initializers = []
+
+        self.total_time = time.perf_counter() - start_time
+        return list(map(lambda x: [x, created[x]], module_names))
+
+    def initializerDone(self, initializer):
+        """
+        Called by HardwareInitializer (in a thread pool thread).
+        """
+        self.mutex.lock()
+        self.done.append(initializer)
+        self.wait_condition.wakeAll()
+        self.mutex.unlock()
+
+    def printStartupTimes(self):
+        print("Module start up times (ms):")
+        print("  {0:20s} {1:>8s} {2:>8s} {3:>8s}".format("module", "import", "hardware", "create"))
+        for [module_name, times] in sorted(self.startup_times.items(), key = lambda x: -(x[1]["hardware ms"] + x[1]["create ms"])):
+            print("  {0:20s} {1:8.1f} {2:8.1f} {3:8.1f}".format(module_name,
+                                                              times["import ms"],
+                                                              times["hardware ms"],
+                                                              times["create ms"]))
+        print("  {0:20s} {1:8.1f}".format("total", 1000.0 * self.total_time))
+        print("")
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
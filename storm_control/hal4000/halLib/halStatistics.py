@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Message passing statistics for HAL. These are collected by HalCore
+and HalModule and are available using the 'get statistics' message.
+
+All the times are kept in fixed size histograms so the overhead of
+recording them is small and constant, however long HAL runs.
+
+The statistics are:
+  messages - For each message type, the number of times it was sent,
+             how long it waited in HalCore's queue and how long it
+             took to finalize (i.e. for all the modules to process it).
+
+  lanes - For each priority lane of HalCore's queue, the number of
+          messages sent, how long they waited in the queue and how
+          long 'sync' messages blocked the lane (see halMessageQueue).
+
+  modules - For each module and message type, how long processMessage()
+            took and how long the worker (if any) took.
+
+  startup - For each module, how long it took to import, to initialize
+            the hardware and to create (see halStartup).
+
+HalCore also adds the statistics of the executors (see halExecutor),
+these are not reset.
+"""
+import time
+
+
+class Histogram(object):
+    """
+    A histogram of times with logarithmic (factor of 2) bins. Bin 0
+    is times less than 1us, bin i is times from 2^(i-1) to 2^i us
+    and the last bin is everything longer than that.
+    """
+    def __init__(self, n_bins = 28, **kwds):
+        super().__init__(**kwds)
+        self.bins = [0] * n_bins
+        self.count = 0
+        self.max_time = 0.0
+        self.n_bins = n_bins
+        self.total = 0.0
+
+    def add(self, seconds):
+        index = int(1.0e6 * seconds).bit_length()
+        if (index >= self.n_bins):
+            index = self.n_bins - 1
+        self.bins[index] += 1
+        self.count += 1
+        self.total += seconds
+        if (seconds > self.max_time):
+            self.max_time = seconds
+
+    def getPercentileMs(self, percentile):
+        """
+        Returns the upper edge of the bin that contains this
+        percentile, or the maximum time if that is smaller.
+        """
+        if (self.count == 0):
+            return 0.0
+        target = 0.01 * percentile * self.count
+        total = 0
+        for i in range(self.n_bins):
+            total += self.bins[i]
+            if (total >= target):
+                break
+        return min(0.001 * (2**i), 1000.0 * self.max_time)
+
+    def toDict(self):
+        mean = 0.0
+        if (self.count > 0):
+            mean = 1000.0 * self.total/self.count
+        return {"count" : self.count,
+                "mean ms" : mean,
+                "max ms" : 1000.0 * self.max_time,
+                "p50 ms" : self.getPercentileMs(50),
+                "p99 ms" : self.getPercentileMs(99)}
+
+
+class MessageStatistics(object):
+    """
+    Collects the statistics, there is one of these (statistics below).
+    These methods are all called from HAL's (GUI) thread.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.enabled = True
+        self.startup_times = {}
+        self.reset()
+
+    def addFinalized(self, message):
+        if self.enabled and (message.time_sent is not None):
+            self.getMessageStats(message.m_type)["finalize"].add(time.perf_counter() - message.time_sent)
+
+    def addProcessed(self, module_name, m_type, seconds):
+        if self.enabled:
+            self.getModuleStats(module_name, m_type)["process"].add(seconds)
+
+    def addSent(self, message):
+        message.time_sent = time.perf_counter()
+        if self.enabled:
+            m_stats = self.getMessageStats(message.m_type)
+            m_stats["count"] += 1
+            l_stats = self.getLaneStats(message.lane)
+            l_stats["count"] += 1
+            if message.time_queued is not None:
+                m_stats["queue wait"].add(message.time_sent - message.time_queued)
+                l_stats["queue wait"].add(message.time_sent - message.time_queued)
+
+    def addUnblocked(self, message):
+        """
+        Called when a message is taken out of HalCore's queue.
+        """
+        if self.enabled and (message.time_blocked is not None):
+            self.getLaneStats(message.lane)["sync blocked"].add(time.perf_counter() - message.time_blocked)
+
+    def addWorker(self, module_name, m_type, seconds):
+        if self.enabled:
+            self.getModuleStats(module_name, m_type)["worker"].add(seconds)
+
+    def getLaneStats(self, lane):
+        if not lane in self.lanes:
+            self.lanes[lane] = {"count" : 0,
+                                "queue wait" : Histogram(),
+                                "sync blocked" : Histogram()}
+        return self.lanes[lane]
+
+    def getMessageStats(self, m_type):
+        if not m_type in self.messages:
+            self.messages[m_type] = {"count" : 0,
+                                     "finalize" : Histogram(),
+                                     "queue wait" : Histogram()}
+        return self.messages[m_type]
+
+    def getModuleStats(self, module_name, m_type):
+        if not module_name in self.modules:
+            self.modules[module_name] = {}
+        m_stats = self.modules[module_name]
+        if not m_type in m_stats:
+            m_stats[m_type] = {"process" : Histogram(),
+                               "worker" : Histogram()}
+        return m_stats[m_type]
+
+    def getStatistics(self):
+        """
+        Returns the statistics as a dictionary (that can be
+        converted to JSON).
+        """
+        stats = {"lanes" : {}, "messages" : {}, "modules" : {}, "startup" : self.startup_times}
+        for [lane, l_stats] in self.lanes.items():
+            stats["lanes"][lane] = {"count" : l_stats["count"],
+                                    "queue wait" : l_stats["queue wait"].toDict(),
+                                    "sync blocked" : l_stats["sync blocked"].toDict()}
+
+        for [m_type, m_stats] in self.messages.items():
+            stats["messages"][m_type] = {"count" : m_stats["count"],
+                                         "finalize" : m_stats["finalize"].toDict(),
+                                         "queue wait" : m_stats["queue wait"].toDict()}
+
+        for [module_name, module_stats] in self.modules.items():
+            stats["modules"][module_name] = {}
+            for [m_type, m_stats] in module_stats.items():
+                stats["modules"][module_name][m_type] = {"process" : m_stats["process"].toDict(),
+                                                         "worker" : m_stats["worker"].toDict()}
+        return stats
+
+    def reset(self):
+        self.lanes = {}
+        self.messages = {}
+        self.modules = {}
+
+
+statistics = MessageStatistics()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
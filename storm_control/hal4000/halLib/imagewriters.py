@@ -7,20 +7,52 @@ Hazen 03/17
 
 import copy
 import datetime
+import fractions
+import json
+import numpy
+import os
+import shutil
 import struct
-import tifffile
 import time
+import traceback
 
 from PyQt5 import QtCore
 
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
+import storm_control.hal4000.camera.frame as frame
+
+
+# Compression for the chunked .zarr format. This is optional.
+numcodecs = None
+try:
+    import numcodecs
+except ModuleNotFoundError:
+    pass
+
+#
+# Writer keywords that only apply to a particular format. createFileWriter()
+# will only pass these to the writer for that format.
+#
+format_kwds = {".big.tif" : ["fast_bigtiff"],
+               ".dax" : ["batch_frames", "batch_mb", "preallocate"],
+               ".zarr" : ["chunk_frames", "compression_level", "compression_threads", "compressor"]}
+
 
 class ImageWriterException(halExceptions.HalException):
     pass
 
 
+def alignedArray(size, alignment = 4096):
+    """
+    Return a numpy.uint8 array of size bytes whose data starts on an
+    alignment byte boundary (a memory page by default).
+    """
+    raw = numpy.empty(size + alignment, dtype = numpy.uint8)
+    offset = (-raw.ctypes.data) % alignment
+    return raw[offset:offset+size]
+
 def availableFileFormats(test_mode):
     """
     Return a list of the available movie formats.
@@ -30,45 +62,266 @@ def availableFileFormats(test_mode):
     #        have a normal name, and don't need the '.big' in the
     #        extension.
     #
+    formats = [".dax", ".tif", ".big.tif"]
+
+    # Chunked, compressed movies need the numcodecs package.
+    if numcodecs is not None:
+        formats.append(".zarr")
 
     if test_mode:
-        return [".dax", ".tif", ".big.tif", ".test"]
-    else:
-        return [".dax", ".tif", ".big.tif"]
+        formats.append(".test")
 
-def createFileWriter(camera_functionality, film_settings):
+    return formats
+
+def createFileWriter(camera_functionality, film_settings, **kwds):
     """
     This is convenience function which creates the appropriate file writer
     based on the filetype.
+
+    Any additional keywords (queue_depth, drop_policy) are passed through
+    to the writer. Keywords in format_kwds are only passed to the writer
+    for that format.
     """
     ft = film_settings.getFiletype()
+
+    fmt_kwds = {}
+    for fmt in format_kwds:
+        for key in format_kwds[fmt]:
+            if key in kwds:
+                value = kwds.pop(key)
+                if (fmt == ft):
+                    fmt_kwds[key] = value
+    kwds.update(fmt_kwds)
+
     if (ft == ".dax"):
         return DaxFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       film_settings = film_settings,
+                       **kwds)
     elif (ft == ".big.tif"):
+        if kwds.pop("fast_bigtiff", False):
+            return BigTIFFile(camera_functionality = camera_functionality,
+                              film_settings = film_settings,
+                              **kwds)
         return TIFFile(bigtiff = True,
                        camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       film_settings = film_settings,
+                       **kwds)
     elif (ft == ".spe"):
         return SPEFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       film_settings = film_settings,
+                       **kwds)
     elif (ft == ".test"):
         return TestFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                        film_settings = film_settings,
+                        **kwds)
     elif (ft == ".tif"):
         return TIFFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       film_settings = film_settings,
+                       **kwds)
+    elif (ft == ".zarr"):
+        return ZarrFile(camera_functionality = camera_functionality,
+                        film_settings = film_settings,
+                        **kwds)
     else:
         raise ImageWriterException("Unknown output file format '" + ft + "'")
 
 
+def preallocateFile(fp, size):
+    """
+    Reserve size bytes of disk space for the file. posix_fallocate() is
+    not available on Windows, so there we just extend the file.
+    """
+    if hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fp.fileno(), 0, size)
+    else:
+        fp.truncate(size)
+
+def writeAll(fp, np_data):
+    """
+    Write a (contiguous) numpy array to an unbuffered file with as few
+    calls as possible.
+    """
+    view = memoryview(np_data).cast("B")
+    while (len(view) > 0):
+        view = view[fp.write(view):]
+
+
+class FrameRingBuffer(object):
+    """
+    A bounded ring buffer of preallocated frame slots. Frames are copied
+    into the next free slot by the producer (the GUI thread) and taken
+    out in order by the consumer (an ImageWriterThread).
+
+    drop_policy is either "block", in which case the producer waits for
+    a free slot, or "drop", in which case frames that arrive when the
+    buffer is full are discarded and counted.
+    """
+    def __init__(self, depth = 1, frame_pixels = 0, drop_policy = "block", **kwds):
+        super().__init__(**kwds)
+
+        if not drop_policy in ["block", "drop"]:
+            raise ImageWriterException("Unknown drop policy '" + drop_policy + "'")
+
+        self.count = 0
+        self.depth = depth
+        self.drop_policy = drop_policy
+        self.head = 0
+        self.running = True
+
+        self.data = numpy.zeros((depth, frame_pixels), dtype = numpy.uint16)
+        self.info = [None] * depth
+
+        self.mutex = QtCore.QMutex()
+        self.not_empty = QtCore.QWaitCondition()
+        self.not_full = QtCore.QWaitCondition()
+
+        # Counters.
+        self.dropped = 0
+        self.max_count = 0
+        self.queued = 0
+
+    def get(self):
+        """
+        Wait for a frame, returns [slot, frame info] or None if the
+        buffer was closed and is empty. The slot stays reserved until
+        release() is called.
+        """
+        self.mutex.lock()
+        while (self.count == 0) and self.running:
+            self.not_empty.wait(self.mutex)
+        if (self.count == 0):
+            self.mutex.unlock()
+            return None
+        slot = self.head
+        info = self.info[slot]
+        self.mutex.unlock()
+        return [slot, info]
+
+    def getCount(self):
+        return self.count
+
+    def put(self, a_frame):
+        """
+        Copy a frame into the buffer. Returns False if the frame was dropped.
+        """
+        self.mutex.lock()
+        if (self.count == self.depth):
+            if (self.drop_policy == "drop"):
+                self.dropped += 1
+                self.mutex.unlock()
+                return False
+            while (self.count == self.depth):
+                self.not_full.wait(self.mutex)
+        slot = (self.head + self.count) % self.depth
+        self.mutex.unlock()
+
+        # The consumer never touches slots past head + count so this copy
+        # can happen without holding the lock.
+        numpy.copyto(self.data[slot], a_frame.getData().reshape(-1))
+        self.info[slot] = [a_frame.frame_number,
+                           a_frame.image_x,
+                           a_frame.image_y,
+                           a_frame.which_camera,
+                           a_frame.timestamp]
+
+        self.mutex.lock()
+        self.count += 1
+        self.queued += 1
+        if (self.count > self.max_count):
+            self.max_count = self.count
+        self.not_empty.wakeAll()
+        self.mutex.unlock()
+        return True
+
+    def release(self):
+        """
+        Called by the consumer once it is done with the slot returned by get().
+        """
+        self.mutex.lock()
+        self.info[self.head] = None
+        self.head = (self.head + 1) % self.depth
+        self.count -= 1
+        self.not_full.wakeAll()
+        self.mutex.unlock()
+
+    def stop(self):
+        self.mutex.lock()
+        self.running = False
+        self.not_empty.wakeAll()
+        self.mutex.unlock()
+
+
+class ImageWriterThread(QtCore.QThread):
+    """
+    Drains a FrameRingBuffer, passing each frame to the writers
+    writeFrame() method. There is one of these per feed.
+
+    If writing fails the thread records the error and continues to
+    drain the buffer so that the producer is never blocked forever.
+    """
+    def __init__(self, ring_buffer = None, writer = None, **kwds):
+        super().__init__(**kwds)
+        self.bytes_written = 0
+        self.error = None
+        self.ring_buffer = ring_buffer
+        self.time_writing = 0.0
+        self.writer = writer
+        self.written = 0
+
+    def run(self):
+        while True:
+            item = self.ring_buffer.get()
+            if item is None:
+                break
+            [slot, [frame_number, image_x, image_y, which_camera, timestamp]] = item
+            a_frame = frame.Frame(self.ring_buffer.data[slot],
+                                  frame_number,
+                                  image_x,
+                                  image_y,
+                                  which_camera,
+                                  timestamp = timestamp)
+            start_time = time.perf_counter()
+            try:
+                if self.error is None:
+                    self.writer.writeFrame(a_frame)
+                    self.writer.write_latency.add(time.perf_counter() - timestamp)
+                    self.bytes_written += a_frame.getData().nbytes
+                    self.written += 1
+            except Exception:
+                self.error = traceback.format_exc()
+            finally:
+                self.ring_buffer.release()
+            self.time_writing += time.perf_counter() - start_time
+
+
 class BaseFileWriter(object):
+    """
+    The base class for all of the file writers.
 
-    def __init__(self, camera_functionality = None, film_settings = None, **kwds):
+    With queue_depth = 0 frames are written to disk in the (GUI) thread
+    that handles the camera functionality newFrame signal. With a queue
+    depth greater than zero frames are instead copied into a ring buffer
+    of this many frames and written to disk by a separate thread.
+
+    The writer also records the latency from when the camera provided
+    each frame to when the writer received it (delivery) and to when
+    writeFrame() returned (write).
+
+    Errors that happen while writing in another thread are recorded in
+    'errors'. The sub-classes closeWriter() methods close the file and
+    then call checkErrors(), which raises an ImageWriterException if
+    there were any.
+    """
+    def __init__(self, camera_functionality = None, drop_policy = "block", film_settings = None, queue_depth = 0, **kwds):
         super().__init__(**kwds)
         self.cam_fn = camera_functionality
+        self.delivery_latency = frame.LatencyCounter()
+        self.errors = []
         self.film_settings = film_settings
+        self.ring_buffer = None
         self.stopped = False
+        self.write_latency = frame.LatencyCounter()
+        self.writer_thread = None
 
         # This is the frame size in MB.
         self.frame_size = self.cam_fn.getParameter("bytes_per_frame") *  0.000000953674
@@ -80,6 +333,16 @@ class BaseFileWriter(object):
             self.basename += "_" + self.cam_fn.getParameter("extension")
         self.filename = self.basename + self.film_settings.getFiletype()
 
+        # Create the ring buffer and writer thread, if requested.
+        if (queue_depth > 0):
+            frame_pixels = int(self.cam_fn.getParameter("bytes_per_frame")/2)
+            self.ring_buffer = FrameRingBuffer(depth = queue_depth,
+                                               drop_policy = drop_policy,
+                                               frame_pixels = frame_pixels)
+            self.writer_thread = ImageWriterThread(ring_buffer = self.ring_buffer,
+                                                   writer = self)
+            self.writer_thread.start(QtCore.QThread.NormalPriority)
+
         # Connect the camera functionality.
         self.cam_fn.newFrame.connect(self.saveFrame)
         self.cam_fn.stopped.connect(self.handleStopped)
@@ -89,26 +352,124 @@ class BaseFileWriter(object):
         self.cam_fn.newFrame.disconnect(self.saveFrame)
         self.cam_fn.stopped.disconnect(self.handleStopped)
 
+        # Wait for the writer thread to finish.
+        if self.writer_thread is not None:
+            self.ring_buffer.stop()
+            self.writer_thread.wait()
+            if self.writer_thread.error is not None:
+                self.errors.append(self.writer_thread.error)
+
+    def addMetadata(self, parameters):
+        """
+        Called by film.film once the movie has been recorded and the
+        parameters XML file has been saved. Writers for formats that
+        can also store metadata should override this.
+        """
+        pass
+
+    def checkErrors(self):
+        """
+        Raise an ImageWriterException if writing failed.
+        """
+        if (len(self.errors) > 0):
+            raise ImageWriterException("Writing '" + self.filename + "' failed:\n" + self.errors[0])
+
     def getSize(self):
         return self.frame_size * self.number_frames
-    
+
+    def getStatistics(self):
+        """
+        Return a dictionary of writer performance counters.
+        """
+        stats = {"delivery ms" : self.delivery_latency.getMeanMs(),
+                 "delivery max ms" : self.delivery_latency.getMaxMs(),
+                 "write ms" : self.write_latency.getMeanMs(),
+                 "write max ms" : self.write_latency.getMaxMs()}
+
+        if self.writer_thread is None:
+            stats.update({"queued" : self.number_frames,
+                          "written" : self.number_frames,
+                          "dropped" : 0,
+                          "max queue depth" : 0,
+                          "bytes/s" : 0.0})
+            return stats
+
+        wt = self.writer_thread
+        bytes_per_second = 0.0
+        if (wt.time_writing > 0.0):
+            bytes_per_second = wt.bytes_written/wt.time_writing
+        stats.update({"queued" : self.ring_buffer.queued,
+                      "written" : wt.written,
+                      "dropped" : self.ring_buffer.dropped,
+                      "max queue depth" : self.ring_buffer.max_count,
+                      "bytes/s" : bytes_per_second})
+        return stats
+
     def handleStopped(self):
         self.stopped = True
 
     def isStopped(self):
+        """
+        In threaded mode the writer is not considered stopped until
+        all of the queued frames have been written.
+        """
+        if self.ring_buffer is not None:
+            return self.stopped and (self.ring_buffer.getCount() == 0)
         return self.stopped
-        
-    def saveFrame(self):
+
+    def saveFrame(self, frame):
+        """
+        This is connected to the camera functionality newFrame signal.
+        """
+        self.delivery_latency.add(time.perf_counter() - frame.timestamp)
+        if self.ring_buffer is not None:
+            self.ring_buffer.put(frame)
+        else:
+            self.writeFrame(frame)
+            self.write_latency.add(time.perf_counter() - frame.timestamp)
+
+    def writeFrame(self, frame):
+        """
+        Sub-classes should override this to actually save the frame.
+        """
         self.number_frames += 1
 
 
 class DaxFile(BaseFileWriter):
     """
     Dax file writing class.
+
+    By default each frame is written as it arrives. In batched mode frames
+    are first copied into a page aligned buffer of batch_frames frames (or
+    batch_mb megabytes) which is written to disk in a single call once it is
+    full. If preallocate is True the file is also extended to the expected
+    final size of a fixed length film before filming starts so that the file
+    system does not fragment it.
     """
-    def __init__(self, **kwds):
+    def __init__(self, batch_frames = 0, batch_mb = 0.0, preallocate = False, **kwds):
         super().__init__(**kwds)
-        self.fp = open(self.filename, "wb")
+        self.batch_count = 0
+        self.batch_data = None
+        self.preallocated = False
+
+        bytes_per_frame = self.cam_fn.getParameter("bytes_per_frame")
+
+        # Figure out how many frames to batch.
+        capacity = batch_frames
+        if (batch_mb > 0.0):
+            mb_frames = max(1, int(batch_mb * 1048576/bytes_per_frame))
+            if (capacity == 0) or (mb_frames < capacity):
+                capacity = mb_frames
+
+        if (capacity > 0):
+            self.fp = open(self.filename, "wb", buffering = 0)
+            self.batch_data = alignedArray(capacity * bytes_per_frame).view(numpy.uint16).reshape(capacity, -1)
+        else:
+            self.fp = open(self.filename, "wb")
+
+        if preallocate and self.film_settings.isFixedLength():
+            preallocateFile(self.fp, self.film_settings.getFilmLength() * bytes_per_frame)
+            self.preallocated = True
 
     def closeWriter(self):
         """
@@ -116,7 +477,15 @@ class DaxFile(BaseFileWriter):
         now stored in the .xml file that is saved with each recording.
         """
         super().closeWriter()
-        self.fp.close()
+        try:
+            if self.batch_data is not None:
+                self.flushBatch()
+
+            # Remove any space that we preallocated but did not use.
+            if self.preallocated:
+                self.fp.truncate(self.number_frames * self.cam_fn.getParameter("bytes_per_frame"))
+        finally:
+            self.fp.close()
 
         w = str(self.cam_fn.getParameter("x_pixels"))
         h = str(self.cam_fn.getParameter("y_pixels"))
@@ -132,10 +501,26 @@ class DaxFile(BaseFileWriter):
                 inf_fp.write("y_end = " + h + "\n")
             inf_fp.close()
 
-    def saveFrame(self, frame):
-        super().saveFrame()
+        self.checkErrors()
+
+    def flushBatch(self):
+        """
+        Write all the frames in the batch buffer to disk.
+        """
+        if (self.batch_count > 0):
+            writeAll(self.fp, self.batch_data[:self.batch_count])
+            self.batch_count = 0
+
+    def writeFrame(self, frame):
+        super().writeFrame(frame)
         np_data = frame.getData()
-        np_data.tofile(self.fp)
+        if self.batch_data is None:
+            np_data.tofile(self.fp)
+        else:
+            self.batch_data[self.batch_count] = np_data.reshape(-1)
+            self.batch_count += 1
+            if (self.batch_count == self.batch_data.shape[0]):
+                self.flushBatch()
 
 
 class SPEFile(BaseFileWriter):
@@ -175,11 +560,15 @@ class SPEFile(BaseFileWriter):
 
     def closeWriter(self):
         super().closeWriter()
-        self.fp.seek(1446)
-        self.fp.write(struct.pack("i", self.number_frames))
-
-    def saveFrame(self, frame):
-        super().saveFrame()
+        try:
+            self.fp.seek(1446)
+            self.fp.write(struct.pack("i", self.number_frames))
+        finally:
+            self.fp.close()
+        self.checkErrors()
+
+    def writeFrame(self, frame):
+        super().writeFrame(frame)
         np_data = frame.getData()
         np_data.tofile(self.file_ptrs[index])
 
@@ -198,9 +587,9 @@ class TestFile(DaxFile):
         time.sleep(1.0)
         super().closeWriter()
 
-    def saveFrame(self, frame):
+    def writeFrame(self, frame):
         if (self.number_frames < 1):
-            super().saveFrame(frame)
+            super().writeFrame(frame)
     
     
 class TIFFile(BaseFileWriter):
@@ -209,6 +598,10 @@ class TIFFile(BaseFileWriter):
     """
     def __init__(self, bigtiff = False, **kwds):
         super().__init__(**kwds)
+
+        # tifffile is slow to import, so we only import it when we need it.
+        import tifffile
+
         self.metadata = {'unit' : 'um'}
         if bigtiff:
             self.resolution = (25400.0/self.film_settings.getPixelSize(),
@@ -223,9 +616,10 @@ class TIFFile(BaseFileWriter):
     def closeWriter(self):
         super().closeWriter()
         self.tif.close()
+        self.checkErrors()
         
-    def saveFrame(self, frame):
-        super().saveFrame()
+    def writeFrame(self, frame):
+        super().writeFrame(frame)
         image = frame.getData()
         self.tif.save(image.reshape((frame.image_y, frame.image_x)),
                       metadata = self.metadata,
@@ -233,6 +627,237 @@ class TIFFile(BaseFileWriter):
                       contiguous = True)
 
 
+class BigTIFFile(BaseFileWriter):
+    """
+    A faster BigTIFF writer for uncompressed 16 bit movies.
+
+    TIFFile has tifffile create the tags and metadata of every page as
+    it is saved. Here the raw image data is written in one contiguous
+    block as the frames arrive, exactly like a .dax file, and all of the
+    image file directories (IFDs) are made at the end from a single
+    template in which only the strip offset and the next IFD offset
+    change from page to page.
+
+    The file layout is:
+      1. The 16 byte BigTIFF header.
+      2. The image data for all of the frames.
+      3. The IFDs, one per frame.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.x_pixels = self.cam_fn.getParameter("x_pixels")
+        self.y_pixels = self.cam_fn.getParameter("y_pixels")
+        self.frame_bytes = 2 * self.x_pixels * self.y_pixels
+
+        # Resolution in pixels per inch, as in TIFFile.
+        resolution = fractions.Fraction(25400.0/self.film_settings.getPixelSize()).limit_denominator(10000)
+
+        # Tags, these must be in ascending order.
+        #
+        # Types are 3 = SHORT, 4 = LONG, 5 = RATIONAL, 16 = LONG8.
+        #
+        tags = [[256, 4, self.x_pixels],                              # ImageWidth
+                [257, 4, self.y_pixels],                              # ImageLength
+                [258, 3, 16],                                         # BitsPerSample
+                [259, 3, 1],                                          # Compression (none)
+                [262, 3, 1],                                          # PhotometricInterpretation (min is black)
+                [273, 16, 0],                                         # StripOffsets
+                [277, 3, 1],                                          # SamplesPerPixel
+                [278, 4, self.y_pixels],                              # RowsPerStrip
+                [279, 16, self.frame_bytes],                          # StripByteCounts
+                [282, 5, [resolution.numerator, resolution.denominator]], # XResolution
+                [283, 5, [resolution.numerator, resolution.denominator]], # YResolution
+                [296, 3, 2],                                          # ResolutionUnit (inch)
+                [339, 3, 1]]                                          # SampleFormat (unsigned integer)
+
+        # Create the IFD template.
+        self.ifd_template = bytearray(8 + 20 * len(tags) + 8)
+        struct.pack_into("<Q", self.ifd_template, 0, len(tags))
+        for i, [tag, tag_type, value] in enumerate(tags):
+            offset = 8 + 20 * i
+            struct.pack_into("<HHQ", self.ifd_template, offset, tag, tag_type, 1)
+            if (tag_type == 3):
+                struct.pack_into("<H", self.ifd_template, offset + 12, value)
+            elif (tag_type == 4):
+                struct.pack_into("<I", self.ifd_template, offset + 12, value)
+            elif (tag_type == 5):
+                struct.pack_into("<II", self.ifd_template, offset + 12, *value)
+            else:
+                struct.pack_into("<Q", self.ifd_template, offset + 12, value)
+
+            # Remember where the strip offset goes.
+            if (tag == 273):
+                self.strip_offset_position = offset + 12
+        self.next_ifd_position = len(self.ifd_template) - 8
+
+        # Write the header, the offset of the first IFD is filled in at the end.
+        self.fp = open(self.filename, "wb")
+        self.fp.write(struct.pack("<2sHHHQ", b"II", 43, 8, 0, 0))
+
+    def closeWriter(self):
+        """
+        Write the IFDs and update the header to point at the first one.
+
+        A TIFF must have at least one IFD, so if no frames were saved
+        the file is removed.
+        """
+        super().closeWriter()
+
+        if (self.number_frames == 0):
+            self.fp.close()
+            os.remove(self.filename)
+            print(">> Warning no frames were saved, removed '" + self.filename + "'")
+            self.checkErrors()
+            return
+
+        ifd_size = len(self.ifd_template)
+        first_ifd = 16 + self.number_frames * self.frame_bytes
+        ifds = bytearray(ifd_size * self.number_frames)
+        for i in range(self.number_frames):
+            offset = i * ifd_size
+            ifds[offset:offset+ifd_size] = self.ifd_template
+            struct.pack_into("<Q", ifds, offset + self.strip_offset_position, 16 + i * self.frame_bytes)
+            if (i < (self.number_frames - 1)):
+                struct.pack_into("<Q", ifds, offset + self.next_ifd_position, first_ifd + offset + ifd_size)
+        try:
+            self.fp.write(ifds)
+            self.fp.seek(8)
+            self.fp.write(struct.pack("<Q", first_ifd))
+        finally:
+            self.fp.close()
+        self.checkErrors()
+
+    def writeFrame(self, frame):
+        super().writeFrame(frame)
+        frame.getData().tofile(self.fp)
+
+
+class ZarrChunkWriter(QtCore.QRunnable):
+    """
+    Compresses and saves a single chunk of a .zarr movie.
+    """
+    def __init__(self, codec = None, data = None, filename = None, writer = None, **kwds):
+        super().__init__(**kwds)
+        self.codec = codec
+        self.data = data
+        self.filename = filename
+        self.writer = writer
+
+    def run(self):
+        try:
+            with open(self.filename, "wb") as fp:
+                fp.write(self.codec.encode(self.data))
+        except Exception:
+            self.writer.errors.append(traceback.format_exc())
+        finally:
+            self.writer.pending.release()
+
+
+class ZarrFile(BaseFileWriter):
+    """
+    Chunked, compressed movies in the Zarr (version 2) directory format.
+
+    Each chunk of chunk_frames frames is compressed with Blosc (bitshuffle
+    and the requested compressor) and written to it's own file by a pool
+    of compression_threads threads, so compression uses several cores.
+    The movie parameters and the per-frame illumination powers (if any)
+    are saved as attributes of the array when the movie is complete.
+
+    The format is documented here:
+    https://zarr.readthedocs.io/en/stable/spec/v2.html
+    """
+    def __init__(self, chunk_frames = 1, compression_level = 5, compression_threads = 4, compressor = "zstd", **kwds):
+        super().__init__(**kwds)
+        if numcodecs is None:
+            raise ImageWriterException("Saving .zarr movies requires the numcodecs package.")
+
+        self.chunk_count = 0
+        self.chunk_frames = chunk_frames
+        self.chunk_index = 0
+        self.codec = numcodecs.Blosc(cname = compressor,
+                                     clevel = compression_level,
+                                     shuffle = numcodecs.Blosc.BITSHUFFLE)
+        self.x_pixels = self.cam_fn.getParameter("x_pixels")
+        self.y_pixels = self.cam_fn.getParameter("y_pixels")
+        self.chunk_data = self.newChunk()
+
+        # Limit the number of chunks that can be waiting to be saved.
+        self.pending = QtCore.QSemaphore(2 * compression_threads)
+        self.thread_pool = QtCore.QThreadPool()
+        self.thread_pool.setMaxThreadCount(compression_threads)
+
+        # Overwrite the old movie (if any), otherwise we could end up
+        # mixing chunks from the old and the new movies.
+        if os.path.exists(self.filename):
+            shutil.rmtree(self.filename)
+        os.makedirs(self.filename)
+
+    def addMetadata(self, parameters):
+        attrs = {"parameters" : parameters.toString()}
+
+        # Add the illumination channel powers at each frame, if available.
+        power_filename = self.film_settings.getBasename() + ".power"
+        if os.path.exists(power_filename):
+            with open(power_filename) as fp:
+                attrs["power"] = {"columns" : fp.readline().split(),
+                                  "values" : [list(map(float, line.split())) for line in fp if (len(line.strip()) > 0)]}
+
+        with open(os.path.join(self.filename, ".zattrs"), "w") as fp:
+            json.dump(attrs, fp)
+
+    def closeWriter(self):
+        super().closeWriter()
+        try:
+            self.saveChunk()
+        finally:
+            self.thread_pool.waitForDone()
+
+        zarray = {"chunks" : [self.chunk_frames, self.y_pixels, self.x_pixels],
+                  "compressor" : self.codec.get_config(),
+                  "dtype" : "<u2",
+                  "fill_value" : 0,
+                  "filters" : None,
+                  "order" : "C",
+                  "shape" : [self.number_frames, self.y_pixels, self.x_pixels],
+                  "zarr_format" : 2}
+        with open(os.path.join(self.filename, ".zarray"), "w") as fp:
+            json.dump(zarray, fp, indent = 2)
+
+        self.checkErrors()
+
+    def newChunk(self):
+        return numpy.empty((self.chunk_frames, self.y_pixels, self.x_pixels), dtype = numpy.uint16)
+
+    def saveChunk(self):
+        """
+        Hand the current chunk to the thread pool for compression and saving.
+        """
+        if (self.chunk_count == 0):
+            return
+
+        # Chunks are always full size, pad with the fill value.
+        self.chunk_data[self.chunk_count:] = 0
+
+        # This will block if we are too far behind.
+        self.pending.acquire()
+        chunk_writer = ZarrChunkWriter(codec = self.codec,
+                                       data = self.chunk_data,
+                                       filename = os.path.join(self.filename, str(self.chunk_index) + ".0.0"),
+                                       writer = self)
+        self.thread_pool.start(chunk_writer)
+
+        self.chunk_count = 0
+        self.chunk_data = self.newChunk()
+        self.chunk_index += 1
+
+    def writeFrame(self, frame):
+        super().writeFrame(frame)
+        self.chunk_data[self.chunk_count] = frame.getData().reshape(self.y_pixels, self.x_pixels)
+        self.chunk_count += 1
+        if (self.chunk_count == self.chunk_frames):
+            self.saveChunk()
+
+
 #
 # The MIT License
 #
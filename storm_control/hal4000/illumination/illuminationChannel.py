@@ -180,7 +180,9 @@ class Channel(QtCore.QObject):
         if self.mechanical_shutter is not None:
             self.mechanical_shutter.output(on)
 
-        self.parameters.get("on_off_state")[self.channel_id] = on
+        on_off_state = list(self.parameters.get("on_off_state"))
+        on_off_state[self.channel_id] = on
+        self.parameters.set("on_off_state", on_off_state)
 
     def handleSetPower(self, new_power):
         """
@@ -197,7 +199,9 @@ class Channel(QtCore.QObject):
         else:
             power = new_power
             power_string = "{0:d}".format(new_power)
-        self.parameters.get("default_power")[self.channel_id] = power
+        default_power = list(self.parameters.get("default_power"))
+        default_power[self.channel_id] = power
+        self.parameters.set("default_power", default_power)
         self.channel_ui.updatePowerText(power_string)
 
         if self.amplitude_modulation is not None:
@@ -8,11 +8,193 @@ Hazen 3/17.
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+import math
 import numpy
 
 import storm_control.hal4000.halLib.c_image_manipulation_c as c_image
 
 
+# The histogram (and minimum and maximum) are calculated using
+# (approximately) this many pixels.
+stats_pixels = 2**18
+
+
+def downsampleImage(image, n, downsample):
+    """
+    Reduce the size of image by a factor of n in x and y. The image
+    size must be a multiple of n.
+
+    downsample - "decimate" (use every n-th pixel), "max" (the maximum
+                 of each n x n block) or "mean" (the mean of each block).
+    """
+    if (n == 1):
+        return image
+    if (downsample == "decimate"):
+        return image[::n,::n]
+
+    #
+    # This works with the n x n strided views of the image, which is
+    # a lot faster than reducing over the axises of a reshaped image.
+    #
+    if (downsample == "max"):
+        result = image[::n,::n].copy()
+        for i in range(n):
+            for j in range(n):
+                numpy.maximum(result, image[i::n,j::n], out = result)
+        return result
+
+    elif (downsample == "mean"):
+        result = numpy.zeros((image.shape[0]//n, image.shape[1]//n), dtype = numpy.uint32)
+        for i in range(n):
+            for j in range(n):
+                result += image[i::n,j::n]
+        result //= n*n
+        return result.astype(numpy.uint16)
+
+    else:
+        raise ValueError("Unknown downsample method '" + str(downsample) + "'")
+
+def histogramPercentiles(histogram, percentiles):
+    """
+    Returns the intensities at percentiles (0 - 100) of a histogram.
+    """
+    cumulative = numpy.cumsum(histogram)
+    total = cumulative[-1]
+    return [int(numpy.searchsorted(cumulative, 0.01 * p * total)) for p in percentiles]
+
+def renderFrame(frame, q_colortable = None, display_range = None, saturated_value = None,
+                click_pos = None, decimation = 1, downsample = "decimate", frame_offset = None,
+                frame_scale = None, table = None, visible_rect = None):
+    """
+    Convert a frame into a RenderedImage. This only uses QImage so it
+    is safe to call from a thread other than the GUI thread.
+
+    q_colortable - A list of 256 QtGui.qRgb() values.
+    display_range - [image value that equals 0, image value that equals 255].
+    saturated_value - The value above which pixels are saturated, or None.
+    table - The c_image.rescaleTable() to use instead of display_range
+            and saturated_value.
+    click_pos - [x, y] in frame coordinates to record the intensity at.
+    decimation - Reduce the resolution by this factor in x and y. This
+                 is for when the view is zoomed out so far that we could
+                 not show all the pixels anyway.
+    downsample - How to reduce the resolution, see downsampleImage().
+    frame_offset - [x, y] position of the frame on the chip.
+    frame_scale - [x, y] binning of the frame.
+    visible_rect - [x, y, width, height] of the part of the chip that
+                   is visible, only this part of the frame is rendered.
+
+    Returns None if the frame is not the expected size.
+    """
+    #
+    # For reasons lost in the mists of time 'frame' is a 1D numpy array
+    # and needs to be reshaped before rescaling and converting to a QImage.
+    #
+    w = frame.image_x
+    h = frame.image_y
+    image_data = frame.getData()
+    try:
+        image_data = image_data.reshape((h,w))
+    except ValueError as e:
+        print("Got an image with an unexpected size, ", image_data.shape, "expected [", w, ",", h, "]")
+        return None
+
+    if display_range is None:
+        display_range = [0, 200]
+    if frame_offset is None:
+        frame_offset = [0, 0]
+    if frame_scale is None:
+        frame_scale = [1, 1]
+
+    # Figure out which part of the frame is visible, in frame pixels.
+    [x0, y0, x1, y1] = [0, 0, w, h]
+    if visible_rect is not None:
+        [vx, vy, vw, vh] = visible_rect
+        x0 = max(x0, int(math.floor((vx - frame_offset[0])/frame_scale[0])))
+        y0 = max(y0, int(math.floor((vy - frame_offset[1])/frame_scale[1])))
+        x1 = min(x1, int(math.ceil((vx + vw - frame_offset[0])/frame_scale[0])))
+        y1 = min(y1, int(math.ceil((vy + vh - frame_offset[1])/frame_scale[1])))
+
+    # Align the region with blocks of size n. This drops the last few
+    # columns / rows of the frame if the frame size is not a multiple of
+    # n, but these are less than one screen pixel.
+    n = max(1, min(decimation, w, h))
+    x0 = (x0//n)*n
+    y0 = (y0//n)*n
+    x1 = min(-(-x1//n)*n, (w//n)*n)
+    y1 = min(-(-y1//n)*n, (h//n)*n)
+
+    # Rescale the visible part of the image.
+    if table is None:
+        table = c_image.rescaleTable(display_range[0], display_range[1], saturated_value)
+
+    q_image = None
+    rect = None
+    if (x1 > x0) and (y1 > y0):
+        region = downsampleImage(image_data[y0:y1,x0:x1], n, downsample)
+        temp = numpy.ascontiguousarray(table[region])
+
+        # Create the QImage, scaling to compensate for binning and down
+        # sampling happens when it is painted.
+        q_image = QtGui.QImage(temp.data, temp.shape[1], temp.shape[0], temp.shape[1], QtGui.QImage.Format_Indexed8)
+        q_image.ndarray = temp
+
+        # Set the images color table. If you don't do this Qt will segfault
+        # without giving you a traceback or any kind of warning message..
+        if q_colortable is None:
+            q_colortable = greyColorTable()
+        q_image.setColorTable(q_colortable)
+
+        rect = QtCore.QRectF(frame_offset[0] + x0 * frame_scale[0],
+                             frame_offset[1] + y0 * frame_scale[1],
+                             (x1 - x0) * frame_scale[0],
+                             (y1 - y0) * frame_scale[1])
+
+    # Histogram of a sub-sample of the whole image, this
+    # also gives us it's minimum and maximum.
+    stride = max(1, int(math.sqrt(w * h / stats_pixels)))
+    histogram = numpy.bincount(image_data[::stride,::stride].ravel(), minlength = 65536)
+    nonzero = numpy.flatnonzero(histogram)
+    image_min = int(nonzero[0])
+    image_max = int(nonzero[-1])
+
+    # Record the intensity where the user last clicked on the image.
+    intensity_info = 0
+    if click_pos is not None:
+        [xl, yl] = click_pos
+        if ((xl >= 0) and (xl < w) and (yl >= 0) and (yl < h)):
+            intensity_info = image_data[yl, xl]
+
+    return RenderedImage(frame_number = frame.frame_number,
+                         histogram = histogram,
+                         image_max = image_max,
+                         image_min = image_min,
+                         intensity_info = intensity_info,
+                         q_image = q_image,
+                         rect = rect)
+
+def greyColorTable():
+    return [QtGui.qRgb(i,i,i) for i in range(256)]
+
+
+class RenderedImage(object):
+    """
+    A frame that is ready to be displayed. 'rect' is where
+    the image should be drawn (in chip coordinates). 'q_image'
+    is None if none of the frame was visible. 'histogram' is
+    the (65536 bin) histogram of a sub-sample of the frame.
+    """
+    def __init__(self, frame_number = 0, histogram = None, image_max = 0, image_min = 0, intensity_info = 0, q_image = None, rect = None, **kwds):
+        super().__init__(**kwds)
+        self.frame_number = frame_number
+        self.histogram = histogram
+        self.image_max = image_max
+        self.image_min = image_min
+        self.intensity_info = intensity_info
+        self.q_image = q_image
+        self.rect = rect
+
+
 class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
     """
     The idea is to display the image as it would appear on the 
@@ -35,15 +217,20 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         self.colortable = None
         self.display_range = [0, 200]
         self.display_saturated_pixels = False
+        self.downsample = "max"
         self.draw_grid = False
         self.draw_target = False
         self.frame_x_offset = 0
         self.frame_y_offset = 0
+        self.histogram = None
         self.image_max = 0
+        self.image_rect = None
         self.image_min = 0
         self.intensity_info = 0
         self.max_intensity = None
+        self.q_colortable = greyColorTable()
         self.q_image = None
+        self.rescale_table = None
         self.scale_x = 1
         self.scale_y = 1
 
@@ -56,26 +243,68 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
             self.chip_size_changed = False
         return chip_rect
 
-    def getAutoScale(self):
+    def getAutoScale(self, percentiles = None):
+        """
+        Returns [minimum, maximum] of the current image, or the
+        intensities at percentiles, i.e. [0.1, 99.9].
+        """
+        if (percentiles is not None) and (self.histogram is not None):
+            return histogramPercentiles(self.histogram, percentiles)
         return [self.image_min, self.image_max]
 
+    def getHistogram(self):
+        return self.histogram
+
     def getImage(self):
         return self.q_image
     
     def getIntensityInfo(self):
         return [self.click_x, self.click_y, self.intensity_info]
+
+    def getRenderSettings(self, decimation = 1, visible_rect = None):
+        """
+        Returns the keyword arguments for renderFrame(). These are
+        copies so that the frame can be rendered in another thread.
+
+        The defaults render the whole frame at full resolution.
+        """
+        return {"q_colortable" : self.q_colortable,
+                "table" : self.getRescaleTable(),
+                "click_pos" : [self.click_x, self.click_y],
+                "decimation" : decimation,
+                "downsample" : self.downsample,
+                "frame_offset" : [self.frame_x_offset, self.frame_y_offset],
+                "frame_scale" : [self.scale_x, self.scale_y],
+                "visible_rect" : visible_rect}
         
+    def getRescaleTable(self):
+        """
+        The rescale table only changes with the display range or
+        the color table (saturated pixels or not).
+        """
+        if self.rescale_table is None:
+            saturated_value = None
+            if self.display_saturated_pixels:
+                saturated_value = self.max_intensity
+            self.rescale_table = c_image.rescaleTable(self.display_range[0],
+                                                      self.display_range[1],
+                                                      saturated_value)
+        return self.rescale_table
+
     def newColorTable(self, colortable):
         self.colortable = colortable
         if "_sat.ctbl" in colortable:
             self.display_saturated_pixels = True
         else:
             self.display_saturated_pixels = False
+        self.rescale_table = None
+        self.setColorTable()
 
     def newConfiguration(self, camera_functionality):
         [chip_x, chip_y] = camera_functionality.getChipSize()
         [self.frame_x_offset, self.frame_y_offset] = camera_functionality.getFrameZeroZero()
         self.max_intensity = camera_functionality.getParameter("max_intensity")
+        self.rescale_table = None
         [self.scale_x, self.scale_y] = camera_functionality.getFrameScale()
         
         # Check if we need to notify the scene of a change in the chip size.
@@ -85,16 +314,30 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
             self.chip_size_changed = True
             self.prepareGeometryChange()
 
+    def newImage(self, rendered_image):
+        """
+        Display a RenderedImage (from renderFrame()).
+        """
+        self.histogram = rendered_image.histogram
+        self.image_max = rendered_image.image_max
+        self.image_min = rendered_image.image_min
+        self.image_rect = rendered_image.rect
+        self.intensity_info = rendered_image.intensity_info
+        self.q_image = rendered_image.q_image
+
+        # Force re-paint.
+        self.update()
+
     def newRange(self, d_min, d_max):
         self.display_range = [d_min, d_max]
+        self.rescale_table = None
 
     def paint(self, painter, option, widget):
         if self.q_image is not None:
 
-            # Draw the image.
-            painter.drawImage(self.frame_x_offset,
-                              self.frame_y_offset,
-                              self.q_image)
+            # Draw the image, this also up-samples to compensate
+            # for binning, if any.
+            painter.drawImage(self.image_rect, self.q_image)
             
             # Draw the grid into the buffer.
             if self.draw_grid:
@@ -118,18 +361,22 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
 
     def setColorTable(self):
         """
-        Sets the color table of the new image. If you don't do this Qt
-        will segfault without giving you a traceback or any kind of
-        warning message..
+        Converts the color table to the list of QtGui.qRgb() values
+        that renderFrame() uses.
         """
         if self.colortable:
-            for i in range(256):
-                self.q_image.setColor(i, QtGui.qRgb(self.colortable[i][0], 
-                                                    self.colortable[i][1], 
-                                                    self.colortable[i][2]))
+            self.q_colortable = [QtGui.qRgb(self.colortable[i][0],
+                                            self.colortable[i][1],
+                                            self.colortable[i][2]) for i in range(256)]
         else:
-            for i in range(256):
-                self.q_image.setColor(i,QtGui.qRgb(i,i,i))        
+            self.q_colortable = greyColorTable()
+
+    def setDownsample(self, downsample):
+        """
+        How to reduce the resolution of the frame when the view is
+        zoomed out, see downsampleImage().
+        """
+        self.downsample = downsample
 
     def setShowGrid(self, show):
         self.draw_grid = show
@@ -140,54 +387,13 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
     def updateImageWithFrame(self, frame):
         """
         Convert the frame to a QImage, then call update() to display it.
-        """
-        #
-        # For reasons lost in the mists of time 'frame' is a 1D numpy array
-        # and needs to be reshaped before rescaling and converting to a QImage.
-        #
-        w = frame.image_x
-        h = frame.image_y
-        image_data = frame.getData()
-        try:
-            image_data = image_data.reshape((h,w))
-        except ValueError as e:
-            print("Got an image with an unexpected size, ", image_data.shape, "expected [", w, ",", h, "]")
-            return
-
-        max_intensity = self.max_intensity
-        if not self.display_saturated_pixels:
-            max_intensity = None
-
-        # Rescale the image & record it's minimum and maximum.
-        [temp, self.image_min, self.image_max] = c_image.rescaleImage(image_data,
-                                                                      False,
-                                                                      False,
-                                                                      False,
-                                                                      self.display_range,
-                                                                      max_intensity)
-        
-        # Create QImage & re-scale to compensate for binning, if any.
-        temp_image = QtGui.QImage(temp.data, w, h, QtGui.QImage.Format_Indexed8)
-        if (self.scale_x != 1) or (self.scale_y != 1):
-            self.q_image = temp_image.scaled(w * self.scale_x, h * self.scale_y)
-        else:
-            self.q_image = temp_image
-        self.q_image.ndarray = temp
 
-        # Set the images color table.
-        self.setColorTable()
-
-        # Record the intensity where the user last clicked on the image.
-        # self.click_x and self.click_y are in frame coordinates.
-        xl = self.click_x
-        yl = self.click_y
-        if ((xl >= 0) and (xl < w) and (yl >= 0) and (yl < h)):
-            self.intensity_info = image_data[yl, xl]
-        else:
-            self.intensity_info = 0
-
-        # Force re-paint.
-        self.update()
+        This renders in the current thread, cameraFrameViewer uses a
+        displayRenderer.DisplayRenderer to do this in a worker thread.
+        """
+        rendered_image = renderFrame(frame, **self.getRenderSettings())
+        if rendered_image is not None:
+            self.newImage(rendered_image)
 
 
 class QtCameraGraphicsScene(QtWidgets.QGraphicsScene):
@@ -59,6 +59,20 @@ class QtCameraGraphicsView(QtWidgets.QGraphicsView):
         self.center_x = center.x()
         self.center_y = center.y()
         self.newCenter.emit(self.center_x, self.center_y)
+
+    def getSceneScale(self):
+        """
+        Returns the size of a screen pixel in scene (chip) pixels.
+        """
+        return self.drag_scale
+
+    def getVisibleRect(self):
+        """
+        Returns [x, y, width, height] of the part of the scene
+        that is visible.
+        """
+        rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        return [rect.x(), rect.y(), rect.width(), rect.height()]
         
     def keyPressEvent(self, event):
         if self.can_drag and (event.key() == QtCore.Qt.Key_Control):
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+QWidget for displaying the histogram of the current camera frame.
+
+This is drawn vertically, next to the display range slider, with
+zero intensity at the bottom and the camera maximum intensity at
+the top. The counts are shown on a log scale.
+"""
+import numpy
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class QtHistogram(QtWidgets.QWidget):
+
+    def __init__(self, parent = None, **kwds):
+        kwds["parent"] = parent
+        super().__init__(**kwds)
+        self.display_range = [0, 100]
+        self.histogram = None
+        self.max_intensity = 100
+
+    def getRows(self, n_rows):
+        """
+        Returns the (log) counts binned into n_rows, scaled to 0 - 1.
+        """
+        values = self.histogram[:self.max_intensity+1]
+        n_rows = min(n_rows, values.size)
+        edges = numpy.linspace(0, values.size, n_rows + 1).astype(numpy.int64)
+        rows = numpy.log1p(numpy.add.reduceat(values, edges[:-1]))
+        if (rows.max() > 0):
+            rows = rows/rows.max()
+        return rows
+
+    def newHistogram(self, histogram):
+        self.histogram = histogram
+        self.update()
+
+    def newRange(self, d_min, d_max):
+        self.display_range = [d_min, d_max]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        w = self.width()
+        h = self.height()
+
+        painter.fillRect(0, 0, w, h, QtCore.Qt.black)
+        if self.histogram is None:
+            return
+
+        # The histogram.
+        rows = self.getRows(h)
+        row_height = float(h)/rows.size
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(QtCore.Qt.lightGray)
+        for i, row in enumerate(rows):
+            if (row > 0.0):
+                y = h - (i + 1) * row_height
+                painter.drawRect(QtCore.QRectF(0, y, row * w, row_height))
+
+        # The display range.
+        painter.setPen(QtCore.Qt.red)
+        for value in self.display_range:
+            y = h - h * float(value)/(self.max_intensity + 1)
+            painter.drawLine(QtCore.QPointF(0, y), QtCore.QPointF(w, y))
+
+    def setMaxIntensity(self, max_intensity):
+        self.max_intensity = int(max_intensity)
+        self.update()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -1,53 +1,29 @@
 #!/usr/bin/env python
 """
-Analyze frames using QRunnables and QThreadPool.
+Analyze frames using halExecutor.SerialExecutors.
+
+Frames wait in a (bounded) queue until a worker is free. Each
+worker task takes up to 'batch_size' frames from the queue and
+analyzes them, so when the analysis can't keep up the frames are
+handled in batches, with one imageProcessed signal per batch.
 
 Hazen 05/17
 """
+import collections
 import time
 
 from PyQt5 import QtCore
 
-import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.halLib.halExecutor as halExecutor
+import storm_control.hal4000.halLib.halStatistics as halStatistics
 import storm_control.hal4000.spotCounter.lmmObjectFinder as lmmObjectFinder
 
 
-class AnalysisWorker(QtCore.QRunnable):
-    """
-    Runnable for performing image analysis.
-    """
-    def __init__(self, **kwds):
-        super().__init__(**kwds)
-        self.aw_signaler = AnalysisWorkerSignaler()
-        self.frame_analysis = None
-        self.busy = False
-
-    def isBusy(self):
-        return self.busy
-        
-    def run(self):
-        self.frame_analysis.analyzeImage()
-        self.aw_signaler.analysisDone.emit(self.frame_analysis)
-        self.busy = False
-        
-    def setFrameAnalysis(self, frame_analysis):
-        self.frame_analysis = frame_analysis
-        self.busy = True
-
-
-class AnalysisWorkerSignaler(QtCore.QObject):
-    """
-    Signal class used by the AnalysisWorker to indicate that
-    the analysis of a frame is complete.
-    """
-    analysisDone = QtCore.pyqtSignal(object)
-
-    
 class FrameAnalysis(QtCore.QObject):
     """
     This class:
      1. Stores the frame to analyze.
-     2. Does the analysis (with AnalysisWorker).
+     2. Does the analysis (in a SpotCounter worker).
      3. Stores the results of the analysis.
     """
     def __init__(self,
@@ -58,6 +34,7 @@ class FrameAnalysis(QtCore.QObject):
         super().__init__(**kwds)
         self.camera_name = camera_name
         self.frame = frame
+        self.latency = 0.0
         self.locs_count = 0
         self.threshold = threshold
         self.x_locs = None
@@ -66,6 +43,7 @@ class FrameAnalysis(QtCore.QObject):
     def analyzeImage(self):
         [self.x_locs, self.y_locs, self.locs_count] = lmmObjectFinder.findObjects(self.frame,
                                                                                   self.threshold)
+        self.latency = time.perf_counter() - self.frame.timestamp
 
     def getCameraName(self):
         return self.camera_name
@@ -75,6 +53,13 @@ class FrameAnalysis(QtCore.QObject):
 
     def getFrameNumber(self):
         return self.frame.frame_number
+
+    def getLatency(self):
+        """
+        Time from when the frame was received from the
+        camera to the end of the analysis in seconds.
+        """
+        return self.latency
         
     def getLocalizations(self):
         return [self.x_locs[:self.locs_count],
@@ -82,72 +67,184 @@ class FrameAnalysis(QtCore.QObject):
         
 
 class SpotCounter(QtCore.QObject):
-    imageProcessed = QtCore.pyqtSignal(object)
+    """
+    batch_size - The maximum number of frames a worker analyzes in one go.
+    frame_stride - Only analyze frames whose frame number is a multiple of
+                   this, so that what gets analyzed does not depend on the
+                   computer load.
+    max_queue - The maximum number of frames waiting to be analyzed. If the
+                queue is full the oldest frame is dropped.
+    max_threads - The number of workers.
+    max_size - Frames larger than this (in pixels) are not analyzed.
+    """
+    imagesProcessed = QtCore.pyqtSignal(object)
+    newStatistics = QtCore.pyqtSignal(object)
 
-    def __init__(self, max_threads = None, max_size = 0, **kwds):
+    def __init__(self, batch_size = 4, frame_stride = 1, max_queue = 32, max_threads = 1, max_size = 0, **kwds):
         super().__init__(**kwds)
 
-        self.dropped = 0
+        self.batch_size = batch_size
+        self.frame_stride = frame_stride
+        self.idle = []
+        self.latency = halStatistics.Histogram()
+        self.max_queue = max_queue
         self.max_size = max_size
-        self.threadpool = halModule.threadpool
-        self.total = 0
+        self.mutex = QtCore.QMutex()
+        self.queue = collections.deque()
+        self.stats_timer = QtCore.QTimer(self)
         self.workers = []
 
+        # Counters.
+        self.n_analyzed = 0
+        self.n_dropped = 0
+        self.n_skipped = 0
+        self.n_too_large = 0
+        self.n_total = 0
+
         # Create analysis workers.
         for i in range(max_threads):
-            aw = AnalysisWorker()
-            aw.setAutoDelete(False)
-            aw.aw_signaler.analysisDone.connect(self.handleAnalysisDone)
-            self.workers.append(aw)
+            worker = halExecutor.SerialExecutor(name = "spot counter")
+            self.idle.append(worker)
+            self.workers.append(worker)
+
+        # Emit the statistics once a second.
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.handleStatsTimer)
+        self.stats_timer.start()
 
         # Initialize object finder.
         lmmObjectFinder.initialize()
+
+    def analyzeBatch(self, worker):
+        """
+        This is what runs in the worker threads.
+        """
+        self.mutex.lock()
+        batch = []
+        while (len(self.queue) > 0) and (len(batch) < self.batch_size):
+            batch.append(self.queue.popleft())
+        self.mutex.unlock()
+
+        analyzed = []
+        try:
+            for frame_analysis in batch:
+                frame_analysis.analyzeImage()
+                analyzed.append(frame_analysis)
+        finally:
+            for frame_analysis in batch:
+                frame_analysis.frame.release()
+
+            self.mutex.lock()
+            self.n_analyzed += len(analyzed)
+            for frame_analysis in analyzed:
+                self.latency.add(frame_analysis.getLatency())
+            self.idle.append(worker)
+            self.mutex.unlock()
+
+            # Keep going if there are more frames, even if the analysis failed.
+            self.startWorkers()
+
+        if (len(analyzed) > 0):
+            self.imagesProcessed.emit(analyzed)
             
     def cleanUp(self):
+        self.stats_timer.stop()
 
-        # Wait for workers to finish.
-        still_busy = True
-        while still_busy:
-            all_busy = False
+        # Wait for the workers to analyze the frames in the queue.
+        while True:
             for worker in self.workers:
-                if worker.isBusy():
-                    all_busy = True
-                    break
-            still_busy = all_busy
-            time.sleep(0.1)
+                worker.waitForDone()
+            self.mutex.lock()
+            done = (len(self.idle) == len(self.workers))
+            self.mutex.unlock()
+            if done:
+                break
+
+        for worker in self.workers:
+            worker.stop()
+
+        # Release any frames that are still in the queue.
+        self.mutex.lock()
+        while (len(self.queue) > 0):
+            self.queue.popleft().frame.release()
+            self.n_dropped += 1
+        self.mutex.unlock()
         
         # Object finder cleanup.
         lmmObjectFinder.cleanUp()
 
         # Print statistics.
-        print("> spot counter dropped", self.dropped, "images out of", self.total, "total images")
+        print("> spot counter dropped", self.n_dropped, "images out of", self.n_total, "total images")
+
+    def getStatistics(self):
+        self.mutex.lock()
+        stats = {"analyzed" : self.n_analyzed,
+                 "dropped" : self.n_dropped,
+                 "queue length" : len(self.queue),
+                 "skipped" : self.n_skipped,
+                 "too large" : self.n_too_large,
+                 "total" : self.n_total,
+                 "latency" : self.latency.toDict()}
+        self.mutex.unlock()
+        return stats
+
+    def handleStatsTimer(self):
+        self.newStatistics.emit(self.getStatistics())
 
-    def handleAnalysisDone(self, frame_analysis):
-        self.imageProcessed.emit(frame_analysis)
-        
     def newFrameToAnalyze(self, camera_name, frame, threshold):
-        
+        self.mutex.lock()
+        self.n_total += 1
+
         # Check if the current camera image is small
         # enough that we can analyze it.
         if ((frame.image_x * frame.image_y) > self.max_size):
+            self.n_too_large += 1
+            self.mutex.unlock()
             return
-        
-        self.total += 1
 
-        # Check if there is a thread available to analyze the image.
-        was_dropped = True
-        for worker in self.workers:
-            if not worker.isBusy():
-                worker.setFrameAnalysis(FrameAnalysis(camera_name = camera_name,
-                                                      frame = frame,
-                                                      threshold = threshold))
-                self.threadpool.start(worker)
-                was_dropped = False
-                break
+        # Sub-sample based on the frame number.
+        if ((frame.frame_number % self.frame_stride) != 0):
+            self.n_skipped += 1
+            self.mutex.unlock()
+            return
+
+        # Make room in the queue if necessary.
+        if (len(self.queue) >= self.max_queue):
+            self.queue.popleft().frame.release()
+            self.n_dropped += 1
+
+        frame.retain()
+        self.queue.append(FrameAnalysis(camera_name = camera_name,
+                                        frame = frame,
+                                        threshold = threshold))
+        self.mutex.unlock()
+
+        self.startWorkers()
+
+    def resetStatistics(self):
+        self.mutex.lock()
+        self.latency = halStatistics.Histogram()
+        self.n_analyzed = 0
+        self.n_dropped = 0
+        self.n_skipped = 0
+        self.n_too_large = 0
+        self.n_total = 0
+        self.mutex.unlock()
 
-        if was_dropped:
-            self.dropped += 1
+    def startWorkers(self):
+        """
+        Start idle workers, if there are frames for them.
+        """
+        self.mutex.lock()
+        starting = []
+        n_queued = len(self.queue)
+        while (n_queued > 0) and (len(self.idle) > 0):
+            starting.append(self.idle.pop())
+            n_queued -= self.batch_size
+        self.mutex.unlock()
 
+        for worker in starting:
+            worker.submit(self.analyzeBatch, (worker,))
 
 #
 # The MIT License
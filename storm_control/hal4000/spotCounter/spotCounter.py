@@ -55,11 +55,11 @@ class Analyzer(QtCore.QObject):
                                                      shutters_info = shutters_info)
 
         self.camera_fn.newFrame.connect(self.handleNewFrame)
-        self.spot_counter.imageProcessed.connect(self.handleProcessedImage)
+        self.spot_counter.imagesProcessed.connect(self.handleProcessedImages)
 
     def cleanUp(self):
         self.camera_fn.newFrame.disconnect(self.handleNewFrame)
-        self.spot_counter.imageProcessed.disconnect(self.handleProcessedImage)
+        self.spot_counter.imagesProcessed.disconnect(self.handleProcessedImages)
         
     def getCameraName(self):
         return self.camera_fn.getCameraName()
@@ -96,6 +96,10 @@ class Analyzer(QtCore.QObject):
 
                 self.totalCount.emit(self.total_counts)
 
+    def handleProcessedImages(self, frame_analyses):
+        for frame_analysis in frame_analyses:
+            self.handleProcessedImage(frame_analysis)
+
     def savePicture(self, basename):
         ext = self.camera_fn.getParameter("extension")
         if (len(ext) > 0):
@@ -170,6 +174,16 @@ class SpotCounterView(halDialog.HalDialog):
             analyzer.setMaxSpots(new_max)
         self.parameters.setv("max_spots", new_max)
 
+    def handleStatistics(self, stats):
+        text = "analyzed {0:d}, dropped {1:d}, skipped {2:d}".format(stats["analyzed"],
+                                                                      stats["dropped"],
+                                                                      stats["skipped"])
+        if (stats["too large"] > 0):
+            text += ", too large {0:d}".format(stats["too large"])
+        text += "\nlatency {0:.1f} ms (mean), {1:.1f} ms (max)".format(stats["latency"]["mean ms"],
+                                                                      stats["latency"]["max ms"])
+        self.ui.label.setText(text)
+
     def handleTotalCount(self, total_count):
         self.ui.countsLabel1.setText(str(total_count))
         self.ui.countsLabel2.setText(str(total_count))
@@ -220,13 +234,17 @@ class SpotCounter(halModule.HalModule):
 
         configuration = module_params.get("configuration")
 
-        self.spot_counter = findSpots.SpotCounter(max_threads = configuration.get("max_threads"),
+        self.spot_counter = findSpots.SpotCounter(batch_size = configuration.get("batch_size", 4),
+                                                  frame_stride = configuration.get("frame_stride", 1),
+                                                  max_queue = configuration.get("max_queue", 32),
+                                                  max_threads = configuration.get("max_threads"),
                                                   max_size = configuration.get("max_size"))
 
         self.view = SpotCounterView(module_name = self.module_name,
                                     configuration = configuration)
         self.view.halDialogInit(qt_settings,
                                 module_params.get("setup_name") + " spot counter")
+        self.spot_counter.newStatistics.connect(self.view.handleStatistics)
 
         # Spot counter parameters.
         self.parameters = params.StormXMLObject()
@@ -344,6 +362,7 @@ class SpotCounter(halModule.HalModule):
             if film_settings.isSaved():
                 self.basename = film_settings.getBasename()
 
+            self.spot_counter.resetStatistics()
             for analyzer in self.analyzers:
                 analyzer.startFilm(film_settings)
 
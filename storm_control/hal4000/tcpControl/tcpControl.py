@@ -104,6 +104,26 @@ class TCPAction(QtCore.QObject):
         server.sendMessage(self.tcp_message)
 
 
+class TCPActionGetStatistics(TCPAction):
+    """
+    Returns HAL's message passing statistics.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.hal_message = halMessage.HalMessage(m_type = "get statistics",
+                                                 data = {"reset" : bool(self.tcp_message.getData("reset", False))})
+
+    def handleResponses(self, message):
+        if (message != self.hal_message):
+            return False
+
+        responses = message.getResponses()
+        assert (len(responses) == 1)
+        self.tcp_message.addResponse("statistics", responses[0].getData()["statistics"])
+        self.was_handled = True
+        return True
+
+
 class TCPActionGetMovieStats(TCPAction):
     """
     This is used to calculate the stats of a movie request that 
@@ -425,6 +445,10 @@ class Controller(QtCore.QObject):
             action = TCPAction(tcp_message = tcp_message)
             self.controlAction.emit(action)            
                 
+        elif tcp_message.isType("Get Statistics"):
+            action = TCPActionGetStatistics(tcp_message = tcp_message)
+            self.controlAction.emit(action)
+
         elif tcp_message.isType("Set Directory"):
             warnings.warn("The 'Set Directory' message is deprecated.")
             directory = tcp_message.getData("directory")
@@ -126,6 +126,41 @@ class GetParameters(TestAction):
         self.checkParameters()
 
 
+class GetStatistics(TestAction):
+    """
+    Get HAL's message passing statistics.
+    """
+    def __init__(self, reset = False, **kwds):
+        super().__init__(**kwds)
+
+        self.m_type = "get statistics"
+        self.reset = reset
+        self.statistics = None
+
+    def checkStatistics(self):
+        """
+        Sub-classes should override this run tests on the 
+        statistics that were returned.
+        """
+        pass
+
+    def finalizer(self):
+        """
+        HalCore adds the response when it sends the message, so we can
+        check it here, before the next action starts.
+        """
+        super().finalizer()
+        responses = self.message.getResponses()
+        if (len(responses) != 1):
+            raise TestException("Expected one response to message '" + self.m_type + "'")
+        self.statistics = responses[0].getData()["statistics"]
+        self.checkStatistics()
+        self.actionDone.emit()
+
+    def getMessageData(self):
+        return {"reset" : self.reset}
+
+
 class LoadParameters(TestAction):
     """
     Load a parameters file.
@@ -77,6 +77,16 @@ class GetMosaicSettings(TestActionTCP):
                                                  test_mode = self.test_mode)
 
 
+class GetStatistics(TestActionTCP):
+    """
+    Query HAL for it's message passing statistics.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Statistics",
+                                                 test_mode = self.test_mode)
+
+
 class GetObjective(TestActionTCP):
     """
     Query HAL for the current objective.
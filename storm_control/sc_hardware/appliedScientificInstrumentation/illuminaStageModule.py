@@ -28,16 +28,25 @@ class AsiStageFunctionality(stageModule.StageFunctionalityNF):  # NF
 
 class AsiStageRS232(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
-        
-        configuration = module_params.get("configuration")
-        self.stage = iStage.MS2000(port = configuration.get("com_port"))
 
-        if self.stage.getStatus():
-            # self.stage.setVelocity(10000,10000)
+        self.stage = hardware
+        if self.stage is not None:
             self.stage_functionality = AsiStageFunctionality(device_mutex = QtCore.QMutex(),
                                                               stage = self.stage,
                                                               update_interval = 1000)
-        else:
-            self.stage = None
\ No newline at end of file
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Connect to the MS2000 controller, this runs in a thread pool
+        thread at start up (see HalModule.initializeHardware()).
+        """
+        configuration = module_params.get("configuration")
+        stage = iStage.MS2000(port = configuration.get("com_port"))
+        if not stage.getStatus():
+            return None
+
+        # stage.setVelocity(10000,10000)
+        return stage
\ No newline at end of file
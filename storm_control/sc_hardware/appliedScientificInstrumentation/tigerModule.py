@@ -168,6 +168,7 @@ class TigerZStageFunctionality(stageZModule.ZStageFunctionalityBuffered):
 # have to duplicate most of the stage stuff, particularly the TCP control.
 #
 class TigerController(stageModule.StageModule):
+    message_types = stageModule.StageModule.message_types + ["configure1"]
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -87,6 +87,12 @@ class DaqFunctionality(hardwareModule.HardwareFunctionality):
 
 
 class DaqModule(hardwareModule.HardwareModule):
+    message_types = ["configuration",
+                     "configure1",
+                     "daq waveforms",
+                     "get functionality",
+                     "start film",
+                     "stop film"]
     
     def __init__(self, **kwds):
         super().__init__(**kwds)
@@ -9,11 +9,11 @@ Hazen 04/17
 #import copy
 
 import faulthandler
-import time
 from PyQt5 import QtCore
 
 import storm_control.sc_library.halExceptions as halExceptions
 
+import storm_control.hal4000.halLib.halExecutor as halExecutor
 import storm_control.hal4000.halLib.halFunctionality as halFunctionality
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
@@ -80,17 +80,27 @@ class BufferedFunctionality(HardwareFunctionality):
     request will be processed.
 
     mustRun() will process all requests.
+
+    The requests are run in order by a halExecutor.SerialExecutor.
+
+    max_backlog limits the number of requests that can be waiting to
+    run, 0 is no limit. This is useful for devices that are polled, like
+    QPDs and stages, as otherwise a backlog of requests will build up if
+    the device can't keep up. backlog_policy is what to do with a request
+    when the backlog is full, see halExecutor.policies. With the "fail"
+    policy mustRun() raises a HardwareException.
     """
     jobDone = QtCore.pyqtSignal()
     jobStarted = QtCore.pyqtSignal()
     
-    def __init__(self, device_mutex = None, **kwds):
+    def __init__(self, device_mutex = None, max_backlog = 0, backlog_policy = "block", **kwds):
         super().__init__(**kwds)
         self.busy = False
         self.device_mutex = device_mutex
-        self.next_request = None
+        self.executor = halExecutor.SerialExecutor(name = self.__class__.__name__,
+                                                   max_queue = max_backlog,
+                                                   policy = backlog_policy)
         self.running = True
-        self.workers = []
 
         assert(isinstance(self.device_mutex, QtCore.QMutex))
         
@@ -109,23 +119,17 @@ class BufferedFunctionality(HardwareFunctionality):
         self.jobDone.connect(self.handleJobDone)
         self.jobStarted.connect(self.handleJobStarted)
 
-    def cleanUpWorkers(self):
+    def getBacklog(self):
         """
-        Remove any workers that have finished.
+        Returns the number of requests that are waiting to run.
         """
-        still_working = []
-        for worker in self.workers:
-            if not worker.isFinished():
-                still_working.append(worker)
-        self.workers = still_working
+        return self.executor.getQueueLength()
+
+    def getBacklogStatistics(self):
+        return self.executor.getStatistics()
 
     def handleJobDone(self):
         self.kill_timer.stop()
-
-        # Start the next 'maybe' request, if there was one.
-        if self.next_request is not None:
-            self.start(*self.next_request)
-            self.next_request = None
         
     def handleJobStarted(self):
         self.kill_timer.start()        
@@ -144,18 +148,15 @@ class BufferedFunctionality(HardwareFunctionality):
         processed. This will process them in the order received, but 
         will only process the most recently received request.
         """
-        if not self.busy:
-            self.busy = True
-            self.start(task, args, ret_signal)
-        else:
-            self.next_request = [task, args, ret_signal]
+        if self.running:
+            self.executor.submit(self.run, [task, args, ret_signal], key = "maybe")
 
     def mustRun(self, task = None, args = [], ret_signal = None):
         """
         Call this method with requests that must be processed.
 
-        FIXME: There is some danger here of being able to build up a
-               large backlog of QRunnables that are waiting to run.
+        If max_backlog is not 0 then what happens when the backlog is
+        full depends on the backlog policy.
         """
         self.start(task, args, ret_signal)
 
@@ -175,34 +176,25 @@ class BufferedFunctionality(HardwareFunctionality):
             ret_signal.emit(retv)
 
     def start(self, task, args, ret_signal):
-        hw = HardwareWorker(task = self.run,
-                            args = [task, args, ret_signal])
-        self.startWorker(hw)
+        if self.running:
+            if not self.executor.submit(self.run, [task, args, ret_signal]):
+                if (self.executor.policy == "fail") and self.running:
+                    e_string = self.__class__.__name__ + " backlog is full!"
+                    raise halExceptions.HardwareException(e_string)
 
     def startWorker(self, worker):
-        if not self.running:
-            return
-
-        # Remove any old workers that have finished.
-        self.cleanUpWorkers()
-
-        # We need to manage the workers ourselves because otherwise we'll
-        # experience strange/sporadic errors like the GUI freezing.
-        worker.setAutoDelete(False)
-        self.workers.append(worker)
-        
-        getThreadPool().start(worker)
+        """
+        Run a HardwareWorker (or any QRunnable).
+        """
+        if self.running:
+            self.executor.submit(worker.run)
         
     def wait(self):
         """
-        Block job submission and wait for the last job to finish.
+        Block job submission and wait for the jobs to finish.
         """
         self.running = False
-        while(self.busy):
-            print("BufferedFunctionality wait")
-            time.sleep(0.1)
-
-        self.cleanUpWorkers()
+        self.executor.stop()
 
 
 class HardwareModule(halModule.HalModule):
@@ -210,3 +202,14 @@ class HardwareModule(halModule.HalModule):
     def __init__(self, **kwds):
         super().__init__(**kwds)
 
+    def getBacklogs(self):
+        """
+        Returns a dictionary with the backlog (number of requests waiting
+        to run) of each of this module's BufferedFunctionalities.
+        """
+        backlogs = {}
+        for [name, value] in sorted(vars(self).items()):
+            if isinstance(value, BufferedFunctionality):
+                backlogs[name] = value.getBacklog()
+        return backlogs
+
@@ -82,16 +82,12 @@ class CoherentModule(amplitudeModule.AmplitudeModule):
 
 class CoherentCube(CoherentModule):
     
-    def __init__(self, module_params = None, **kwds):
+    def __init__(self, module_params = None, hardware = None, **kwds):
         kwds["module_params"] = module_params
         super().__init__(**kwds)
 
-        serial_port = module_params.get("configuration").get("port")
-
-        import storm_control.sc_hardware.coherent.cube as cube
-        self.laser = cube.Cube(port = serial_port)
-
-        if self.laser.getStatus():
+        self.laser = hardware
+        if self.laser is not None:
             [pmin, pmax] = self.laser.getPowerRange()
             self.laser_functionality = CoherentLaserFunctionality(device_mutex = self.device_mutex,
                                                                   display_normalized = True,
@@ -99,22 +95,30 @@ class CoherentCube(CoherentModule):
                                                                   minimum = 0,
                                                                   maximum = int(100.0 * pmax),
                                                                   used_during_filming = self.used_during_filming)
-        else:
-            self.laser = None
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Open the serial connection to the laser in a thread pool
+        thread, see HalModule.initializeHardware().
+        """
+        serial_port = module_params.get("configuration").get("port")
+
+        import storm_control.sc_hardware.coherent.cube as cube
+        laser = cube.Cube(port = serial_port)
+        if not laser.getStatus():
+            return None
+        return laser
 
 
 class CoherentObis(CoherentModule):
     
-    def __init__(self, module_params = None, **kwds):
+    def __init__(self, module_params = None, hardware = None, **kwds):
         kwds["module_params"] = module_params
         super().__init__(**kwds)
 
-        serial_port = module_params.get("configuration").get("port")
-
-        import storm_control.sc_hardware.coherent.obis as obis
-        self.laser = obis.Obis(port = serial_port)
-
-        if self.laser.getStatus():
+        self.laser = hardware
+        if self.laser is not None:
             [pmin, pmax] = self.laser.getPowerRange()
             self.laser_functionality = CoherentLaserFunctionality(device_mutex = self.device_mutex,
                                                                   display_normalized = True,
@@ -122,5 +126,17 @@ class CoherentObis(CoherentModule):
                                                                   minimum = 0,
                                                                   maximum = int(100.0 * pmax),
                                                                   used_during_filming = self.used_during_filming)
-        else:
-            self.laser = None            
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Like CoherentCube, the laser is opened at start up in a
+        thread pool thread.
+        """
+        serial_port = module_params.get("configuration").get("port")
+
+        import storm_control.sc_hardware.coherent.obis as obis
+        laser = obis.Obis(port = serial_port)
+        if not laser.getStatus():
+            return None
+        return laser
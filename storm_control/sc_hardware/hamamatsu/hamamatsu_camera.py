@@ -273,6 +273,7 @@ class HamamatsuCamera(object):
         self.debug = False
         self.encoding = 'utf-8'
         self.frame_bytes = 0
+        self.frame_pool = None
         self.frame_x = 0
         self.frame_y = 0
         self.last_frame_number = 0
@@ -409,9 +410,16 @@ class HamamatsuCamera(object):
                                                 ctypes.byref(paramlock)),
                              "dcambuf_lockframe")
 
-            # Create storage for the frame & copy into this storage.
-            hc_data = HCamData(self.frame_bytes)
-            hc_data.copyData(paramlock.buf)
+            # Copy into a buffer from the frame pool if one is available,
+            # otherwise create storage for the frame.
+            hc_data = None
+            if (self.frame_pool is not None) and ((2 * self.frame_pool.n_pixels) == self.frame_bytes):
+                hc_data = self.frame_pool.acquire()
+            if hc_data is not None:
+                ctypes.memmove(hc_data.getDataPtr(), paramlock.buf, self.frame_bytes)
+            else:
+                hc_data = HCamData(self.frame_bytes)
+                hc_data.copyData(paramlock.buf)
 
             frames.append(hc_data)
 
@@ -648,6 +656,14 @@ class HamamatsuCamera(object):
 
         return new_frames
 
+    def setFramePool(self, frame_pool):
+        """
+        Set the (HAL) frame pool that getFrames() will copy frames
+        into. This is expected to be sized for the current frame,
+        it is ignored if it is not.
+        """
+        self.frame_pool = frame_pool
+
     def setPropertyValue(self, property_name, property_value):
         """
         Set the value of a property.
@@ -791,6 +807,13 @@ class HamamatsuCamera(object):
         text_values = self.getPropertyText(property_name)
         return sorted(text_values, key = text_values.get)
 
+    def waitForFrames(self, timeout):
+        """
+        Nothing to do here as getFrames() already waits (in newFrames())
+        for the camera to signal that a new frame is ready.
+        """
+        pass
+
 
 class HamamatsuCameraMR(HamamatsuCamera):
     """
@@ -28,19 +28,28 @@ class LudlStageFunctionality(stageModule.StageFunctionalityNF):
 
 class LudlStageRS232(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
-        
-        configuration = module_params.get("configuration")
-        self.stage = ludl.LudlRS232(port = configuration.get("com_port"))
 
-        if self.stage.getStatus():
-            self.stage.setVelocity(10000,10000)
+        self.stage = hardware
+        if self.stage is not None:
             self.stage_functionality = LudlStageFunctionality(device_mutex = QtCore.QMutex(),
                                                               stage = self.stage,
                                                               update_interval = 500)
-        else:
-            self.stage = None
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Open the serial connection to the stage. HAL does this in
+        parallel with creating the other modules.
+        """
+        configuration = module_params.get("configuration")
+        stage = ludl.LudlRS232(port = configuration.get("com_port"))
+        if not stage.getStatus():
+            return None
+
+        stage.setVelocity(10000,10000)
+        return stage
 
             
 class LudlStageTCP(stageModule.StageModule):
@@ -160,20 +160,28 @@ class MarzhauserPollingThread(QtCore.QThread):
 
 class MarzhauserStage(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
 
-        configuration = module_params.get("configuration")
-        self.stage = marzhauser.MarzhauserRS232(baudrate = configuration.get("baudrate"),
-                                                port = configuration.get("port"))
-        if self.stage.getStatus():
-
-            # Set (maximum) stage velocity.
-            velocity = configuration.get("velocity")
-            self.stage.setVelocity(velocity, velocity)
+        self.stage = hardware
+        if self.stage is not None:
             self.stage_functionality = MarzhauserStageFunctionality(device_mutex = QtCore.QMutex(),
                                                                     stage = self.stage,
                                                                     update_interval = 500)
 
-        else:
-            self.stage = None
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Opening the serial port and talking to the stage is slow, so
+        HAL does this in parallel with creating the other modules.
+        """
+        configuration = module_params.get("configuration")
+        stage = marzhauser.MarzhauserRS232(baudrate = configuration.get("baudrate"),
+                                           port = configuration.get("port"))
+        if not stage.getStatus():
+            return None
+
+        # Set (maximum) stage velocity.
+        velocity = configuration.get("velocity")
+        stage.setVelocity(velocity, velocity)
+        return stage
@@ -66,7 +66,7 @@ class AITaskFunctionality(NidaqFunctionality):
         try:
             return self.task.getData()
         except nicontrol.NIException as exception:
-            hdebug.logText("AITaskFunctionality Error", str(exception))
+            hdebug.logText("AITaskFunctionality Error " + str(exception), to_console = True)
             self.task.stopTask()
             self.createTask()
 
@@ -86,7 +86,7 @@ class AOTaskFunctionality(NidaqFunctionality):
         try:
             self.task.output(voltage)
         except nicontrol.NIException as exception:
-            hdebug.logText("AOTaskFunctionality Error", str(exception))
+            hdebug.logText("AOTaskFunctionality Error " + str(exception), to_console = True)
             self.task.stopTask()
             self.createTask()
 
@@ -170,7 +170,7 @@ class DOTaskFunctionality(NidaqFunctionality):
         try:
             self.task.output(state)
         except nicontrol.NIException as exception:
-            hdebug.logText("DOTaskFunctionality Error", str(exception))
+            hdebug.logText("DOTaskFunctionality Error " + str(exception), to_console = True)
             self.task.stopTask()
             self.createTask()
 
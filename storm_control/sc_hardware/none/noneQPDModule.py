@@ -96,6 +96,8 @@ class NoneQPDModule(hardwareModule.HardwareModule):
 
         self.configuration = module_params.get("configuration")
         self.qpd_functionality = NoneQPDFunctionality(device_mutex = QtCore.QMutex(),
+                                                      max_backlog = self.configuration.get("max_backlog", 0),
+                                                      backlog_policy = self.configuration.get("backlog_policy", "block"),
                                                       parameters = self.configuration.get("parameters"),
                                                       noise = self.configuration.get("noise", 0.0),
                                                       tilt = self.configuration.get("tilt", 0.0),
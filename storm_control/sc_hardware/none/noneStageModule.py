@@ -143,6 +143,8 @@ class NoneStageModule(stageModule.StageModule):
         self.stage.setVelocity(velocity, velocity)
         
         self.stage_functionality = NoneStageFunctionality(device_mutex = QtCore.QMutex(),
+                                                          max_backlog = configuration.get("max_backlog", 0),
+                                                          backlog_policy = configuration.get("backlog_policy", "block"),
                                                           stage = self.stage,
                                                           update_interval = 500)
 
@@ -49,7 +49,7 @@ class PriorStageFunctionality(stageModule.StageFunctionalityNF):
 #
 class PriorController(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
         self.controller_mutex = QtCore.QMutex()
         self.focus_functionality = None
@@ -57,10 +57,9 @@ class PriorController(stageModule.StageModule):
         self.fwheel2_functionality = None
 
         configuration = module_params.get("configuration")
-        self.controller = prior.Prior(baudrate = configuration.get("baudrate"),
-                                      port = configuration.get("port"))
+        self.controller = hardware
         
-        if self.controller.getStatus():
+        if self.controller is not None:
 
             # Do we have an actual XY stage connected?
             if self.controller.hasDevice("stage"):
@@ -68,10 +67,6 @@ class PriorController(stageModule.StageModule):
                 # We do this so that the superclass works correctly."
                 self.stage = self.controller
 
-                # If we do, set the (maximum) stage velocity.
-                velocity = configuration.get("velocity")
-                self.controller.setVelocity(velocity, velocity)
-
                 self.stage_functionality = PriorStageFunctionality(device_mutex = self.controller_mutex,
                                                                    stage = self.controller,
                                                                    update_interval = 500)
@@ -89,8 +84,6 @@ class PriorController(stageModule.StageModule):
                                                                            maximum = configuration.get("filter_wheel2.maximum"),
                                                                            prior_controller = self.controller,
                                                                            wheel_number = 2)
-        else:
-            self.controller = None
     
     def cleanUp(self, qt_settings):
         if self.controller is not None:
@@ -119,6 +112,25 @@ class PriorController(stageModule.StageModule):
                 message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                                   data = {"functionality" : self.fwheel2_functionality}))                
 
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Connect to the controller. HAL does this in a thread pool
+        thread, so the (slow) serial port set up doesn't hold up
+        the creation of the other modules.
+        """
+        configuration = module_params.get("configuration")
+        controller = prior.Prior(baudrate = configuration.get("baudrate"),
+                                 port = configuration.get("port"))
+        if not controller.getStatus():
+            return None
+
+        # If there is an XY stage, set the (maximum) stage velocity.
+        if controller.hasDevice("stage"):
+            velocity = configuration.get("velocity")
+            controller.setVelocity(velocity, velocity)
+        return controller
+
     def processMessage(self, message):
         if message.isType("get functionality"):
             self.getFunctionality(message)
@@ -141,9 +141,23 @@ class ZaberPollingThread(QtCore.QThread):
 
 class ZaberXYStage(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    def __init__(self, module_params = None, qt_settings = None, hardware = None, **kwds):
         super().__init__(**kwds)
 
+        self.stage = hardware
+        if self.stage is not None:
+
+            # Create the stage functionality
+            self.stage_functionality = ZaberXYStageFunctionality(device_mutex = QtCore.QMutex(),
+                                                                    stage = self.stage,
+                                                                    update_interval = 500)
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        """
+        Connect to the stage and set its velocity. HAL calls this in
+        a thread pool thread at start up.
+        """
         # Extract configuration
         configuration = module_params.get("configuration")
         
@@ -154,22 +168,16 @@ class ZaberXYStage(stageModule.StageModule):
                         "y_max": configuration.get("y_max",100000)}
         
         # Create the stage
-        self.stage = zaber.ZaberXYRS232(baudrate = configuration.get("baudrate"),
-                                        port = configuration.get("port"), 
-                                        unit_to_um = configuration.get("unit_to_um", 0.15625),
-                                        stage_id = configuration.get("stage_id", 2), 
-                                        limits_dict = limits_dict)
-        if self.stage.getStatus():            
-            
-            # Set (maximum) stage velocity.
-            velocity = configuration.get("velocity", None)
-            if not velocity is None:
-                self.stage.setVelocity(velocity, velocity)
+        stage = zaber.ZaberXYRS232(baudrate = configuration.get("baudrate"),
+                                   port = configuration.get("port"), 
+                                   unit_to_um = configuration.get("unit_to_um", 0.15625),
+                                   stage_id = configuration.get("stage_id", 2), 
+                                   limits_dict = limits_dict)
+        if not stage.getStatus():
+            return None
             
-            # Create the stage functionality
-            self.stage_functionality = ZaberXYStageFunctionality(device_mutex = QtCore.QMutex(),
-                                                                    stage = self.stage,
-                                                                    update_interval = 500)
-
-        else:
-            self.stage = None
+        # Set (maximum) stage velocity.
+        velocity = configuration.get("velocity", None)
+        if not velocity is None:
+            stage.setVelocity(velocity, velocity)
+        return stage
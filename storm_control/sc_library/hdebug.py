@@ -2,18 +2,134 @@
 """
 Debugging decorators & logging.
 
+There are two kinds of logging. The default is synchronous, the
+text is written to the log file (using Python's logging module)
+by the thread that called logText().
+
+The other is asynchronous (startLogging(asynchronous = True)).
+In this mode logText() only appends a record to a queue, and a
+background thread formats the records and writes them to the log
+file, one JSON object per line. This is much cheaper for the
+caller, so it is what you want if you are logging every message.
+
 Hazen 01/14
 """
 
+import atexit
+import collections
 import functools
+import json
 import logging
 import logging.handlers
+import os
+import threading
+import time
 
 from PyQt5 import QtCore
 
 a_logger = False
 logging_mutex = QtCore.QMutex()
 
+
+class AsyncLogger(object):
+    """
+    Writes log records to a JSON lines file in a background thread.
+
+    Each record is a tuple of (monotonic time, thread id, text, args),
+    the text is only formatted (with args) when it is written, so
+    args should be things like strings and numbers that won't change
+    before then. Appending to a deque is thread safe, so logging does
+    not have to lock anything.
+
+    The file is rotated like logging.handlers.RotatingFileHandler.
+    """
+    def __init__(self, filename = None, max_bytes = 10000000, backup_count = 5, flush_interval = 0.1, **kwds):
+        super().__init__(**kwds)
+        self.backup_count = backup_count
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.n_records = 0
+        self.queue = collections.deque()
+        self.running = True
+        self.wake_up = threading.Event()
+
+        self.fp = open(self.filename, "a")
+
+        # The first record relates the monotonic times to the time of day.
+        self.writeLine({"time" : time.monotonic(),
+                        "start" : time.time(),
+                        "pid" : os.getpid()})
+
+        self.thread = threading.Thread(target = self.run, name = "hdebug", daemon = True)
+        self.thread.start()
+
+    def flush(self):
+        """
+        Write all the queued records. This is only called by
+        the logging thread (or by stop() once it has stopped).
+        """
+        while True:
+            try:
+                [r_time, r_thread, r_text, r_args] = self.queue.popleft()
+            except IndexError:
+                break
+
+            record = {"time" : r_time, "thread" : r_thread}
+            if (len(r_args) > 0):
+                record["args"] = r_args
+                try:
+                    record["text"] = r_text.format(*r_args)
+                except Exception as exception:
+                    record["text"] = r_text
+                    record["error"] = str(exception)
+            else:
+                record["text"] = r_text
+            self.writeLine(record)
+        self.fp.flush()
+
+    def info(self, a_string):
+        self.log(a_string, ())
+
+    def log(self, a_string, args):
+        self.queue.append((time.monotonic(), threading.get_ident(), a_string, args))
+
+    def rotate(self):
+        self.fp.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.filename + "." + str(i)
+            if os.path.exists(src):
+                os.replace(src, self.filename + "." + str(i + 1))
+        if (self.backup_count > 0):
+            os.replace(self.filename, self.filename + ".1")
+        else:
+            os.remove(self.filename)
+        self.fp = open(self.filename, "a")
+
+    def run(self):
+        while self.running:
+            self.wake_up.wait(self.flush_interval)
+            self.wake_up.clear()
+            self.flush()
+
+    def stop(self):
+        """
+        Stop the logging thread and write anything that is left.
+        """
+        if self.running:
+            self.running = False
+            self.wake_up.set()
+            self.thread.join()
+            self.flush()
+            self.fp.close()
+
+    def writeLine(self, record):
+        self.fp.write(json.dumps(record, default = str) + "\n")
+        self.n_records += 1
+        if (self.max_bytes > 0) and (self.fp.tell() > self.max_bytes):
+            self.rotate()
+
+
 def objectToString(a_object, a_name, a_attrs):
     a_string = "<" + a_name
     for a_attr in a_attrs:
@@ -32,6 +148,11 @@ def debug(fn):
     global a_logger, logging_mutex
     @functools.wraps(fn)
     def __wrapper(*args, **kw):
+        if isinstance(a_logger, AsyncLogger):
+            a_logger.log("{0}.{1} started {2}", (fn.__module__, fn.__name__, list(map(str, args))))
+            temp = fn(*args, **kw)
+            a_logger.log("{0}.{1} ended", (fn.__module__, fn.__name__))
+            return temp
         if a_logger:
             logging_mutex.lock()
             if fn.__module__ == "__main__":
@@ -54,6 +175,19 @@ def debug(fn):
         return temp
     return __wrapper
 
+def formatText(a_string, args):
+    """
+    Returns a_string.format(*args). If this fails the unformatted
+    string and the args are returned instead, as logging should
+    never raise.
+    """
+    if (len(args) == 0):
+        return a_string
+    try:
+        return a_string.format(*args)
+    except Exception:
+        return a_string + " " + str(args)
+
 def getDebug():
     """
     Return True/False if debugging information desired.
@@ -64,13 +198,30 @@ def getDebug():
     else:
         return False
 
-def logText(a_string, to_console = False):
+def logText(a_string, *args, to_console = False):
     """
+    If there are args then a_string is a format string, i.e. the text
+    is a_string.format(*args). In asynchronous mode this formatting is
+    done in the logging thread, so callers on a hot path should use
+    this instead of formatting the string themselves.
+
+    A single boolean argument is treated as to_console, for callers
+    that use the old logText(a_string, to_console) form.
+
     Note: Calling this with to_console = True from a thread that is not
           the main thread seemed to occasionally lock the computer.
     """
     global a_logger, logging_mutex
-    if a_logger:
+    if (len(args) == 1) and isinstance(args[0], bool):
+        to_console = args[0]
+        args = ()
+
+    if isinstance(a_logger, AsyncLogger):
+        a_logger.log(a_string, args)
+        if to_console:
+            print(formatText(a_string, args))
+    elif a_logger:
+        a_string = formatText(a_string, args)
         logging_mutex.lock()
         a_logger.info("message:")
         a_logger.info("  " + a_string)
@@ -78,14 +229,17 @@ def logText(a_string, to_console = False):
             print(a_string)
         logging_mutex.unlock()
     else:
-        print(a_string)
+        print(formatText(a_string, args))
 
-def startLogging(directory, program_name):
+def startLogging(directory, program_name, asynchronous = False):
     """
     This should only be called once in "main". It uses QSettings() to generate
     a new index (1-10) each time that it is called so that (hopefully) we can
     log from multiple programs with the same name.
 
+    If asynchronous is True the log is written by an AsyncLogger to a
+    (program_name)_(index).jsonl file.
+
     FIXME? As this seems to just append to existing log files, it would probably
            be better to delete the existing files first.
     """
@@ -99,6 +253,18 @@ def startLogging(directory, program_name):
         new_index = 1
     settings.setValue("current index", new_index)
 
+    if asynchronous:
+        log_filename = directory + program_name + "_" + str(index) + ".jsonl"
+        try:
+            a_logger = AsyncLogger(filename = log_filename)
+        except IOError:
+            print("Logging Error! Could not open", log_filename)
+            print("  Logging is disabled.")
+            a_logger = False
+        else:
+            atexit.register(stopLogging)
+        return
+
     # Initialize logger.
     a_logger = logging.getLogger(program_name)
     a_logger.setLevel(logging.DEBUG)
@@ -120,6 +286,16 @@ def startLogging(directory, program_name):
     if a_logger:
         rf_handler.setFormatter(rt_formatter)
         a_logger.addHandler(rf_handler)
+
+def stopLogging():
+    """
+    Stop asynchronous logging, this writes all the records that are still
+    in the queue. This is called automatically when Python exits.
+    """
+    global a_logger
+    if isinstance(a_logger, AsyncLogger):
+        a_logger.stop()
+        a_logger = False
         
 
 #
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+This reads a log file series (i.e. log, log.1, log.2, etc..) into
+a SQLite database, which can then be queried for the timing of HAL
+messages, or exported as a Chrome trace / Perfetto JSON timeline
+(open this with chrome://tracing or https://ui.perfetto.dev).
+
+It reads both the text log files (.out) and the JSON lines log files
+(.jsonl) that hdebug writes in asynchronous mode. Each file is only
+read once. This replaces parse_log.py, function calls that were
+logged using the hdebug.debug decorator are in the 'calls' table
+and the timeline.
+
+$ python log_analysis.py logs/hal4000_5
+$ python log_analysis.py logs/hal4000_5 --trace hal4000_5.json --database hal4000_5.db
+
+The tables are:
+  events - All the message events (queued, sent, handled by, processed,
+           worker started, worker done, worker failed).
+  messages - One row per message with the time it was queued, sent and
+             processed.
+  calls - Function calls logged by the hdebug.debug decorator.
+
+All times are in seconds relative to the first record in the log.
+"""
+import json
+import numpy
+import os
+import sqlite3
+import time
+
+
+message_events = ["queued", "sent", "handled by", "processed",
+                  "worker started", "worker done", "worker failed"]
+
+
+def findLogFiles(basename):
+    """
+    Returns the log files in the series in time order, oldest first.
+    """
+    for extension in [".jsonl", ".out"]:
+        fnames = []
+        for ext in [".5", ".4", ".3", ".2", ".1", ""]:
+            fname = basename + extension + ext
+            if os.path.exists(fname):
+                fnames.append(fname)
+        if (len(fnames) > 0):
+            return fnames
+    return []
+
+
+def parseJSONLines(fp):
+    """
+    Yields [time, thread, text] for each record in a JSON lines log file.
+    """
+    for line in fp:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "text" in record:
+            yield [record["time"], record.get("thread"), record["text"]]
+
+
+def parseText(fp):
+    """
+    Yields [time, thread, text] for each line of a text log file.
+
+    Converting the time with datetime.strptime() is slow so we only
+    do this once for every second in the log file.
+    """
+    seconds = {}
+    for line in fp:
+        try:
+            [prefix, text] = line.split(":INFO:", 1)
+        except ValueError:
+            continue
+        text = text.strip()
+        if (text == "message:"):
+            continue
+
+        # prefix is 'YYYY-MM-DD HH:MM:SS,mmm:program_name'
+        key = prefix[:19]
+        if not key in seconds:
+            try:
+                seconds[key] = time.mktime(time.strptime(key, "%Y-%m-%d %H:%M:%S"))
+            except ValueError:
+                continue
+        yield [seconds[key] + 0.001 * int(prefix[20:23]), None, text]
+
+
+class LogAnalysis(object):
+    """
+    The log files in a SQLite database.
+    """
+    def __init__(self, basename = None, database = ":memory:", **kwds):
+        """
+        basename is the log file name without the extension, for example
+        'logs/hal4000_5'. The database is in memory unless you specify a
+        file name.
+        """
+        super().__init__(**kwds)
+        self.zero_time = None
+
+        if (database != ":memory:") and os.path.exists(database):
+            os.remove(database)
+        self.db = sqlite3.connect(database)
+        self.db.execute("CREATE TABLE events (time REAL, thread INTEGER, event TEXT, m_id INTEGER, module TEXT, m_type TEXT, job_ms INTEGER)")
+        self.db.execute("CREATE TABLE calls (time REAL, thread INTEGER, name TEXT, started INTEGER)")
+
+        fnames = findLogFiles(basename)
+        if (len(fnames) == 0):
+            raise IOError("No log files found for '" + basename + "'.")
+
+        for fname in fnames:
+            with open(fname) as fp:
+                if fname.endswith(".jsonl") or (".jsonl." in fname):
+                    self.addRecords(parseJSONLines(fp))
+                else:
+                    self.addRecords(parseText(fp))
+
+        self.db.execute("CREATE INDEX events_m_id ON events (m_id)")
+        self.db.execute("CREATE INDEX events_m_type ON events (m_type)")
+        self.db.execute("CREATE INDEX events_module ON events (module)")
+
+        # One row per message. The source is the module of the 'queued' event.
+        self.db.execute("""CREATE TABLE messages AS SELECT m_id,
+                                  MAX(CASE WHEN event = 'queued' THEN module END) AS source,
+                                  MAX(m_type) AS m_type,
+                                  MIN(CASE WHEN event = 'queued' THEN time END) AS queued,
+                                  MIN(CASE WHEN event = 'sent' THEN time END) AS sent,
+                                  MAX(CASE WHEN event = 'processed' THEN time END) AS processed
+                           FROM events GROUP BY m_id""")
+        self.db.execute("CREATE UNIQUE INDEX messages_m_id ON messages (m_id)")
+        self.db.execute("CREATE INDEX messages_m_type ON messages (m_type)")
+        self.db.commit()
+
+    def addRecords(self, records):
+        events = []
+        calls = []
+        for [r_time, r_thread, text] in records:
+            if self.zero_time is None:
+                self.zero_time = r_time
+            r_time -= self.zero_time
+
+            # Message events, i.e. 'queued,12,hal,start film'. For 'handled by'
+            # the module is the module that handled the message, for worker events
+            # the module is the module with the worker, otherwise it is the source.
+            fields = text.split(",")
+            if (len(fields) >= 4) and (fields[0] in message_events):
+                try:
+                    m_id = int(fields[1])
+                except ValueError:
+                    continue
+                module = fields[2]
+                job_ms = None
+                if fields[0].startswith("worker"):
+                    module = fields[4] if (len(fields) > 4) else None
+                    if (len(fields) > 5):
+                        job_ms = int(fields[5])
+                events.append((r_time, r_thread, fields[0], m_id, module, fields[3], job_ms))
+
+            # Function calls from the hdebug.debug decorator, i.e. 'module.function started'.
+            elif (" started" in text) or text.endswith(" ended"):
+                started = (" started" in text)
+                name = text.split(" started")[0] if started else text[:-6]
+                if ("." in name) and not (" " in name) and not ("," in name):
+                    calls.append((r_time, r_thread, name, 1 if started else 0))
+
+        self.db.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", events)
+        self.db.executemany("INSERT INTO calls VALUES (?, ?, ?, ?)", calls)
+
+    def chromeTrace(self, filename):
+        """
+        Save the messages, workers and function calls as a Chrome trace.
+        """
+        pid = 1
+        trace = []
+        threads = {}
+
+        def tid(name):
+            if not name in threads:
+                threads[name] = len(threads) + 1
+                trace.append({"name" : "thread_name", "ph" : "M", "pid" : pid, "tid" : threads[name],
+                              "args" : {"name" : name}})
+            return threads[name]
+
+        def us(seconds):
+            return 1.0e6 * seconds
+
+        # Messages, as async events from when they are queued to when they are processed.
+        for [m_id, source, m_type, queued, sent, processed] in self.db.execute("SELECT * FROM messages WHERE queued IS NOT NULL"):
+            common = {"cat" : "message", "id" : m_id, "pid" : pid, "tid" : tid("messages")}
+            end = processed if processed is not None else sent
+            if end is None:
+                continue
+            trace.append(dict(common, name = m_type, ph = "b", ts = us(queued), args = {"m_id" : m_id, "source" : source}))
+            if sent is not None:
+                trace.append(dict(common, name = "queued", ph = "b", ts = us(queued)))
+                trace.append(dict(common, name = "queued", ph = "e", ts = us(sent)))
+            trace.append(dict(common, name = m_type, ph = "e", ts = us(end)))
+
+        # When each module handled a message.
+        for [r_time, m_id, module, m_type] in self.db.execute("SELECT time, m_id, module, m_type FROM events WHERE event = 'handled by'"):
+            trace.append({"name" : m_type, "cat" : "handled", "ph" : "i", "s" : "t", "ts" : us(r_time),
+                          "pid" : pid, "tid" : tid(str(module)), "args" : {"m_id" : m_id}})
+
+        # Workers.
+        for [module, m_type, m_id, start, stop] in self.getWorkers():
+            trace.append({"name" : m_type, "cat" : "worker", "ph" : "X", "ts" : us(start), "dur" : us(stop - start),
+                          "pid" : pid, "tid" : tid(str(module) + " worker"), "args" : {"m_id" : m_id}})
+
+        # Function calls.
+        for [r_time, r_thread, name, started] in self.db.execute("SELECT * FROM calls ORDER BY rowid"):
+            trace.append({"name" : name, "cat" : "call", "ph" : "B" if started else "E", "ts" : us(r_time),
+                          "pid" : pid, "tid" : tid("calls " + str(r_thread) if r_thread is not None else "calls")})
+
+        with open(filename, "w") as fp:
+            json.dump({"traceEvents" : trace, "displayTimeUnit" : "ms"}, fp)
+
+    def getModuleHandlingTimes(self):
+        """
+        Returns a dictionary keyed by [module, m_type] of the count, median,
+        90th percentile and maximum time in seconds from when the message
+        was sent to when the module finished handling it.
+        """
+        times = {}
+        query = """SELECT e.module, e.m_type, e.time - m.sent FROM events AS e
+                   JOIN messages AS m ON e.m_id = m.m_id
+                   WHERE e.event = 'handled by' AND m.sent IS NOT NULL"""
+        for [module, m_type, elapsed] in self.db.execute(query):
+            times.setdefault((module, m_type), []).append(elapsed)
+
+        stats = {}
+        for [key, elapsed] in times.items():
+            [p50, p90] = numpy.percentile(elapsed, [50, 90])
+            stats[key] = {"count" : len(elapsed),
+                          "p50" : p50,
+                          "p90" : p90,
+                          "max" : max(elapsed)}
+        return stats
+
+    def getSlowestMessages(self, n_messages = 10):
+        """
+        Returns a list of [m_id, source, m_type, queued time, processing time]
+        for the messages that took the longest from queued to processed.
+        """
+        query = """SELECT m_id, source, m_type, sent - queued, processed - sent FROM messages
+                   WHERE processed IS NOT NULL AND sent IS NOT NULL AND queued IS NOT NULL
+                   ORDER BY processed - queued DESC LIMIT ?"""
+        return list(map(list, self.db.execute(query, (n_messages,))))
+
+    def getWorkerOverlap(self):
+        """
+        Returns [total time that workers were running, time that more than one
+        worker was running, the maximum number of workers running at once].
+        """
+        changes = []
+        for [module, m_type, m_id, start, stop] in self.getWorkers():
+            changes.append([start, 1])
+            changes.append([stop, -1])
+        changes.sort()
+
+        n_running = 0
+        max_running = 0
+        busy = 0.0
+        overlap = 0.0
+        last_time = 0.0
+        for [r_time, change] in changes:
+            if (n_running > 0):
+                busy += r_time - last_time
+            if (n_running > 1):
+                overlap += r_time - last_time
+            n_running += change
+            max_running = max(max_running, n_running)
+            last_time = r_time
+        return [busy, overlap, max_running]
+
+    def getWorkers(self):
+        """
+        Returns a list of [module, m_type, m_id, start time, stop time] for
+        each of the workers.
+        """
+        query = """SELECT s.module, s.m_type, s.m_id, s.time, MIN(d.time) FROM events AS s
+                   JOIN events AS d ON s.m_id = d.m_id AND s.module = d.module
+                   WHERE s.event = 'worker started' AND d.event IN ('worker done', 'worker failed') AND d.time >= s.time
+                   GROUP BY s.rowid ORDER BY s.time"""
+        return list(map(list, self.db.execute(query)))
+
+    def query(self, sql, parameters = ()):
+        """
+        For everything else.
+        """
+        return list(map(list, self.db.execute(sql, parameters)))
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'HAL log file analysis.')
+    parser.add_argument('basename', type=str,
+                        help = "The log file name without the extension, i.e. logs/hal4000_5")
+    parser.add_argument('--database', dest='database', type=str, required=False, default=":memory:",
+                        help = "Save the SQLite database in this file.")
+    parser.add_argument('--trace', dest='trace', type=str, required=False, default=None,
+                        help = "Save a Chrome trace / Perfetto JSON timeline in this file.")
+    parser.add_argument('--slowest', dest='slowest', type=int, required=False, default=10,
+                        help = "The number of slowest messages to print.")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    analysis = LogAnalysis(basename = args.basename, database = args.database)
+    [n_events] = analysis.query("SELECT COUNT(*) FROM events")[0]
+    print("Read {0:d} events in {1:.2f} seconds.".format(n_events, time.perf_counter() - start_time))
+
+    print()
+    print("Slowest messages (ms):")
+    print("  {0:>8s} {1:20s} {2:30s} {3:>8s} {4:>8s}".format("id", "source", "type", "queued", "process"))
+    for [m_id, source, m_type, queued, processing] in analysis.getSlowestMessages(args.slowest):
+        print("  {0:8d} {1:20s} {2:30s} {3:8.2f} {4:8.2f}".format(m_id, str(source), m_type, 1000.0 * queued, 1000.0 * processing))
+
+    print()
+    print("Module handling times (ms), from when the message was sent:")
+    print("  {0:20s} {1:30s} {2:>8s} {3:>8s} {4:>8s} {5:>8s}".format("module", "type", "count", "p50", "p90", "max"))
+    for [[module, m_type], stats] in sorted(analysis.getModuleHandlingTimes().items(), key = lambda x: -x[1]["p90"]):
+        print("  {0:20s} {1:30s} {2:8d} {3:8.2f} {4:8.2f} {5:8.2f}".format(str(module), m_type, stats["count"],
+                                                                          1000.0 * stats["p50"],
+                                                                          1000.0 * stats["p90"],
+                                                                          1000.0 * stats["max"]))
+
+    [busy, overlap, max_running] = analysis.getWorkerOverlap()
+    print()
+    print("Workers were running for {0:.3f} seconds, more than one for {1:.3f} seconds (at most {2:d}).".format(busy, overlap, max_running))
+
+    if args.trace is not None:
+        analysis.chromeTrace(args.trace)
+        print()
+        print("Saved trace in", args.trace)
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
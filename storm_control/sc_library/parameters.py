@@ -3,18 +3,32 @@
 Handles parsing settings xml files and getting/setting 
 the resulting settings.
 
+StormXMLObject.copy() is copy on write. The copy shares the original
+until one of them is changed, and then only the sections that are
+used are copied. Every Parameter and StormXMLObject also has a version
+number, this changes whenever it (or anything in it) changes and
+copies keep the version number of the original. difference() uses
+these to skip the sections that are the same.
+
 Hazen 06/15
 """
 
 import copy
+import itertools
 import os
 import traceback
+import weakref
 import xml
 
 from xml.dom import minidom
 from xml.etree import ElementTree
 
 
+# Source of version numbers. A new number is used for every change,
+# so if two objects have the same version then they are the same.
+versions = itertools.count(1)
+
+
 #
 # Functions.
 #
@@ -137,19 +151,26 @@ def difference(params1, params2):
     differences = []
     
     def diffRecurse(root, p1, p2):
-        for attr in p1.getAttrs():
-            prop = p1.get(attr)
+        # Copies that have not been changed are the same.
+        if (p1.getVersion() == p2.getVersion()):
+            return
 
-            if isinstance(prop, StormXMLObject):
-                if p2.has(attr):
-                    diffRecurse(root + attr + ".", prop, p2.get(attr))
+        p2_nodes = p2.getNodes()
+        for [attr, node] in p1.getNodes().items():
+            if not attr in p2_nodes:
+                differences.append(root + attr)
+                continue
+
+            node2 = p2_nodes[attr]
+            if isinstance(node, StormXMLObject):
+                if isinstance(node2, StormXMLObject):
+                    diffRecurse(root + attr + ".", node, node2)
                 else:
                     differences.append(root + attr)
-            else:
-                if not p2.has(attr):
-                    differences.append(root + attr)
-                elif (prop != p2.get(attr)):
-                    differences.append(root + attr)
+            elif isinstance(node2, StormXMLObject):
+                differences.append(root + attr)
+            elif (node.getVersion() != node2.getVersion()) and (node.getv() != node2.getv()):
+                differences.append(root + attr)
 
     diffRecurse("", params1, params2)
     return differences
@@ -222,7 +243,15 @@ class ParametersExceptionGet(ParametersException):
 class Parameter(object):
     """
     Base Parameter object.
+
+    Parameter values are treated as immutable, use setv() to change
+    them. This is what makes StormXMLObject.copy() work.
     """
+    # The StormXMLObjects that contain this parameter. This is a class
+    # attribute so that sub-classes can call the set methods before
+    # calling __init__().
+    _parents_ = ()
+
     def __init__(self,
                  description = "",
                  name = "",
@@ -243,9 +272,32 @@ class Parameter(object):
         self.value = None
         
         self.setv(value)
+        self._parents_ = []
+        self._version_ = next(versions)
+
+    def aboutToChange(self):
+        """
+        This is called before anything changes.
+        """
+        for parent in self._parents_:
+            parent.aboutToChange()
+        self._version_ = next(versions)
 
     def copy(self):
-        return copy.deepcopy(self)
+        """
+        Values are only changed with setv() so this does not need to be
+        a deep copy, but lists are copied in case they are changed in place.
+        """
+        new = copy.copy(self)
+        new._parents_ = []
+        if isinstance(self.value, list):
+            new.value = list(self.value)
+        return new
+
+    def __deepcopy__(self, memo):
+        new = self.copy()
+        new.value = copy.deepcopy(self.value, memo)
+        return new
     
     def getDescription(self):
         return self.description
@@ -262,6 +314,9 @@ class Parameter(object):
     def getv(self):
         return self.value
 
+    def getVersion(self):
+        return self._version_
+
     def isMutable(self):
         return self.is_mutable
     
@@ -272,13 +327,29 @@ class Parameter(object):
         return False
 
     def setMutable(self, value):
+        self.aboutToChange()
         self.is_mutable = bool(value)
 
     def setOrder(self, new_order):
+        self.aboutToChange()
         self.order = new_order
         
     def setv(self, new_value):
-        self.value = self.toType(new_value)
+        self.setValue(self.toType(new_value))
+
+    def setValue(self, new_value):
+        """
+        Set the value (which has already been converted and checked), this
+        does nothing if the value is the same as the current value.
+        """
+        if (type(new_value) is type(self.value)):
+            try:
+                if (new_value == self.value):
+                    return
+            except ValueError:
+                pass
+        self.aboutToChange()
+        self.value = new_value
 
     def toString(self):
         return str(self.value)
@@ -304,6 +375,14 @@ class ParameterCustom(Parameter):
 
         self.ptype = "custom"
 
+    def copy(self):
+        """
+        Custom values can be anything, so these are copied.
+        """
+        new = super().copy()
+        new.value = copy.deepcopy(self.value)
+        return new
+
         
 class ParameterFloat(Parameter):
     """
@@ -348,19 +427,21 @@ class ParameterRange(Parameter):
         return True
 
     def setMaximum(self, new_maximum):
+        self.aboutToChange()
         self.max_value = self.toType(new_maximum)
 
     def setMinimum(self, new_minimum):
+        self.aboutToChange()
         self.min_value = self.toType(new_minimum)
 
     def setv(self, new_value):
         new_value = self.toType(new_value)
         if (new_value < self.min_value):
-            self.value = self.min_value
+            self.setValue(self.min_value)
         elif (new_value > self.max_value):
-            self.value = self.max_value
+            self.setValue(self.max_value)
         else:
-            self.value = new_value
+            self.setValue(new_value)
 
             
 class ParameterRangeFloat(ParameterRange):
@@ -407,13 +488,19 @@ class ParameterSet(Parameter):
     def isSet(self):
         return True
 
+    def copy(self):
+        new = super().copy()
+        new.allowed = list(self.allowed)
+        return new
+
     def setAllowed(self, allowed):
+        self.aboutToChange()
         self.allowed = allowed
         
     def setv(self, new_value):
         new_value = self.toType(new_value)
         if new_value in self.allowed:
-            self.value = new_value
+            self.setValue(new_value)
         else:
             msg = "'" + str(new_value) + "' is not in the list of allowed values for "
             msg += self.name + ", " + str(self.allowed)
@@ -527,12 +614,21 @@ class StormXMLObject(object):
     A collection of Parameters objects that are (usually) created 
     dynamically by parsing an XML file. All parameter names must 
     be unique for each section.
+
+    A copy starts out with a reference to the original (_source_)
+    and only makes its own copy of the original's parameters the
+    first time that they are accessed, or when the original is
+    about to change.
     """
     def __init__(self, nodes = None, recurse = False, validate = True, **kwds):
         super().__init__(**kwds)
 
+        self._copies_ = None
+        self._nodes_ = {}
+        self._parents_ = []
+        self._source_ = None
         self._validate_ = validate
-        self.parameters = {}
+        self._version_ = next(versions)
 
         if nodes is None:
             return
@@ -632,7 +728,7 @@ class StormXMLObject(object):
 
             # This handles sub-nodes.
             elif recurse and (len(node) > 0):
-                self.parameters[node.tag] = StormXMLObject(node, True)
+                self.setNode(node.tag, StormXMLObject(node, True))
 
             # If we were able to make a parameter object add it to the record.
             if param is not None:
@@ -672,9 +768,9 @@ class StormXMLObject(object):
             raise ParametersException("Parameter " + pname + " already exists.")
         else:
             if isinstance(pvalue, Parameter):
-                self.parameters[pname] = pvalue
+                self.setNode(pname, pvalue)
             else:
-                self.parameters[pname] = ParameterSimple(pname, pvalue)
+                self.setNode(pname, ParameterSimple(pname, pvalue))
 
     def addSubSection(self, sname, svalue = None, overwrite = False):
         """
@@ -689,7 +785,7 @@ class StormXMLObject(object):
         snames = sname.split(".")
         if (len(snames) > 1):
             if not snames[0] in self.parameters:
-                cur_section = self.parameters[snames[0]] = StormXMLObject()
+                cur_section = self.setNode(snames[0], StormXMLObject())
             else:
                 cur_section = self.parameters[snames[0]]
             return cur_section.addSubSection(".".join(snames[1:]),
@@ -698,21 +794,62 @@ class StormXMLObject(object):
         else:
             if not sname in self.parameters:
                 if isinstance(svalue, StormXMLObject):
-                    self.parameters[sname] = svalue
+                    self.setNode(sname, svalue)
                 else:
-                    self.parameters[sname] = StormXMLObject()
+                    self.setNode(sname, StormXMLObject())
             else:
                 if not overwrite:
                     raise ParametersException("Section " + sname + " already exists")
                 if isinstance(svalue, StormXMLObject):
-                    self.parameters[sname] = svalue
+                    self.setNode(sname, svalue)
                 else:
                     raise ParametersException("Object is a " + type(svalue) + " not a StormXMLObject")
 
             return self.parameters[sname]
 
+    def aboutToChange(self):
+        """
+        This is called before anything in this object changes. Copies
+        that still refer to this object make their own copy first.
+        """
+        for parent in self._parents_:
+            parent.aboutToChange()
+        if self._copies_:
+            for a_copy in list(self._copies_):
+                a_copy.copySource()
+        self._version_ = next(versions)
+
     def copy(self):
-        return copy.deepcopy(self)
+        """
+        Returns a (copy on write) copy of this object.
+        """
+        source = self
+        if self._source_ is not None:
+            source = self._source_
+        if source._copies_ is None:
+            source._copies_ = weakref.WeakSet()
+
+        new = StormXMLObject(validate = self._validate_)
+        new._source_ = source
+        new._version_ = self._version_
+        source._copies_.add(new)
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def copySource(self):
+        """
+        Make our own copy of the parameters of the object that we were
+        copied from. Sub-sections are also copied on write.
+        """
+        source = self._source_
+        self._source_ = None
+        source._copies_.discard(self)
+        for [name, node] in source._nodes_.items():
+            node = node.copy()
+            node._parents_.append(self)
+            self._nodes_[name] = node
 
     def delete(self, name):
         """
@@ -723,7 +860,8 @@ class StormXMLObject(object):
             if (len(names) > 1):
                 self.get(".".join(names[:-1])).delete(names[-1])
             else:
-                del self.parameters[name]
+                self.aboutToChange()
+                self.unlink(self.parameters.pop(name))
 
     def get(self, pname, default = None):
         """
@@ -747,13 +885,25 @@ class StormXMLObject(object):
         """
         Return a list of the property names.
         """
-        return self.parameters.keys()
+        return self.getNodes().keys()
+
+    def getNodes(self):
+        """
+        Read only access to the dictionary of Parameters and sub-sections,
+        unlike self.parameters this does not make a copy of the source.
+        """
+        if self._source_ is not None:
+            return self._source_._nodes_
+        return self._nodes_
 
     def getOrder(self):
         """
         A convience so that we can sort these along with Parameter objects.
         """
         return 0
+
+    def getVersion(self):
+        return self._version_
         
     def getp(self, pname):
         """
@@ -781,8 +931,8 @@ class StormXMLObject(object):
         """
         Return attributes sorted by order, then by name.
         """
-        attrs = self.parameters.keys()
-        return sorted(attrs, key = lambda x: (self.parameters[x].getOrder(), x))
+        nodes = self.getNodes()
+        return sorted(nodes, key = lambda x: (nodes[x].getOrder(), x))
 
     def has(self, pname):
         """
@@ -794,6 +944,17 @@ class StormXMLObject(object):
             return False
         return True
 
+    @property
+    def parameters(self):
+        """
+        The dictionary of Parameters and sub-sections.
+
+        Don't change this directly, use setNode() or delete().
+        """
+        if self._source_ is not None:
+            self.copySource()
+        return self._nodes_
+
     def saveToFile(self, filename, all_params = False):
         """
         Save the Parameters as XML in a file.
@@ -847,6 +1008,17 @@ class StormXMLObject(object):
 
         self.getp(pname).setv(value)
 
+    def setNode(self, name, node):
+        """
+        Add (or replace) a Parameter or a sub-section, returns node.
+        """
+        self.aboutToChange()
+        if name in self.parameters:
+            self.unlink(self.parameters[name])
+        node._parents_.append(self)
+        self.parameters[name] = node
+        return node
+
     def toString(self, all_params = False):
         """
         Return an XML string representation of this object.
@@ -867,8 +1039,9 @@ class StormXMLObject(object):
         """
         if xml is None:
             xml = ElementTree.Element(name)
-        for key in sorted(self.parameters):
-            value = self.parameters[key]
+        nodes = self.getNodes()
+        for key in sorted(nodes):
+            value = nodes[key]
             if isinstance(value, StormXMLObject):
                 child = ElementTree.SubElement(xml, key)
                 child.set("validate", str(value._validate_))
@@ -879,6 +1052,13 @@ class StormXMLObject(object):
                 value.toXML(xml, override_is_saved = override_is_saved)
         return xml
 
+    def unlink(self, node):
+        """
+        Remove ourselves from the parents of node.
+        """
+        if self in node._parents_:
+            node._parents_.remove(self)
+
 
 #
 # Testing
@@ -9,11 +9,20 @@ Hazen 10/18
 """
 
 import hashlib
+import json
 import numpy
 import os
 import re
 import tifffile
 
+# This is only needed for reading .zarr movies.
+numcodecs = None
+try:
+    import numcodecs
+    import numcodecs.compat
+except ModuleNotFoundError:
+    pass
+
 import storm_control.sc_library.parameters as parameters
 
 
@@ -27,9 +36,11 @@ def inferReader(movie_filename, verbose = False):
         return DaxReader(movie_filename, verbose = verbose)
     elif (ext == ".tif") or (ext == ".tiff"):
         return TifReader(movie_filename, verbose = verbose)
+    elif (ext == ".zarr"):
+        return ZarrReader(movie_filename, verbose = verbose)
     else:
         print(ext, "is not a recognized file type")
-        raise IOError("only .dax and .tif are supported (case sensitive..)")
+        raise IOError("only .dax, .tif and .zarr are supported (case sensitive..)")
 
 
 def infToStormXML(inf_filename):
@@ -332,6 +343,89 @@ class TifReader(Reader):
                 
         return image_data
 
+
+class ZarrReader(Reader):
+    """
+    Zarr (version 2 directory format) reader class, for movies saved
+    by HAL's imagewriters.ZarrFile.
+
+    Only the chunk containing the requested frame is read and
+    decompressed. Other zarr arrays can also be read as long as
+    they are 3D and each chunk contains whole frames.
+    """
+    def __init__(self, filename, verbose = False):
+        super(ZarrReader, self).__init__(filename, verbose = verbose)
+
+        if numcodecs is None:
+            raise IOError("Reading .zarr movies requires the numcodecs package.")
+
+        with open(os.path.join(filename, ".zarray")) as fp:
+            zarray = json.load(fp)
+
+        if (zarray.get("zarr_format") != 2):
+            raise IOError("Only version 2 .zarr movies are supported.")
+        if (len(zarray["shape"]) != 3):
+            raise IOError("Only 3D .zarr movies are supported.")
+        if (zarray["chunks"][1:] != zarray["shape"][1:]):
+            raise IOError("Only .zarr movies whose chunks contain whole frames are supported.")
+
+        [self.number_frames, self.image_height, self.image_width] = zarray["shape"]
+        self.chunk_frames = zarray["chunks"][0]
+        self.dtype = numpy.dtype(zarray["dtype"])
+        self.order = zarray.get("order", "C")
+        self.separator = zarray.get("dimension_separator", ".")
+
+        self.codec = None
+        if zarray["compressor"] is not None:
+            self.codec = numcodecs.get_codec(zarray["compressor"])
+
+        # The filters are applied in this order when the chunk is
+        # written, so they are undone in the opposite order.
+        self.filters = []
+        if zarray.get("filters") is not None:
+            self.filters = list(map(numcodecs.get_codec, zarray["filters"]))
+            self.filters.reverse()
+
+        self.fill_value = zarray["fill_value"]
+        if self.fill_value is None:
+            self.fill_value = 0
+
+        self.chunk_data = None
+        self.chunk_index = -1
+
+    def getAttributes(self):
+        """
+        Returns the movie attributes (parameters, illumination powers, etc.)
+        as a dictionary.
+        """
+        attrs_filename = os.path.join(self.filename, ".zattrs")
+        if not os.path.exists(attrs_filename):
+            return {}
+        with open(attrs_filename) as fp:
+            return json.load(fp)
+
+    def loadAFrame(self, frame_number):
+        super(ZarrReader, self).loadAFrame(frame_number)
+
+        chunk_index = int(frame_number/self.chunk_frames)
+        if (chunk_index != self.chunk_index):
+            shape = (self.chunk_frames, self.image_height, self.image_width)
+            chunk_filename = os.path.join(self.filename, self.separator.join([str(chunk_index), "0", "0"]))
+            if os.path.exists(chunk_filename):
+                with open(chunk_filename, "rb") as fp:
+                    data = fp.read()
+                if self.codec is not None:
+                    data = self.codec.decode(data)
+                for a_filter in self.filters:
+                    data = a_filter.decode(data)
+                data = numcodecs.compat.ensure_ndarray(data).view(self.dtype)
+                self.chunk_data = data.reshape(shape, order = self.order)
+            else:
+                self.chunk_data = numpy.full(shape, self.fill_value, dtype = self.dtype)
+            self.chunk_index = chunk_index
+
+        return numpy.copy(self.chunk_data[frame_number % self.chunk_frames,:,:])
+
     
 #
 # The MIT License
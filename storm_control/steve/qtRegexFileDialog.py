@@ -4,6 +4,7 @@ File dialog that allows for regex filtering.
 
 Hazen 10/18
 """
+import os
 import re
 import sys
 
@@ -12,31 +13,56 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import storm_control.steve.qtdesigner.qt_regex_file_dialog_ui as qtRegexFileDialogUi
 
 
-def regexGetFileNames(caption = "Select File(s)", directory = None, extensions = None, regex = ""):
+def regexGetFileNames(caption = "Select File(s)", directory = None, dir_extensions = None, extensions = None, regex = ""):
     fdialog = QRegexFileDialog(caption = caption,
                                directory = directory,
+                               dir_extensions = dir_extensions,
                                extensions = extensions,
                                regex = regex)
     fdialog.exec_()
     return fdialog.getSelectedFiles()
 
 
+class DirFileDialog(QtWidgets.QFileDialog):
+    """
+    A file dialog that also lets the user select directories whose
+    names end with one of dir_extensions, such as .zarr movies.
+    """
+    def __init__(self, dir_extensions = None, **kwds):
+        super().__init__(**kwds)
+        self.dir_extensions = tuple(dir_extensions) if dir_extensions is not None else ()
+
+    def accept(self):
+        files = self.selectedFiles()
+        dirs = list(filter(os.path.isdir, files))
+        if (len(dirs) > 0) and all(map(self.isFileDir, dirs)):
+            self.filesSelected.emit(files)
+            QtWidgets.QDialog.accept(self)
+        else:
+            super().accept()
+
+    def isFileDir(self, dirname):
+        return (len(self.dir_extensions) > 0) and dirname.endswith(self.dir_extensions)
+
+
 class RegexFilterModel(QtCore.QSortFilterProxyModel):
-    def __init__(self, regex_string = None, **kwds):
+    def __init__(self, regex_string = None, dir_extensions = None, **kwds):
         super().__init__(**kwds)
 
+        self.dir_extensions = tuple(dir_extensions) if dir_extensions is not None else ()
         self.regex = re.compile(regex_string)
 
     def filterAcceptsRow(self, source_row, source_parent):
         source_model = self.sourceModel()
         index0 = source_model.index(source_row, 0, source_parent)
+        filename = source_model.fileName(index0)
 
-        # Alway show directories
+        # Alway show directories, except those that we treat as files.
         if source_model.isDir(index0):
-            return True
+            if (len(self.dir_extensions) == 0) or not filename.endswith(self.dir_extensions):
+                return True
 
         # Filter files.
-        filename = source_model.fileName(index0)
         if self.regex.match(filename) is not None:
             return True
         else:
@@ -45,9 +71,10 @@ class RegexFilterModel(QtCore.QSortFilterProxyModel):
 
 class QRegexFileDialog(QtWidgets.QDialog):
 
-    def __init__(self, caption = "Select File(s)", directory = None, extensions = None, regex = "", **kwds):
+    def __init__(self, caption = "Select File(s)", directory = None, dir_extensions = None, extensions = None, regex = "", **kwds):
         super().__init__(**kwds)
 
+        self.dir_extensions = dir_extensions
         self.files_selected = None
         self.regex_str = regex
 
@@ -57,7 +84,7 @@ class QRegexFileDialog(QtWidgets.QDialog):
         self.setWindowTitle(caption)
 
         # Insert standard file dialog.
-        self.fdialog = QtWidgets.QFileDialog()
+        self.fdialog = DirFileDialog(dir_extensions = dir_extensions)
         self.fdialog.setOption(QtWidgets.QFileDialog.DontUseNativeDialog)
         if directory is not None:
             self.fdialog.setDirectory(directory)
@@ -67,7 +94,7 @@ class QRegexFileDialog(QtWidgets.QDialog):
         self.ui.verticalLayout.addWidget(self.fdialog)
 
         # Set filter
-        self.fdialog.setProxyModel(RegexFilterModel(regex))
+        self.fdialog.setProxyModel(RegexFilterModel(regex, dir_extensions))
         self.ui.nameLineEdit.setText(regex)
         
         # Connect file dialog signals.
@@ -96,12 +123,12 @@ class QRegexFileDialog(QtWidgets.QDialog):
     def handleRegexTimer(self):
         new_regex_str = str(self.ui.nameLineEdit.text())
         try:
-            self.fdialog.setProxyModel(RegexFilterModel(new_regex_str))
+            self.fdialog.setProxyModel(RegexFilterModel(new_regex_str, self.dir_extensions))
             self.ui.nameLineEdit.setStyleSheet("color: rgb(0, 0, 0);")
             self.regex_str = new_regex_str
         except:
             self.ui.nameLineEdit.setStyleSheet("color: rgb(255, 0, 0);")
-            self.fdialog.setProxyModel(RegexFilterModel("")) # Display all files
+            self.fdialog.setProxyModel(RegexFilterModel("", self.dir_extensions)) # Display all files
 
     def handleRejected(self):
         self.close()
@@ -195,8 +195,10 @@ class Window(QtWidgets.QMainWindow):
     @hdebug.debug
     def handleLoadMovies(self, boolean):
         # Open custom dialog to select files and frame number
+        # .zarr movies are directories.
         [filenames, frame_num, file_filter] = qtRegexFileDialog.regexGetFileNames(directory = self.parameters.get("directory"),
                                                                                   regex = self.regexp_str,
+                                                                                  dir_extensions = [".zarr"],
                                                                                   extensions = ["*.dax", "*.tif", "*.spe"])
         if (filenames is not None) and (len(filenames) > 0):
             print("Found " + str(len(filenames)) + " files matching " + str(file_filter) + " in " + os.path.dirname(filenames[0]))
@@ -228,8 +230,8 @@ class Window(QtWidgets.QMainWindow):
 
         file_type = os.path.splitext(filenames_list[0])[1]
 
-        # Check for .dax files.
-        if (file_type == '.dax') or (file_type == ".tif"):
+        # Check for movie files.
+        if file_type in ['.dax', '.tif', '.zarr']:
             self.image_capture.loadMovies(filenames_list, 0)
 
         # Check for mosaic files.
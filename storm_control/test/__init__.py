@@ -1,6 +1,42 @@
 #!/usr/bin/env python
 
+import numpy
 import os
+import sys
+
+from PyQt5 import QtWidgets
+
+import storm_control.hal4000.camera.frame as frame
+
+app = None
+
+def createApp():
+    """
+    Returns the QApplication, creating it if necessary. The threaded
+    HAL classes need an event loop, and the app has to exist for as
+    long as halModule.threadpool is in use.
+    """
+    global app
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+def createFrame(pool, frame_number, x_size, y_size, data = None):
+    """
+    Returns a camera1 frame that uses a buffer from pool, or a new array
+    if the pool is empty. data is copied into the frame, the default is
+    a ramp.
+    """
+    buf = pool.acquire()
+    if buf is None:
+        np_data = numpy.zeros(x_size * y_size, dtype = numpy.uint16)
+    else:
+        np_data = buf.getData()
+    if data is None:
+        data = numpy.arange(x_size * y_size) % 1000
+    np_data[:x_size * y_size] = data
+    return frame.Frame(np_data, frame_number, x_size, y_size, "camera1", pool_buffer = buf)
 
 def dataDirectory():
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+End-to-end acquisition throughput benchmark. Like benchmark_imagewriters.py
+this is not run as part of the tests, run it by hand on the computer that
+you want to measure.
+
+Each point in the matrix of frame sizes, frame rates, file formats and number
+of cameras starts (headless) HAL in a separate process using the
+none_classic_config.xml test configuration with the cameras replaced by
+synthetic cameras, then records one fixed length movie. The report is a
+JSON list with one entry per point:
+
+  fps - Sustained frame rate per camera (frames saved / film time).
+  MB/s - Sustained data rate for all the cameras (and feeds).
+  dropped - Frames that were dropped or not saved.
+  writer_lag_ms, writer_lag_max_ms - Camera to frame saved latency.
+  delivery_ms - Camera to newFrame signal latency.
+  message_latency_ms, message_latency_max_ms - HAL message queue latency
+      while filming.
+  peak_rss_mb - Peak memory use of the HAL process.
+
+$ python benchmark_acquisition.py --sizes 512 2048 --rates 100 200 --output report.json
+$ python benchmark_acquisition.py --formats .dax .big.tif --cameras 1 2 --queue-depth 64
+"""
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from xml.etree import ElementTree
+
+import storm_control.test as test
+
+
+def benchmarkDirectory():
+    directory = os.path.join(test.dataDirectory(), "benchmark")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return directory
+
+def parseWriterStatistics(xml_file):
+    """
+    Returns a dictionary of dictionaries, one for each writer, from the
+    'writer_*' entries in the movie's XML file.
+    """
+    stats = {}
+    for elt in ElementTree.parse(xml_file).getroot().iter():
+        if elt.tag.startswith("writer_") and (elt.text is not None):
+            stats[elt.tag[7:]] = {k : float(v) for [k, v] in [kv.split("=") for kv in elt.text.split(",")]}
+    return stats
+
+def runBenchmark(size = 512, rate = 100.0, filetype = ".dax", cameras = 1, feeds = 0,
+                 frames = 200, keep = False, timeout = 600, **kwds):
+    """
+    Run HAL to record one movie and return a dictionary of results.
+    """
+    directory = benchmarkDirectory()
+    name = "_".join(["bench", str(size), str(int(rate)), filetype.replace(".", ""), str(cameras)])
+
+    # Create the parameters file.
+    p_name = name + "_params"
+    p_file = os.path.join(directory, p_name + ".xml")
+    with open(p_file, "w") as fp:
+        fp.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<settings>\n')
+        for i in range(cameras):
+            fp.write("  <camera" + str(i+1) + ">\n")
+            fp.write('    <exposure_time type="float">' + str(1.0/rate) + '</exposure_time>\n')
+            for pname in ["x_end", "y_end"]:
+                fp.write('    <' + pname + ' type="int">' + str(size) + '</' + pname + '>\n')
+            fp.write("  </camera" + str(i+1) + ">\n")
+        fp.write('  <film>\n    <filetype type="string">' + filetype + '</filetype>\n  </film>\n')
+        if (feeds > 0):
+            fp.write('  <feeds is_new="True">\n')
+            for i in range(feeds):
+                fp.write('    <slice' + str(i+1) + '>\n')
+                fp.write('      <source type="string">camera1</source>\n')
+                fp.write('      <feed_type type="string">slice</feed_type>\n')
+                fp.write('      <saved type="boolean">True</saved>\n')
+                for [pname, value] in [["x_start", 1], ["x_end", size//2], ["y_start", 1], ["y_end", size//2]]:
+                    fp.write('      <' + pname + ' type="int">' + str(value) + '</' + pname + '>\n')
+                fp.write('    </slice' + str(i+1) + '>\n')
+            fp.write('  </feeds>\n')
+        fp.write('</settings>\n')
+
+    spec = {"basename" : name,
+            "cameras" : cameras,
+            "save_directory" : directory,
+            "film_length" : frames,
+            "parameters_file" : p_file,
+            "parameters_name" : p_name,
+            "results_file" : os.path.join(directory, name + "_results.json"),
+            "size" : size,
+            "writer" : kwds}
+
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                   stdout = subprocess.DEVNULL,
+                   timeout = timeout)
+    elapsed = time.perf_counter() - start_time
+
+    result = {"size" : size,
+              "rate" : rate,
+              "format" : filetype,
+              "cameras" : cameras,
+              "feeds" : feeds,
+              "frames" : frames,
+              "writer" : kwds,
+              "run_time" : elapsed}
+
+    xml_file = os.path.join(directory, name + ".xml")
+    if not os.path.exists(xml_file) or not os.path.exists(spec["results_file"]):
+        result["error"] = "HAL did not record the movie."
+        return result
+
+    with open(spec["results_file"]) as fp:
+        hal_results = json.load(fp)
+    writer_stats = parseWriterStatistics(xml_file)
+
+    film_time = hal_results["film_time"]
+    camera_names = ["camera" + str(i+1) for i in range(cameras)]
+    written = [writer_stats[cam_name]["written"] for cam_name in camera_names]
+    mb = 0.0
+    for [writer_name, ws] in writer_stats.items():
+        frame_mb = 2 * size * size * 0.000000953674
+        if not writer_name in camera_names:
+            frame_mb = frame_mb/4
+        mb += ws["written"] * frame_mb
+
+    result.update({"fps" : min(written)/film_time if (film_time > 0.0) else 0.0,
+                   "MB/s" : mb/film_time if (film_time > 0.0) else 0.0,
+                   "dropped" : int(sum([ws["dropped"] for ws in writer_stats.values()]) +
+                                   cameras * frames - sum(written)),
+                   "writer_lag_ms" : max([ws["write_ms"] for ws in writer_stats.values()]),
+                   "writer_lag_max_ms" : max([ws["write_max_ms"] for ws in writer_stats.values()]),
+                   "delivery_ms" : max([ws["delivery_ms"] for ws in writer_stats.values()]),
+                   "film_time" : film_time,
+                   "message_latency_ms" : hal_results["message_latency_ms"],
+                   "message_latency_max_ms" : hal_results["message_latency_max_ms"],
+                   "peak_rss_mb" : hal_results["peak_rss_mb"]})
+
+    # Remove the movie(s), they can be large.
+    if not keep:
+        for fname in os.listdir(directory):
+            if fname.startswith(name):
+                fpath = os.path.join(directory, fname)
+                if os.path.isdir(fpath):
+                    import shutil
+                    shutil.rmtree(fpath)
+                else:
+                    os.remove(fpath)
+
+    return result
+
+def runHal(spec):
+    """
+    This is what runs in the child process.
+    """
+    from PyQt5 import QtWidgets
+
+    import storm_control.hal4000.hal4000 as hal4000
+    import storm_control.sc_library.parameters as params
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    config = params.config(test.halXmlFilePathAndName("none_classic_config.xml"))
+
+    # Replace the none camera with synthetic camera(s).
+    camera1 = config.get("modules.camera1")
+    cam_params = camera1.get("camera.parameters")
+    camera1.set("camera.class_name", "SyntheticCameraControl")
+    camera1.set("camera.module_name", "storm_control.hal4000.camera.syntheticCameraControl")
+    cam_params.add("chip_size", spec["size"])
+    cam_params.add("bank_size", 8)
+    cam_params.add("frame_pool_size", 32)
+    for i in range(1, spec["cameras"]):
+        camera = config.addSubSection("modules.camera" + str(i+1), svalue = camera1.copy())
+        camera.set("camera.parameters.extension", "camera" + str(i+1))
+        camera.get("camera.parameters").add("seed", i)
+
+    # Image writer configuration.
+    film = config.get("modules.film")
+    for [key, value] in spec["writer"].items():
+        film.add("writer_" + key, value)
+
+    # Add the benchmark module.
+    c_test = config.addSubSection("modules.testing")
+    c_test.add("class_name", "AcquisitionBenchmark")
+    c_test.add("module_name", "storm_control.test.hal.benchmark_tests")
+    for key in ["basename", "save_directory", "film_length", "parameters_file", "parameters_name", "results_file"]:
+        c_test.add(key, spec[key])
+
+    hal = hal4000.HalCore(config = config,
+                          testing_mode = True,
+                          show_gui = False)
+    app.exec_()
+
+def printResult(result):
+    if "error" in result:
+        print("{size:5d} {rate:6.0f} {format:9s} {cameras:2d}  {error}".format(**result))
+    else:
+        print("{size:5d} {rate:6.0f} {format:9s} {cameras:2d} {fps:8.1f} {MB/s:8.1f} {dropped:6d} {writer_lag_ms:8.2f} {writer_lag_max_ms:8.2f} {message_latency_ms:8.2f} {peak_rss_mb:8.0f}".format(**result))
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'HAL acquisition throughput benchmark.')
+    parser.add_argument('--child', dest = 'child', type = str, required = False, default = None,
+                        help = argparse.SUPPRESS)
+    parser.add_argument('--sizes', dest = 'sizes', type = int, nargs = '+', required = False, default = [512, 2048],
+                        help = "Frame sizes in pixels (square frames).")
+    parser.add_argument('--rates', dest = 'rates', type = float, nargs = '+', required = False, default = [100.0],
+                        help = "Frame rates.")
+    parser.add_argument('--formats', dest = 'formats', type = str, nargs = '+', required = False, default = [".dax", ".big.tif"],
+                        help = "Movie file formats.")
+    parser.add_argument('--cameras', dest = 'cameras', type = int, nargs = '+', required = False, default = [1, 2],
+                        help = "Number of cameras.")
+    parser.add_argument('--feeds', dest = 'feeds', type = int, required = False, default = 0,
+                        help = "Number of (saved) slice feeds of camera1.")
+    parser.add_argument('--frames', dest = 'frames', type = int, required = False, default = 200,
+                        help = "Film length in frames.")
+    parser.add_argument('--queue-depth', dest = 'queue_depth', type = int, required = False, default = 0,
+                        help = "Image writer queue depth, 0 saves in the GUI thread.")
+    parser.add_argument('--keep', dest = 'keep', action = 'store_true',
+                        help = "Don't delete the movies.")
+    parser.add_argument('--output', dest = 'output', type = str, required = False, default = None,
+                        help = "Save the report (JSON) to this file.")
+
+    args = parser.parse_args()
+
+    if args.child is not None:
+        runHal(json.loads(args.child))
+        sys.exit()
+
+    writer_kwds = {}
+    if (args.queue_depth > 0):
+        writer_kwds["queue_depth"] = args.queue_depth
+
+    print(" size   rate format   cams      fps     MB/s  dropped  lag(ms)  max lag  msg(ms)  RSS(MB)")
+    report = []
+    for [size, rate, filetype, cameras] in itertools.product(args.sizes, args.rates, args.formats, args.cameras):
+        result = runBenchmark(size = size,
+                              rate = rate,
+                              filetype = filetype,
+                              cameras = cameras,
+                              feeds = args.feeds,
+                              frames = args.frames,
+                              keep = args.keep,
+                              **writer_kwds)
+        printResult(result)
+        report.append(result)
+
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent = 1)
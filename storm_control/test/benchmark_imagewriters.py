@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Image writer throughput benchmarks. These are not run as part of
+the tests, run them by hand on the computer you want to measure.
+
+Frames are generated in the same way as camera.noneCameraControl
+and are fed to the writer at a fixed rate (or as fast as possible
+if the rate is 0) through the camera functionality newFrame signal,
+just like they are in HAL.
+
+$ python benchmark_imagewriters.py --rate 400 --frames 2000 --size 512
+$ python benchmark_imagewriters.py --tiff --frames 200
+"""
+import numpy
+import os
+import time
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+
+import storm_control.test as test
+
+
+def createCameraFunctionality(x_pixels, y_pixels):
+    p = params.StormXMLObject()
+    p.add(params.ParameterInt(name = "bytes_per_frame", value = 2 * x_pixels * y_pixels))
+    p.add(params.ParameterString(name = "extension", value = ""))
+    p.add(params.ParameterInt(name = "x_pixels", value = x_pixels))
+    p.add(params.ParameterInt(name = "y_pixels", value = y_pixels))
+    return cameraFunctionality.CameraFunctionality(camera_name = "camera1",
+                                                   parameters = p)
+
+def fakeFrames(size, n_frames = 16):
+    """
+    A bank of frames, rolled like they are in noneCameraControl.
+    """
+    fake_frame = noneCameraControl.createFakeFrame(size, size)
+    return [numpy.roll(fake_frame, i) for i in range(n_frames)]
+
+def writerBenchmark(basename, filetype = ".dax", frames = 1000, rate = 0.0, size = 512, **kwds):
+    """
+    Returns [sustained MB/s, sustained frames/s, maximum lag in seconds].
+    """
+    cam_fn = createCameraFunctionality(size, size)
+    film_settings = filmSettings.FilmSettings(basename = os.path.join(test.dataDirectory(), basename),
+                                              filetype = filetype,
+                                              film_length = frames)
+    film_settings.setPixelSize(0.1)
+
+    bank = fakeFrames(size)
+    interval = 0.0
+    if (rate > 0.0):
+        interval = 1.0/rate
+
+    max_lag = 0.0
+    start_time = time.perf_counter()
+    writer = imagewriters.createFileWriter(cam_fn, film_settings, **kwds)
+    for i in range(frames):
+
+        # Wait until it is time for the next frame.
+        if (interval > 0.0):
+            due = start_time + i * interval
+            now = time.perf_counter()
+            if (now < due):
+                time.sleep(due - now)
+            elif ((now - due) > max_lag):
+                max_lag = now - due
+
+        cam_fn.newFrame.emit(frame.Frame(bank[i%len(bank)], i, size, size, "camera1"))
+
+    cam_fn.stopped.emit()
+    while not writer.isStopped():
+        time.sleep(0.001)
+    writer.closeWriter()
+    elapsed = time.perf_counter() - start_time
+
+    mb = frames * 2 * size * size * 0.000000953674
+    return [mb/elapsed, frames/elapsed, max_lag]
+
+def printResult(name, result):
+    print("{0:32s} {1:8.1f} MB/s {2:8.1f} fps, max lag {3:.3f}s".format(name, *result))
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Image writer throughput benchmark.')
+    parser.add_argument('--frames', dest = 'frames', type = int, required = False, default = 1000,
+                        help = "The number of frames to write.")
+    parser.add_argument('--rate', dest = 'rate', type = float, required = False, default = 0.0,
+                        help = "The frame rate to emulate, 0 is as fast as possible.")
+    parser.add_argument('--size', dest = 'size', type = int, required = False, default = None,
+                        help = "The frame size in pixels (square frames), 512 for dax, 2048 for tiff.")
+    parser.add_argument('--batch', dest = 'batch', type = int, required = False, default = 32,
+                        help = "The number of frames per write in batched mode.")
+    parser.add_argument('--tiff', dest = 'tiff', action = 'store_true',
+                        help = "Compare the BigTIFF writers instead of the dax writers.")
+
+    args = parser.parse_args()
+
+    kwds = {"frames" : args.frames,
+            "rate" : args.rate}
+
+    if args.tiff:
+        kwds["size"] = 2048 if (args.size is None) else args.size
+
+        printResult("dax (reference)", writerBenchmark("bench_dax", **kwds))
+        printResult("big.tif, tifffile", writerBenchmark("bench_tifffile",
+                                                         filetype = ".big.tif",
+                                                         **kwds))
+        printResult("big.tif, fast", writerBenchmark("bench_fast",
+                                                     fast_bigtiff = True,
+                                                     filetype = ".big.tif",
+                                                     **kwds))
+        printResult("big.tif, fast, threaded", writerBenchmark("bench_fast_th",
+                                                               fast_bigtiff = True,
+                                                               filetype = ".big.tif",
+                                                               queue_depth = args.batch,
+                                                               **kwds))
+
+    else:
+        kwds["size"] = 512 if (args.size is None) else args.size
+
+        printResult("dax, single", writerBenchmark("bench_single", **kwds))
+        printResult("dax, batched", writerBenchmark("bench_batched",
+                                                    batch_frames = args.batch,
+                                                    **kwds))
+        printResult("dax, batched, preallocated", writerBenchmark("bench_batched_pa",
+                                                                  batch_frames = args.batch,
+                                                                  preallocate = True,
+                                                                  **kwds))
+        printResult("dax, batched, threaded", writerBenchmark("bench_batched_th",
+                                                              batch_frames = args.batch,
+                                                              queue_depth = 2 * args.batch,
+                                                              **kwds))
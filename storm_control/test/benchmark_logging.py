@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Measures the cost of a hdebug.logText() call in the message loop,
+i.e. logging that a message was handled by a module. This is not
+run as part of the tests.
+
+$ python benchmark_logging.py --calls 100000
+"""
+import time
+
+import storm_control.sc_library.hdebug as hdebug
+
+import storm_control.test as test
+
+
+def logCalls(n_calls, lazy):
+    """
+    Returns the time per call in microseconds.
+    """
+    start_time = time.perf_counter()
+    if lazy:
+        for i in range(n_calls):
+            hdebug.logText("handled by,{0},{1},{2}", i, "camera1", "start film")
+    else:
+        for i in range(n_calls):
+            hdebug.logText(",".join(["handled by", str(i), "camera1", "start film"]))
+    return 1.0e6 * (time.perf_counter() - start_time)/n_calls
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'hdebug.logText() benchmark.')
+    parser.add_argument('--calls', dest='calls', type=int, required=False, default=100000,
+                        help = "The number of logText() calls.")
+    args = parser.parse_args()
+
+    print("{0:30s} {1:>10s}".format("mode", "us/call"))
+
+    hdebug.startLogging(test.logDirectory(), "benchmark")
+    print("{0:30s} {1:10.2f}".format("synchronous", logCalls(args.calls, False)))
+
+    # Remove the synchronous handler so that it doesn't also log.
+    hdebug.a_logger.handlers = []
+
+    hdebug.startLogging(test.logDirectory(), "benchmark", asynchronous = True)
+    print("{0:30s} {1:10.2f}".format("asynchronous", logCalls(args.calls, False)))
+    print("{0:30s} {1:10.2f}".format("asynchronous, lazy format", logCalls(args.calls, True)))
+
+    start_time = time.perf_counter()
+    hdebug.stopLogging()
+    print("")
+    print("Flushing the remaining records took {0:.1f} ms".format(1000.0 * (time.perf_counter() - start_time)))
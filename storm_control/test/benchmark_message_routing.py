@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+HAL message passing benchmark. Like benchmark_acquisition.py this is not
+run as part of the tests, run it by hand.
+
+This starts (headless) HAL with only the main window and a large number
+of (dummy) modules in a separate process, sends a lot of messages through
+HAL and reports how many messages per second HAL passed. Each module only
+handles one of the message types, so this compares HAL routing the
+messages to just the modules that handle them ('routed') with sending
+every message to every module ('broadcast').
+
+$ python benchmark_message_routing.py --modules 32 64 --types 8 --messages 5000
+"""
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+import storm_control.test as test
+
+
+def runBenchmark(modules = 32, types = 8, messages = 5000, broadcast = False, timeout = 600):
+    """
+    Run HAL and return a dictionary of results.
+    """
+    directory = os.path.join(test.dataDirectory(), "benchmark")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    spec = {"broadcast" : broadcast,
+            "modules" : modules,
+            "n_messages" : messages,
+            "n_types" : types,
+            "results_file" : os.path.join(directory, "routing_results.json")}
+
+    if os.path.exists(spec["results_file"]):
+        os.remove(spec["results_file"])
+
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                   stdout = subprocess.DEVNULL,
+                   timeout = timeout)
+
+    result = {"mode" : "broadcast" if broadcast else "routed",
+              "modules" : modules,
+              "types" : types,
+              "messages" : messages}
+
+    if not os.path.exists(spec["results_file"]):
+        result["error"] = "HAL did not finish."
+        return result
+
+    with open(spec["results_file"]) as fp:
+        hal_results = json.load(fp)
+    os.remove(spec["results_file"])
+
+    result["time"] = hal_results["time"]
+    result["messages/s"] = hal_results["messages/s"]
+    return result
+
+def runHal(spec):
+    """
+    This is what runs in the child process.
+    """
+    from PyQt5 import QtWidgets
+
+    import storm_control.hal4000.hal4000 as hal4000
+    import storm_control.sc_library.parameters as params
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    config = params.config(test.halXmlFilePathAndName("none_classic_config.xml"))
+    config.set("strict", False)
+    config.add("print_messages", False)
+    config.add("message_statistics", False)
+
+    # Only keep HAL's main window.
+    for module_name in list(config.get("modules").getAttrs()):
+        if (module_name != "hal"):
+            config.get("modules").delete(module_name)
+
+    for i in range(spec["modules"]):
+        c_module = config.addSubSection("modules.routing" + str(i))
+        c_module.add("class_name", "RoutingBenchmarkModule")
+        c_module.add("module_name", "storm_control.test.hal.benchmark_tests")
+        c_module.add("broadcast", spec["broadcast"])
+        c_module.add("handles", "routing " + str(i % spec["n_types"]))
+
+    c_test = config.addSubSection("modules.testing")
+    c_test.add("class_name", "RoutingBenchmark")
+    c_test.add("module_name", "storm_control.test.hal.benchmark_tests")
+    for key in ["n_messages", "n_types", "results_file"]:
+        c_test.add(key, spec[key])
+
+    hal = hal4000.HalCore(config = config,
+                          testing_mode = True,
+                          show_gui = False)
+    app.exec_()
+
+def printResult(result):
+    if "error" in result:
+        print("{mode:10s} {modules:7d} {types:5d} {messages:8d}  {error}".format(**result))
+    else:
+        print("{mode:10s} {modules:7d} {types:5d} {messages:8d} {time:8.2f} {messages/s:10.0f}".format(**result))
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'HAL message passing benchmark.')
+    parser.add_argument('--child', dest = 'child', type = str, required = False, default = None,
+                        help = argparse.SUPPRESS)
+    parser.add_argument('--modules', dest = 'modules', type = int, nargs = '+', required = False, default = [32],
+                        help = "Number of modules.")
+    parser.add_argument('--types', dest = 'types', type = int, required = False, default = 8,
+                        help = "Number of different message types.")
+    parser.add_argument('--messages', dest = 'messages', type = int, required = False, default = 5000,
+                        help = "Number of messages to send.")
+    parser.add_argument('--output', dest = 'output', type = str, required = False, default = None,
+                        help = "Save the report (JSON) to this file.")
+
+    args = parser.parse_args()
+
+    if args.child is not None:
+        runHal(json.loads(args.child))
+        sys.exit()
+
+    print("mode       modules types messages  time(s) messages/s")
+    report = []
+    for [modules, broadcast] in itertools.product(args.modules, [False, True]):
+        result = runBenchmark(modules = modules,
+                              types = args.types,
+                              messages = args.messages,
+                              broadcast = broadcast)
+        printResult(result)
+        report.append(result)
+
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent = 1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Measures the cost of validating a message in strict mode, comparing
+halMessage.validateData() with the compiled MessageValidator, and
+the cost once a sampled message type is no longer being validated.
+This is not run as part of the tests.
+
+$ python benchmark_message_validation.py --messages 100000
+"""
+import time
+
+from PyQt5 import QtCore
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+
+
+class Source(object):
+    module_name = "test"
+
+
+def timeCalls(fn, n_messages):
+    """
+    Returns the time per call in microseconds.
+    """
+    start_time = time.perf_counter()
+    for i in range(n_messages):
+        fn()
+    return 1.0e6 * (time.perf_counter() - start_time)/n_messages
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Message validation benchmark.')
+    parser.add_argument('--messages', dest='messages', type=int, required=False, default=100000,
+                        help = "The number of messages to validate.")
+    args = parser.parse_args()
+
+    halMessage.initializeMessages()
+    messages = [halMessage.HalMessage(m_type = "get functionality",
+                                      data = {"name" : "camera1", "extra data" : "x"},
+                                      source = Source()),
+                halMessage.HalMessage(m_type = "add to ui",
+                                      data = {"ui_order" : 1, "ui_parent" : "hal.containerWidget", "ui_widget" : QtCore.QObject()},
+                                      source = Source()),
+                halMessage.HalMessage(m_type = "configure2",
+                                      source = Source())]
+
+    print("{0:20s} {1:>12s} {2:>12s} {3:>12s}".format("message", "validate", "compiled", "sampled"))
+    for message in messages:
+        validator = halMessage.valid_messages[message.m_type].get("data")
+        t1 = timeCalls(lambda : halMessage.validateData(validator, message), args.messages)
+
+        m_validator = halMessage.message_validators[message.m_type]
+        t2 = timeCalls(lambda : m_validator.validateData(message), args.messages)
+
+        m_validator.n_validated = 10
+        t3 = timeCalls(lambda : m_validator.shouldValidate(10) and m_validator.validateData(message), args.messages)
+        print("{0:20s} {1:12.3f} {2:12.3f} {3:12.3f}".format(message.m_type, t1, t2, t3))
+    print("")
+    print("Times are in microseconds per message.")
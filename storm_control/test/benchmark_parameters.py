@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Parameters benchmark. Like benchmark_acquisition.py this is not run
+as part of the tests, run it by hand.
+
+This starts (headless) HAL with the none_classic_dual_config.xml test
+configuration, with additional cameras if requested, in a separate
+process. It loads two multi-camera parameters files, like a Dave
+sequence that changes the parameters between movies, and switches
+between them. It reports how long each 'set parameters' took.
+
+It then uses the complete set of parameters from HAL to time copying,
+comparing (params.difference()) and updating (params.copyParameters())
+a realistic parameters object.
+
+$ python benchmark_parameters.py --cameras 2 4 --switches 20
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import storm_control.test as test
+
+
+def benchmarkDirectory():
+    directory = os.path.join(test.dataDirectory(), "benchmark")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return directory
+
+def timeIt(func, reps):
+    """
+    Returns the average time in milliseconds.
+    """
+    start_time = time.perf_counter()
+    for i in range(reps):
+        func()
+    return 1000.0 * (time.perf_counter() - start_time)/reps
+
+def writeParametersFile(filename, cameras, size, exposure_time):
+    with open(filename, "w") as fp:
+        fp.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<settings>\n')
+        for i in range(cameras):
+            fp.write("  <camera" + str(i+1) + ">\n")
+            fp.write('    <exposure_time type="float">' + str(exposure_time) + '</exposure_time>\n')
+            for pname in ["x_end", "y_end"]:
+                fp.write('    <' + pname + ' type="int">' + str(size) + '</' + pname + '>\n')
+            fp.write("  </camera" + str(i+1) + ">\n")
+        fp.write('  <film>\n    <frames type="int">' + str(size) + '</frames>\n  </film>\n')
+        fp.write('</settings>\n')
+
+def runBenchmark(cameras = 2, switches = 10, reps = 200, timeout = 600):
+    """
+    Run HAL and return a dictionary of results.
+    """
+    import storm_control.sc_library.parameters as params
+
+    directory = benchmarkDirectory()
+    name = "params_" + str(cameras)
+
+    spec = {"cameras" : cameras,
+            "n_switches" : switches,
+            "parameters_out" : os.path.join(directory, name + "_hal.xml"),
+            "results_file" : os.path.join(directory, name + "_results.json")}
+
+    for [ab, size, exposure_time] in [["a", 256, 0.05], ["b", 512, 0.1]]:
+        p_name = name + "_" + ab
+        p_file = os.path.join(directory, p_name + ".xml")
+        writeParametersFile(p_file, cameras, size, exposure_time)
+        spec["parameters_file_" + ab] = p_file
+        spec["parameters_name_" + ab] = p_name
+
+    for fname in [spec["parameters_out"], spec["results_file"]]:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                   stdout = subprocess.DEVNULL,
+                   timeout = timeout)
+
+    result = {"cameras" : cameras,
+              "switches" : switches}
+
+    if not os.path.exists(spec["results_file"]) or not os.path.exists(spec["parameters_out"]):
+        result["error"] = "HAL did not finish."
+        return result
+
+    with open(spec["results_file"]) as fp:
+        set_times = json.load(fp)["set_times"]
+
+    # Skip the first two, these are the first time that HAL sees each file.
+    set_times = sorted(set_times[2:])
+    result["set_ms"] = 1000.0 * sum(set_times)/len(set_times)
+    result["set_max_ms"] = 1000.0 * set_times[-1]
+
+    # Parameters object timings.
+    p1 = params.parameters(spec["parameters_out"], recurse = True)
+    p2 = params.parameters(spec["parameters_out"], recurse = True)
+    n_params = [0]
+
+    def countParams(p):
+        for attr in p.getAttrs():
+            if isinstance(p.getp(attr), params.StormXMLObject):
+                countParams(p.getp(attr))
+            else:
+                n_params[0] += 1
+    countParams(p1)
+    result["n_params"] = n_params[0]
+
+    def copyChange():
+        p3 = p1.copy()
+        p3.set("camera1.exposure_time", 1.0)
+        return p3
+
+    p3 = copyChange()
+    new_p = params.parameters(spec["parameters_file_b"], recurse = True)
+
+    result["copy_ms"] = timeIt(p1.copy, reps)
+    result["copy_change_ms"] = timeIt(copyChange, reps)
+    result["diff_copy_ms"] = timeIt(lambda : params.difference(p3, p1), reps)
+    result["diff_file_ms"] = timeIt(lambda : params.difference(p1, p2), reps)
+    result["copy_parameters_ms"] = timeIt(lambda : params.copyParameters(p1, new_p), reps)
+
+    return result
+
+def runHal(spec):
+    """
+    This is what runs in the child process.
+    """
+    from PyQt5 import QtWidgets
+
+    import storm_control.hal4000.hal4000 as hal4000
+    import storm_control.sc_library.parameters as params
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    config = params.config(test.halXmlFilePathAndName("none_classic_dual_config.xml"))
+    config.add("print_messages", False)
+
+    # Add more cameras.
+    camera2 = config.get("modules.camera2")
+    for i in range(2, spec["cameras"]):
+        camera = config.addSubSection("modules.camera" + str(i+1), svalue = camera2.copy())
+        camera.set("camera.parameters.extension", "camera" + str(i+1))
+
+    # Add the benchmark module.
+    c_test = config.addSubSection("modules.testing")
+    c_test.add("class_name", "ParametersBenchmark")
+    c_test.add("module_name", "storm_control.test.hal.benchmark_tests")
+    for key in spec:
+        if (key != "cameras"):
+            c_test.add(key, spec[key])
+
+    hal = hal4000.HalCore(config = config,
+                          testing_mode = True,
+                          show_gui = False)
+    app.exec_()
+
+def printResult(result):
+    if "error" in result:
+        print("{cameras:4d} {switches:8d}  {error}".format(**result))
+    else:
+        print("{cameras:4d} {switches:8d} {n_params:6d} {set_ms:8.2f} {set_max_ms:8.2f} {copy_ms:8.3f} {copy_change_ms:8.3f} {diff_copy_ms:8.3f} {diff_file_ms:8.3f} {copy_parameters_ms:8.3f}".format(**result))
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'HAL parameters benchmark.')
+    parser.add_argument('--child', dest = 'child', type = str, required = False, default = None,
+                        help = argparse.SUPPRESS)
+    parser.add_argument('--cameras', dest = 'cameras', type = int, nargs = '+', required = False, default = [2, 4],
+                        help = "Number of cameras.")
+    parser.add_argument('--switches', dest = 'switches', type = int, required = False, default = 10,
+                        help = "Number of times to switch parameters.")
+    parser.add_argument('--reps', dest = 'reps', type = int, required = False, default = 200,
+                        help = "Repetitions for the parameters object timings.")
+    parser.add_argument('--output', dest = 'output', type = str, required = False, default = None,
+                        help = "Save the report (JSON) to this file.")
+
+    args = parser.parse_args()
+
+    if args.child is not None:
+        runHal(json.loads(args.child))
+        sys.exit()
+
+    print("cams switches params   set(ms)  max(ms)  copy(ms) copy+set     diff diff(file) copyParams")
+    report = []
+    for cameras in args.cameras:
+        result = runBenchmark(cameras = cameras,
+                              switches = args.switches,
+                              reps = args.reps)
+        printResult(result)
+        report.append(result)
+
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent = 1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Display rescaling benchmark. Like benchmark_imagewriters.py this is
+not run as part of the tests, run it by hand on the computer that
+you want to measure.
+
+This times converting a uint16 camera frame to a uint8 display image
+(c_image_manipulation_c.rescaleImage()) for all eight combinations
+of flips and transpose, using the C library (if it was built, see
+SConstruct), numpy arithmetic and the look up table version.
+
+$ python benchmark_rescale.py --sizes 512 2048 --reps 20 --output report.json
+"""
+import itertools
+import json
+import numpy
+import time
+
+import storm_control.hal4000.halLib.c_image_manipulation_c as c_image
+
+
+def timeIt(func, reps):
+    """
+    Returns the average time in milliseconds.
+    """
+    func()
+    start_time = time.perf_counter()
+    for i in range(reps):
+        func()
+    return 1000.0 * (time.perf_counter() - start_time)/reps
+
+def runBenchmark(size, reps = 20, saturated_value = None):
+    """
+    Returns a list of results, one for each orientation.
+    """
+    image = numpy.random.randint(100, 1000, size = (size, size)).astype(numpy.uint16)
+    display_range = [100, 500]
+
+    methods = [["numpy", c_image.rescaleImageNumpy],
+               ["lut", c_image.rescaleImageLUT]]
+    if c_image.image_manip is not None:
+        methods.append(["c", c_image.rescaleImageC])
+
+    results = []
+    for [flip_h, flip_v, transpose] in itertools.product([False, True], repeat = 3):
+        result = {"size" : size,
+                  "orientation" : str(int(flip_h)) + str(int(flip_v)) + str(int(transpose))}
+        for [name, func] in methods:
+            result[name + "_ms"] = timeIt(lambda : func(image, flip_h, flip_v, transpose, display_range, saturated_value), reps)
+        results.append(result)
+    return results
+
+def printResult(result):
+    line = "{size:6d} {orientation:>4s}".format(**result)
+    for name in ["c", "numpy", "lut"]:
+        if (name + "_ms") in result:
+            line += " {0:9.2f}".format(result[name + "_ms"])
+        else:
+            line += "       n/a"
+    print(line)
+
+
+if (__name__ == "__main__"):
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Display rescaling benchmark.')
+    parser.add_argument('--sizes', dest = 'sizes', type = int, nargs = '+', required = False, default = [512, 2048],
+                        help = "The frame sizes in pixels (square frames).")
+    parser.add_argument('--reps', dest = 'reps', type = int, required = False, default = 20,
+                        help = "Repetitions for each timing.")
+    parser.add_argument('--saturated', dest = 'saturated', type = int, required = False, default = None,
+                        help = "Mark pixels at or above this value as saturated.")
+    parser.add_argument('--output', dest = 'output', type = str, required = False, default = None,
+                        help = "Save the report (JSON) to this file.")
+
+    args = parser.parse_args()
+
+    print("  size  ops     c(ms) numpy(ms)   lut(ms)")
+    report = []
+    for size in args.sizes:
+        for result in runBenchmark(size, reps = args.reps, saturated_value = args.saturated):
+            printResult(result)
+            report.append(result)
+
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent = 1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+The testing modules for the HAL benchmarks.
+
+AcquisitionBenchmark is the module that storm_control/test/benchmark_acquisition.py
+adds to HAL. It takes a single movie and records how long it took, the time
+it takes a message to get through HAL's queue while filming and the peak
+memory use. These are saved as JSON in 'results_file'.
+
+RoutingBenchmark and RoutingBenchmarkModule are the modules that
+storm_control/test/benchmark_message_routing.py uses to measure how
+many messages per second HAL can pass to a large number of modules.
+
+ParametersBenchmark is the module that storm_control/test/benchmark_parameters.py
+uses to measure how long it takes HAL to switch between two parameters files.
+"""
+import collections
+import json
+import time
+
+from PyQt5 import QtCore
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+resource = None
+try:
+    import resource
+except ModuleNotFoundError:
+    pass
+
+
+class AcquisitionBenchmark(testing.Testing):
+
+    def __init__(self, module_params = None, **kwds):
+        super().__init__(**kwds)
+
+        self.film_start = None
+        self.film_stop = None
+        self.latencies = []
+        self.probe_times = collections.deque()
+        self.results_file = module_params.get("results_file")
+
+        # This is used to send 'noop' messages while filming.
+        self.probe_timer = QtCore.QTimer(self)
+        self.probe_timer.setInterval(module_params.get("probe_interval", 20))
+        self.probe_timer.timeout.connect(self.handleProbeTimer)
+
+        self.test_actions = [testActions.SetDirectory(directory = module_params.get("save_directory")),
+                             testActions.LoadParameters(filename = module_params.get("parameters_file")),
+                             testActions.SetParameters(p_name = module_params.get("parameters_name")),
+                             testActions.Record(filename = module_params.get("basename"),
+                                                length = module_params.get("film_length"))]
+
+    def cleanUp(self, qt_settings):
+        results = {"film_time" : 0.0,
+                   "message_latency_ms" : 0.0,
+                   "message_latency_max_ms" : 0.0,
+                   "peak_rss_mb" : 0.0}
+
+        if self.film_stop is not None:
+            results["film_time"] = self.film_stop - self.film_start
+        if (len(self.latencies) > 0):
+            results["message_latency_ms"] = 1000.0 * sum(self.latencies)/len(self.latencies)
+            results["message_latency_max_ms"] = 1000.0 * max(self.latencies)
+
+        # On Linux ru_maxrss is in KB.
+        if resource is not None:
+            results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+        with open(self.results_file, "w") as fp:
+            json.dump(results, fp)
+
+    def handleProbeTimer(self):
+        self.probe_times.append(time.perf_counter())
+        self.newMessage.emit(halMessage.HalMessage(source = self,
+                                                   m_type = "noop"))
+
+    def processMessage(self, message):
+
+        if message.isType("film lockout"):
+            if message.getData()["locked out"]:
+                self.film_start = time.perf_counter()
+                self.probe_timer.start()
+            else:
+                self.film_stop = time.perf_counter()
+                self.probe_timer.stop()
+
+        # HAL's queue is first in first out so these arrive in the
+        # order that they were sent.
+        elif message.isType("noop") and (message.getSource() == self):
+            if (len(self.probe_times) > 0):
+                self.latencies.append(time.perf_counter() - self.probe_times.popleft())
+
+        super().processMessage(message)
+
+
+class RoutingBenchmark(halModule.HalModule):
+    """
+    Sends 'n_messages' messages of 'n_types' different types as fast
+    as HAL will take them and records how long it took for all of
+    them to be finalized.
+    """
+    message_types = ["start"]
+
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.n_finalized = 0
+        self.n_messages = module_params.get("n_messages")
+        self.n_types = module_params.get("n_types")
+        self.results_file = module_params.get("results_file")
+        self.start_time = None
+
+        for i in range(self.n_types):
+            halMessage.addMessage("routing " + str(i),
+                                  validator = {"data" : None, "resp" : None})
+
+        halMessage.addMessage("tests done",
+                              validator = {"data" : None, "resp" : None})
+
+    def handleFinalized(self):
+        self.n_finalized += 1
+        if (self.n_finalized == self.n_messages):
+            elapsed = time.perf_counter() - self.start_time
+            with open(self.results_file, "w") as fp:
+                json.dump({"messages" : self.n_messages,
+                           "time" : elapsed,
+                           "messages/s" : self.n_messages/elapsed}, fp)
+            self.newMessage.emit(halMessage.HalMessage(source = self,
+                                                       m_type = "tests done"))
+
+    def processMessage(self, message):
+
+        if message.isType("start"):
+            self.start_time = time.perf_counter()
+            for i in range(self.n_messages):
+                self.newMessage.emit(halMessage.HalMessage(source = self,
+                                                           m_type = "routing " + str(i % self.n_types),
+                                                           finalizer = self.handleFinalized))
+
+
+class RoutingBenchmarkModule(halModule.HalModule):
+    """
+    Handles one of the RoutingBenchmark message types, or all
+    of the messages if 'broadcast' is True.
+    """
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.n_processed = 0
+
+        if not module_params.get("broadcast", False):
+            self.message_types = [module_params.get("handles")]
+
+    def processMessage(self, message):
+        if message.m_type.startswith("routing"):
+            self.n_processed += 1
+
+
+class ParametersBenchmark(testing.Testing):
+    """
+    Loads two parameters files and then switches between them 'n_switches'
+    times, recording how long each 'set parameters' took. The final
+    parameters are saved in 'parameters_out'.
+    """
+    def __init__(self, module_params = None, **kwds):
+        super().__init__(**kwds)
+        self.action_start = None
+        self.parameters_out = module_params.get("parameters_out")
+        self.results_file = module_params.get("results_file")
+        self.set_times = []
+
+        name_a = module_params.get("parameters_name_a")
+        name_b = module_params.get("parameters_name_b")
+        self.get_parameters = testActions.GetParameters(p_name = name_a)
+
+        self.test_actions = [testActions.LoadParameters(filename = module_params.get("parameters_file_a")),
+                             testActions.LoadParameters(filename = module_params.get("parameters_file_b"))]
+        for i in range(module_params.get("n_switches")):
+            self.test_actions.append(testActions.SetParameters(p_name = name_b))
+            self.test_actions.append(testActions.SetParameters(p_name = name_a))
+        self.test_actions.append(self.get_parameters)
+
+    def cleanUp(self, qt_settings):
+        if self.get_parameters.parameters is not None:
+            self.get_parameters.parameters.saveToFile(self.parameters_out, all_params = True)
+
+        with open(self.results_file, "w") as fp:
+            json.dump({"set_times" : self.set_times}, fp)
+
+    def handleActionDone(self):
+        if isinstance(self.current_action, testActions.SetParameters):
+            self.set_times.append(time.perf_counter() - self.action_start)
+        super().handleActionDone()
+        self.action_start = time.perf_counter()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Tests of running HAL without a GUI.
+"""
+import sys
+
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+import storm_control.test as test
+
+
+class HeadlessTest1(testing.Testing):
+    """
+    Take a movie without the GUI modules.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        # The GUI only modules should not have been imported.
+        assert(not "storm_control.hal4000.display.display" in sys.modules)
+        assert(not "storm_control.hal4000.mosaic.mosaic" in sys.modules)
+
+        self.test_actions = [testActions.SetDirectory(directory = test.dataDirectory()),
+                             testActions.Record(filename = "movie_01")]
+
+    def processMessage(self, message):
+
+        if message.isType("configure1"):
+            assert(not "display" in message.getData()["all_modules"])
+
+        super().processMessage(message)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Tests of message routing, modules that list the messages that
+they handle should only get those messages.
+"""
+import storm_control.hal4000.feeds.feeds as feeds
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+import storm_control.test as test
+
+
+#
+# Check which modules processed which messages after taking a movie.
+#
+class RoutingTest1Action1(testActions.GetStatistics):
+
+    def checkStatistics(self):
+        modules = self.statistics["modules"]
+
+        # These modules get all the messages.
+        assert("noop" in modules["hal"])
+        assert("noop" in modules["film"])
+
+        # The feeds module only gets the messages it handles.
+        assert(not "noop" in modules["feeds"])
+        assert("start film" in modules["feeds"])
+        for m_type in modules["feeds"]:
+            assert(m_type in feeds.Feeds.message_types), m_type + " was sent to feeds."
+
+class RoutingTest1(testing.Testing):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActions.Timer(100),
+                             testActions.SetDirectory(directory = test.dataDirectory()),
+                             testActions.Record(filename = "movie_01"),
+                             RoutingTest1Action1()]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Modules for testing halLib.halStartup.
+"""
+import time
+
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+import storm_control.hal4000.halLib.halModule as halModule
+
+
+class FastModule(halModule.HalModule):
+    """
+    A module without any hardware.
+    """
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.created = time.perf_counter()
+        self.hardware = None
+
+
+class SlowModule(FastModule):
+    """
+    A module whose hardware takes 'hardware_time' seconds to
+    initialize, like opening a camera.
+    """
+    def __init__(self, hardware = None, **kwds):
+        super().__init__(**kwds)
+        self.hardware = hardware
+
+    @classmethod
+    def initializeHardware(cls, module_params):
+        start_time = time.perf_counter()
+        if module_params.get("fail", False):
+            raise Exception("Hardware not found.")
+        time.sleep(module_params.get("hardware_time"))
+        return {"started" : start_time, "initialized" : time.perf_counter()}
+
+
+class SlowCameraControl(noneCameraControl.NoneCameraControl):
+    """
+    An emulated camera whose driver takes 'open_time' seconds to open.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.created = time.perf_counter()
+
+    @classmethod
+    def openCamera(cls, config):
+        start_time = time.perf_counter()
+        time.sleep(config.get("open_time"))
+        return {"started" : start_time, "opened" : time.perf_counter()}
+
+
+class SlowCameraControl2(SlowCameraControl):
+    """
+    The same, but with a different 'driver'.
+    """
+    pass
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Tests of the message passing statistics.
+"""
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+import storm_control.test as test
+
+
+#
+# Check the statistics after taking a movie.
+#
+class StatisticsTest1Action1(testActions.GetStatistics):
+
+    def checkStatistics(self):
+        messages = self.statistics["messages"]
+        assert(messages["start film request"]["count"] == 1)
+        assert(messages["film lockout"]["count"] == 2)
+        assert(messages["film lockout"]["finalize"]["count"] >= 1)
+        assert(messages["start camera"]["queue wait"]["count"] >= 2)
+
+        modules = self.statistics["modules"]
+        assert(modules["film"]["start film request"]["process"]["count"] == 1)
+        assert(modules["camera1"]["start camera"]["worker"]["count"] >= 1)
+
+        hist = modules["camera1"]["start camera"]["worker"]
+        assert(hist["max ms"] >= hist["mean ms"])
+        assert(hist["p99 ms"] >= hist["p50 ms"])
+
+        lanes = self.statistics["lanes"]
+        assert(lanes["control"]["count"] >= 3)
+        assert(lanes["normal"]["queue wait"]["count"] == lanes["normal"]["count"])
+
+        startup = self.statistics["startup"]
+        assert(startup["hal"]["create ms"] > 0.0)
+        assert(startup["hal"]["hardware ms"] == 0.0)
+        assert(startup["camera1"]["hardware ms"] >= 0.0)
+
+class StatisticsTest1Action2(testActions.GetStatistics):
+
+    def checkStatistics(self):
+        messages = self.statistics["messages"]
+        # Messages that were sent before the reset may still be finalized
+        # after the reset, but they are not counted again.
+        for m_type in messages:
+            if (m_type != "get statistics"):
+                assert(messages[m_type]["count"] == 0), m_type + " was counted."
+        assert(messages["get statistics"]["count"] == 1)
+
+class StatisticsTest1(testing.Testing):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActions.SetDirectory(directory = test.dataDirectory()),
+                             testActions.Record(filename = "movie_01"),
+                             StatisticsTest1Action1(reset = True),
+                             StatisticsTest1Action2()]
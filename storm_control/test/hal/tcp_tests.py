@@ -266,6 +266,25 @@ class GetMosaicSettings2(testing.TestingTCP):
         self.test_actions = [GetMosaicSettingsAction2(test_mode = True)]
 
 
+#
+# Test "Get Statistics" message.
+#
+class GetStatisticsAction1(testActionsTCP.GetStatistics):
+
+    def checkMessage(self, tcp_message):
+        assert not tcp_message.hasError()
+        stats = tcp_message.getResponse("statistics")
+        assert(stats["messages"]["configure1"]["count"] == 1)
+        assert("settings" in stats["modules"])
+
+class GetStatistics1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [GetStatisticsAction1()]
+
+
 #
 # Test "Get Objective" message.
 #
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Stress tests of the BufferedFunctionality backlog policies using
+the emulated QPD and stage.
+
+The emulated QPD takes 0.1 seconds per reading and we ask for
+a reading every 0.01 seconds.
+"""
+import time
+
+from PyQt5 import QtCore
+
+import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.parameters as params
+
+import storm_control.sc_hardware.none.noneQPDModule as noneQPDModule
+import storm_control.sc_hardware.none.noneStageModule as noneStageModule
+
+import storm_control.test as test
+
+
+def createQPD(max_backlog, backlog_policy):
+    parameters = params.StormXMLObject()
+    parameters.add(params.ParameterFloat(name = "sum_warning_low", value = 100.0))
+    return noneQPDModule.NoneQPDFunctionality(device_mutex = QtCore.QMutex(),
+                                              max_backlog = max_backlog,
+                                              backlog_policy = backlog_policy,
+                                              parameters = parameters,
+                                              units_to_microns = 1.0)
+
+def overloadQPD(qpd, n_requests = 40):
+    """
+    Returns the number of requests that failed, the maximum backlog
+    and the time to submit all the requests.
+    """
+    n_failed = 0
+    max_backlog = 0
+    start_time = time.time()
+    for i in range(n_requests):
+        try:
+            qpd.getOffset()
+        except halExceptions.HardwareException:
+            n_failed += 1
+        max_backlog = max(max_backlog, qpd.getBacklog())
+        time.sleep(0.01)
+    submit_time = time.time() - start_time
+    qpd.wait()
+    return [n_failed, max_backlog, submit_time]
+
+def test_backlog_block():
+    """
+    The backlog is bounded by making the caller wait.
+    """
+    test.createApp()
+    qpd = createQPD(2, "block")
+    [n_failed, max_backlog, submit_time] = overloadQPD(qpd)
+    stats = qpd.getBacklogStatistics()
+    assert(n_failed == 0)
+    assert(max_backlog <= 2)
+    assert(stats["run"] == 40)
+    assert(stats["blocked"] > 0)
+    assert(stats["wait time"]["max ms"] < 400.0)
+    assert(submit_time > 3.0)
+
+def test_backlog_drop_oldest():
+    test.createApp()
+    qpd = createQPD(2, "drop oldest")
+    [n_failed, max_backlog, submit_time] = overloadQPD(qpd)
+    stats = qpd.getBacklogStatistics()
+    assert(n_failed == 0)
+    assert(max_backlog <= 2)
+    assert(stats["dropped"] > 0)
+    assert(stats["run"] + stats["dropped"] == 40)
+    assert(stats["wait time"]["max ms"] < 400.0)
+
+def test_backlog_fail():
+    test.createApp()
+    qpd = createQPD(2, "fail")
+    [n_failed, max_backlog, submit_time] = overloadQPD(qpd)
+    stats = qpd.getBacklogStatistics()
+    assert(n_failed > 0)
+    assert(n_failed == stats["rejected"])
+    assert(stats["run"] + n_failed == 40)
+    assert(stats["wait time"]["max ms"] < 400.0)
+
+def test_backlog_merge():
+    """
+    QPD readings are identical requests, so there is never more
+    than one of them waiting.
+    """
+    test.createApp()
+    qpd = createQPD(2, "merge")
+    [n_failed, max_backlog, submit_time] = overloadQPD(qpd)
+    stats = qpd.getBacklogStatistics()
+    assert(n_failed == 0)
+    assert(max_backlog <= 1)
+    assert(stats["merged"] > 0)
+    assert(stats["wait time"]["max ms"] < 300.0)
+
+def test_backlog_merge_different():
+    """
+    Requests that can't be merged wait when the backlog is full.
+    """
+    test.createApp()
+    qpd = createQPD(2, "merge")
+    n_failed = 0
+    for i in range(5):
+        try:
+            qpd.mustRun(task = time.sleep, args = [0.1 + 0.01 * i])
+        except halExceptions.HardwareException:
+            n_failed += 1
+    qpd.wait()
+    stats = qpd.getBacklogStatistics()
+    assert(n_failed == 0)
+    assert(stats["blocked"] > 0)
+    assert(stats["merged"] == 0)
+    assert(stats["run"] == 5)
+
+def test_backlog_stage():
+    """
+    Poll the stage position as fast as possible, this should
+    not build up a backlog.
+    """
+    test.createApp()
+    configuration = params.StormXMLObject()
+    configuration.add("velocity", 100.0)
+    configuration.add("max_backlog", 2)
+    configuration.add("backlog_policy", "merge")
+    module_params = params.StormXMLObject()
+    module_params.add("configuration", configuration)
+    stage_module = noneStageModule.NoneStageModule(module_name = "none_stage",
+                                                   module_params = module_params)
+
+    stage_fn = stage_module.stage_functionality
+    for i in range(1000):
+        stage_fn.handleUpdateTimer()
+        assert(stage_module.getBacklogs()["stage_functionality"] <= 2)
+    stage_fn.wait()
+
+    stats = stage_fn.getBacklogStatistics()
+    assert(stats["max queue length"] <= 2)
+    assert(stats["run"] + stats["merged"] == 1000)
+    assert(stage_module.getBacklogs() == {"stage_functionality" : 0})
+
+
+if (__name__ == "__main__"):
+    test_backlog_block()
+    test_backlog_drop_oldest()
+    test_backlog_fail()
+    test_backlog_merge()
+    test_backlog_merge_different()
+    test_backlog_stage()
@@ -2,6 +2,7 @@
 """
 Tests of the C libraries.
 """
+import itertools
 import numpy
 
 
@@ -37,6 +38,43 @@ def testCImageManipulation():
             assert(numpy.allclose(c_nim, py_nim, atol = 1.1))
 
 
+def testCImageManipulationLUT():
+    """
+    The look up table version should give exactly the same
+    result as the numpy version.
+    """
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    for shape in [(64,64), (37,128), (1,5)]:
+        nim = numpy.random.randint(200, size = shape).astype(numpy.uint16)
+        for ori in itertools.product([False, True], repeat = 3):
+            for max_v in [None, 101]:
+                [lut_nim, lut_min, lut_max] = cIM.rescaleImageLUT(nim, *ori, [10, 100], max_v)
+                [py_nim, py_min, py_max] = cIM.rescaleImageNumpy(nim, *ori, [10, 100], max_v)
+
+                assert(lut_nim.flags.c_contiguous)
+                assert(lut_nim.shape == py_nim.shape)
+                assert(numpy.array_equal(lut_nim, py_nim))
+                assert(lut_min == py_min)
+                assert(lut_max == py_max)
+
+    # The tables are cached and can't be changed.
+    table = cIM.rescaleTable(10, 100, 101)
+    assert(cIM.rescaleTable(10, 100, 101) is table)
+    assert(not table.flags.writeable)
+    assert(table[9] == 0)
+    assert(table[100] == 254)
+    assert(table[101] == 255)
+
+def testTransposeImage():
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    image = numpy.random.randint(200, size = (600,35)).astype(numpy.uint8)
+    assert(numpy.array_equal(cIM.transposeImage(image), numpy.transpose(image)))
+    assert(numpy.array_equal(cIM.transposeImage(image, band = 7), numpy.transpose(image)))
+    assert(cIM.transposeImage(image).flags.c_contiguous)
+
+
 
 def testFocusQuality():
     import storm_control.hal4000.camera.frame as frame
@@ -88,6 +126,8 @@ def testLMMoment():
 
 if (__name__ == "__main__"):
     testCImageManipulation()
+    testCImageManipulationLUT()
+    testTransposeImage()
     testFocusQuality()
     testLMMoment()
     
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+Tests of rendering camera frames for display in a worker thread.
+"""
+import numpy
+import threading
+import time
+
+from PyQt5 import QtCore
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.display.cameraFrameViewer as cameraFrameViewer
+import storm_control.hal4000.display.displayRenderer as displayRenderer
+import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+import storm_control.hal4000.qtWidgets.qtHistogram as qtHistogram
+
+import storm_control.test as test
+
+
+def waitForImages(renderer, images, timeout = 10.0):
+    app = test.createApp()
+    start_time = time.time()
+    while (renderer.isBusy() or (len(images) == 0)) and ((time.time() - start_time) < timeout):
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+
+def test_render_frame_1():
+    """
+    Rendering without decimation.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 30 * 20)
+    a_frame = test.createFrame(pool, 5, 30, 20)
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              display_range = [0, 1000],
+                                              click_pos = [3, 2],
+                                              frame_offset = [10, 20],
+                                              frame_scale = [2, 2])
+    assert(image.frame_number == 5)
+    assert(image.q_image.width() == 30)
+    assert(image.q_image.height() == 20)
+    assert(image.image_min == 0)
+    assert(image.image_max == 599)
+    assert(image.intensity_info == 63)
+    assert(image.rect == QtCore.QRectF(10, 20, 60, 40))
+
+    # The image is a copy.
+    index = image.q_image.pixelIndex(29, 19)
+    assert(index > 0)
+    a_frame.getData()[:] = 0
+    a_frame.release()
+    assert(pool.getNumberFree() == 1)
+    assert(image.q_image.pixelIndex(29, 19) == index)
+
+def test_render_frame_2():
+    """
+    Rendering with decimation.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 30 * 20)
+    a_frame = test.createFrame(pool, 0, 30, 20)
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              display_range = [0, 1000],
+                                              click_pos = [29, 19],
+                                              decimation = 4)
+
+    # The last 2 columns are not a whole block so they are not rendered.
+    assert(image.q_image.width() == 7)
+    assert(image.q_image.height() == 5)
+    assert(image.rect == QtCore.QRectF(0, 0, 28, 20))
+
+    # These are from the whole frame, not just the pixels that were rendered.
+    assert(image.image_max == 599)
+    assert(image.intensity_info == 599)
+
+def test_render_frame_3():
+    """
+    Frames with the wrong size are not rendered.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 30 * 20)
+    a_frame = test.createFrame(pool, 0, 30, 20)
+    a_frame.image_x = 40
+    assert(qtCameraGraphicsScene.renderFrame(a_frame) is None)
+
+def test_render_frame_4():
+    """
+    Only the visible part of the frame is rendered.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 30 * 20)
+    a_frame = test.createFrame(pool, 0, 30, 20)
+
+    # Binned frame at an offset, chip pixels 20 - 50 are frame pixels 5 - 20.
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              frame_offset = [10, 10],
+                                              frame_scale = [2, 2],
+                                              visible_rect = [20.5, 10, 30, 100])
+    assert(image.q_image.width() == 16)
+    assert(image.q_image.height() == 20)
+    assert(image.rect == QtCore.QRectF(20, 10, 32, 40))
+    assert(image.image_max == 599)
+
+    # With decimation the region is aligned to the blocks.
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              decimation = 4,
+                                              visible_rect = [5, 5, 10, 10])
+    assert(image.rect == QtCore.QRectF(4, 4, 12, 12))
+    assert(image.q_image.width() == 3)
+
+    # Nothing is visible.
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              visible_rect = [100, 100, 10, 10])
+    assert(image.q_image is None)
+    assert(image.image_max == 599)
+
+def test_render_frame_5():
+    """
+    Down sampling methods.
+    """
+    image = numpy.arange(16, dtype = numpy.uint16).reshape(4,4)
+    assert(numpy.array_equal(qtCameraGraphicsScene.downsampleImage(image, 2, "decimate"),
+                             numpy.array([[0, 2], [8, 10]])))
+    assert(numpy.array_equal(qtCameraGraphicsScene.downsampleImage(image, 2, "max"),
+                             numpy.array([[5, 7], [13, 15]])))
+    assert(numpy.array_equal(qtCameraGraphicsScene.downsampleImage(image, 2, "mean"),
+                             numpy.array([[2, 4], [10, 12]])))
+    assert(qtCameraGraphicsScene.downsampleImage(image, 2, "mean").dtype == numpy.uint16)
+
+    # A single bright pixel is not lost with "max".
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 64 * 64)
+    a_frame = test.createFrame(pool, 0, 64, 64)
+    a_frame.getData()[:] = 0
+    a_frame.getData()[64 * 9 + 9] = 1000
+    image = qtCameraGraphicsScene.renderFrame(a_frame,
+                                              display_range = [0, 1000],
+                                              decimation = 8,
+                                              downsample = "max")
+    assert(image.q_image.pixelIndex(1, 1) == 255)
+    assert(image.q_image.pixelIndex(0, 0) == 0)
+
+def test_render_frame_6():
+    """
+    The histogram, minimum and maximum of large frames are from a sub-sample.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 2048 * 2048)
+    a_frame = test.createFrame(pool, 0, 2048, 2048)
+    a_frame.getData()[:] = 100
+    a_frame.getData()[2048 * 4 + 4] = 200
+    a_frame.getData()[2048 * 5 + 5] = 300
+    image = qtCameraGraphicsScene.renderFrame(a_frame)
+    assert(image.image_min == 100)
+    assert(image.image_max == 200)
+    assert(image.histogram.size == 65536)
+    assert(image.histogram[200] == 1)
+    assert(image.histogram[300] == 0)
+    assert(numpy.sum(image.histogram) == 512 * 512)
+
+def test_render_frame_7():
+    """
+    Percentiles from the histogram.
+    """
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 100 * 100)
+    a_frame = test.createFrame(pool, 0, 100, 100)
+    a_frame.getData()[:] = numpy.arange(100 * 100)
+    image = qtCameraGraphicsScene.renderFrame(a_frame)
+    assert(image.image_min == 0)
+    assert(image.image_max == 9999)
+    assert(qtCameraGraphicsScene.histogramPercentiles(image.histogram, [0.0, 1.0, 50.0, 100.0]) == [0, 99, 4999, 9999])
+
+def test_camera_item():
+    """
+    The rescale table is only re-calculated when it needs to be.
+    """
+    item = qtCameraGraphicsScene.QtCameraGraphicsItem()
+    item.newRange(10, 110)
+    table = item.getRescaleTable()
+    assert(item.getRenderSettings()["table"] is table)
+    assert(table[110] == 255)
+
+    item.newRange(10, 210)
+    assert(item.getRescaleTable() is not table)
+    assert(item.getRescaleTable()[110] == 128)
+
+    # No histogram yet.
+    assert(item.getAutoScale([0.1, 99.9]) == [0, 0])
+
+    pool = frame.FramePool(n_buffers = 1, n_pixels = 100 * 100)
+    a_frame = test.createFrame(pool, 0, 100, 100)
+    a_frame.getData()[:] = numpy.arange(100 * 100)
+    item.updateImageWithFrame(a_frame)
+    assert(item.getAutoScale() == [0, 9999])
+    assert(item.getAutoScale([1.0, 99.0]) == [99, 9899])
+
+def test_histogram_widget():
+    test.createApp()
+    histogram = numpy.zeros(65536, dtype = numpy.int64)
+    histogram[0:100] = 1
+    histogram[100:200] = 100
+
+    widget = qtHistogram.QtHistogram()
+    widget.resize(24, 100)
+    widget.setMaxIntensity(199)
+    widget.newRange(50, 150)
+    widget.newHistogram(histogram)
+
+    rows = widget.getRows(100)
+    assert(rows.size == 100)
+    assert(rows[-1] == 1.0)
+    assert(rows[0] < rows[-1])
+
+    # Fewer intensities than rows.
+    widget.setMaxIntensity(9)
+    assert(widget.getRows(100).size == 10)
+
+    assert(not widget.grab().isNull())
+
+def test_frame_viewer_histogram():
+    """
+    Showing the histogram widens the scale widget by the width of the
+    histogram, hiding it restores the original width.
+    """
+    test.createApp()
+    viewer = cameraFrameViewer.CameraFrameViewer(display_name = "display01")
+    scale_widget = viewer.ui.scaleWidget
+    width = scale_widget.minimumWidth()
+
+    for i in range(2):
+        viewer.handleHistogram(True)
+        assert(scale_widget.minimumWidth() >= width + viewer.ui.histogram.minimumWidth())
+        assert(scale_widget.maximumWidth() == scale_widget.minimumWidth())
+
+        # The width does not depend on the current width.
+        scale_widget.setFixedWidth(width + 100)
+        viewer.handleHistogram(True)
+        assert(scale_widget.minimumWidth() == width)
+        assert(scale_widget.maximumWidth() == width)
+    viewer.cleanUp()
+
+def test_display_renderer_1():
+    """
+    Frames are rendered in the renderer's thread, but the images
+    are delivered in the main thread.
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 2, n_pixels = 64 * 64)
+    renderer = displayRenderer.DisplayRenderer()
+
+    images = []
+    threads = []
+    def handleImageReady(image):
+        images.append(image)
+        threads.append(threading.current_thread())
+    renderer.imageReady.connect(handleImageReady)
+
+    a_frame = test.createFrame(pool, 1, 64, 64)
+    renderer.render(a_frame, {"display_range" : [0, 1000]})
+    a_frame.release()
+    waitForImages(renderer, images)
+
+    assert(len(images) == 1)
+    assert(images[0].q_image.width() == 64)
+    assert(threads[0] is threading.main_thread())
+    assert(renderer.executor.getStatistics()["run"] == 1)
+    assert(pool.getNumberFree() == 2)
+
+def test_display_renderer_2():
+    """
+    Only the newest frame is rendered, stale frames are dropped
+    (and their buffers returned to the pool).
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 4, n_pixels = 2048 * 2048)
+    renderer = displayRenderer.DisplayRenderer()
+
+    images = []
+    renderer.imageReady.connect(images.append)
+
+    # Keep the renderer busy until all the frames have been submitted.
+    event = threading.Event()
+    renderer.executor.submit(event.wait)
+
+    n_frames = 20
+    for i in range(n_frames):
+        a_frame = test.createFrame(pool, i, 2048, 2048)
+        renderer.render(a_frame, {"display_range" : [0, 1000], "decimation" : 2})
+        a_frame.release()
+        assert(pool.getNumberFree() == 3)
+    event.set()
+    waitForImages(renderer, images)
+
+    stats = renderer.getStatistics()
+    assert(stats["dropped"] == n_frames - 1)
+    assert(stats["rendered"] == 1)
+    assert(len(images) == 1)
+    assert(images[-1].frame_number == n_frames - 1)
+    assert(images[-1].q_image.width() == 1024)
+    assert(pool.getNumberFree() == 4)
+
+def test_display_renderer_3():
+    """
+    Cleaning up waits for the frame that is waiting to be rendered,
+    after this frames are not rendered.
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 2, n_pixels = 64 * 64)
+    renderer = displayRenderer.DisplayRenderer()
+
+    event = threading.Event()
+    renderer.executor.submit(event.wait)
+
+    a_frame = test.createFrame(pool, 0, 64, 64)
+    renderer.render(a_frame, {"display_range" : [0, 1000]})
+    a_frame.release()
+    assert(pool.getNumberFree() == 1)
+
+    threading.Timer(0.1, event.set).start()
+    renderer.cleanUp()
+    assert(not renderer.isBusy())
+    assert(renderer.getStatistics()["rendered"] == 1)
+    assert(pool.getNumberFree() == 2)
+
+    # Nothing is rendered after clean up.
+    a_frame = test.createFrame(pool, 1, 64, 64)
+    renderer.render(a_frame, {"display_range" : [0, 1000]})
+    a_frame.release()
+    assert(renderer.getStatistics()["rendered"] == 1)
+    assert(pool.getNumberFree() == 2)
+
+
+if (__name__ == "__main__"):
+    test_render_frame_1()
+    test_render_frame_2()
+    test_render_frame_3()
+    test_render_frame_4()
+    test_render_frame_5()
+    test_render_frame_6()
+    test_render_frame_7()
+    test_camera_item()
+    test_histogram_widget()
+    test_frame_viewer_histogram()
+    test_display_renderer_1()
+    test_display_renderer_2()
+    test_display_renderer_3()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Tests of halLib.halExecutor.
+"""
+import threading
+import time
+
+import storm_control.hal4000.halLib.halExecutor as halExecutor
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
+
+import storm_control.test as test
+
+
+def test_executor_order():
+    """
+    Tasks run in order, one at a time, in the same thread.
+    """
+    executor = halExecutor.SerialExecutor(name = "test")
+    results = []
+    threads = set()
+
+    def task(i):
+        threads.add(threading.get_ident())
+        results.append(i)
+
+    for i in range(100):
+        assert executor.submit(task, [i])
+    executor.waitForDone()
+    assert(results == list(range(100)))
+    assert(len(threads) == 1)
+    assert(executor.getStatistics()["run"] == 100)
+    assert(executor.getStatistics()["threads started"] == 1)
+
+def test_executor_coalesce():
+    """
+    Only the latest task with the same key runs.
+    """
+    executor = halExecutor.SerialExecutor(name = "test")
+    results = []
+    executor.submit(time.sleep, [0.1])
+    executor.submit(results.append, ["maybe 1"], key = "maybe")
+    executor.submit(results.append, ["must"])
+    executor.submit(results.append, ["maybe 2"], key = "maybe")
+    executor.waitForDone()
+    assert(results == ["must", "maybe 2"])
+    assert(executor.getStatistics()["coalesced"] == 1)
+
+    # A task submitted while idle is not replaced.
+    executor.submit(time.sleep, [0.1], key = "maybe")
+    executor.submit(results.append, ["maybe 3"], key = "maybe")
+    executor.waitForDone()
+    assert(results[-1] == "maybe 3")
+    assert(executor.getStatistics()["coalesced"] == 1)
+
+def test_executor_bounded():
+    executor = halExecutor.SerialExecutor(name = "test", max_queue = 2)
+    event = threading.Event()
+    assert executor.submit(event.wait)
+    time.sleep(0.05)
+    assert executor.submit(time.sleep, [0.0])
+    assert executor.submit(time.sleep, [0.0])
+    assert not executor.submit(time.sleep, [0.0])
+    event.set()
+    executor.waitForDone()
+
+    stats = executor.getStatistics()
+    assert(stats["rejected"] == 1)
+    assert(stats["max queue length"] == 2)
+    assert(stats["run time"]["count"] == 3)
+
+def test_executor_idle():
+    """
+    The thread exits when idle, and is restarted.
+    """
+    executor = halExecutor.SerialExecutor(name = "test", idle_time = 0.05)
+    executor.submit(time.sleep, [0.0])
+    time.sleep(0.2)
+    assert(executor.thread is None)
+    executor.submit(time.sleep, [0.0])
+    executor.waitForDone()
+    assert(executor.getStatistics()["threads started"] == 2)
+
+def test_executor_errors():
+    """
+    Exceptions don't stop the executor, stop() runs what is queued.
+    """
+    executor = halExecutor.SerialExecutor(name = "test")
+    results = []
+
+    def fail():
+        raise Exception("Failed!")
+
+    executor.submit(fail)
+    executor.submit(results.append, [1])
+    executor.stop()
+    assert(results == [1])
+    assert not executor.submit(results.append, [2])
+    assert("test" in halExecutor.getStatistics())
+
+def test_executor_busy_worker():
+    """
+    A second worker task started while the first is still running
+    does not replace the first task.
+    """
+    app = test.createApp()
+    module = halModule.HalModule(module_name = "test")
+    event = threading.Event()
+    results = []
+
+    message_1 = halMessage.HalMessage(m_type = "test 1", source = module)
+    halModule.runWorkerTask(module, message_1, event.wait)
+    worker_1 = module.worker
+    message_2 = halMessage.HalMessage(m_type = "test 2", source = module)
+    halModule.runWorkerTask(module, message_2, lambda : results.append(2))
+    assert(module.worker is not worker_1)
+    assert(worker_1.message is message_1)
+
+    event.set()
+    module.executor.waitForDone()
+    start_time = time.time()
+    while (module.worker is not None) and ((time.time() - start_time) < 5.0):
+        app.processEvents()
+    assert(results == [2])
+    assert(message_1.getRefCount() == 0)
+    assert(message_2.getRefCount() == 0)
+    assert(module.worker is None)
+    module.executor.stop()
+
+
+if (__name__ == "__main__"):
+    test_executor_order()
+    test_executor_coalesce()
+    test_executor_bounded()
+    test_executor_idle()
+    test_executor_errors()
+    test_executor_busy_worker()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Tests of the feeds (without HAL).
+"""
+import numpy
+import time
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+import storm_control.hal4000.feeds.feeds as feeds
+
+import storm_control.test as test
+
+
+def createFeed(feed_type, threaded = False, **kwds):
+    """
+    Returns [camera functionality, feed].
+    """
+    config = params.StormXMLObject()
+    config.add(params.ParameterFloat(name = "roll", value = 1.0))
+    camera = noneCameraControl.NoneCameraControl(camera_name = "camera1",
+                                                config = config)
+    cam_fn = camera.getCameraFunctionality()
+    cam_fn.parameters.setv("x_end", 16)
+    cam_fn.parameters.setv("x_pixels", 16)
+    cam_fn.parameters.setv("y_end", 8)
+    cam_fn.parameters.setv("y_pixels", 8)
+
+    feed_params = params.StormXMLObject()
+    fp = feed_params.addSubSection("test")
+    fp.add("source", "camera1")
+    fp.add("feed_type", feed_type)
+    for [key, value] in kwds.items():
+        fp.add(key, value)
+
+    controller = feeds.FeedController(parameters = feed_params, threaded = threaded)
+    feed = controller.getFeed("camera1.test")
+    feed.setCameraFunctionality(cam_fn)
+    return [cam_fn, feed]
+
+def runFeed(cam_fn, feed, n_frames):
+    """
+    Send n_frames frames (frame i is all i) to the feed, returns the
+    list of feed frames.
+    """
+    # The threaded feeds need an event loop.
+    app = test.createApp()
+
+    feed_frames = []
+    stopped = []
+
+    def handleNewFrame(new_frame):
+        feed_frames.append(new_frame.getData().copy())
+
+    feed.newFrame.connect(handleNewFrame)
+    feed.stopped.connect(lambda : stopped.append(True))
+
+    pool = frame.FramePool(n_buffers = 4, n_pixels = 16 * 8)
+    for i in range(n_frames):
+        a_frame = test.createFrame(pool, i, 16, 8, data = i)
+        cam_fn.newFrame.emit(a_frame)
+        a_frame.release()
+    cam_fn.stopped.emit()
+
+    start_time = time.time()
+    while (len(stopped) == 0) and ((time.time() - start_time) < 5.0):
+        app.processEvents()
+        time.sleep(0.001)
+
+    assert(len(stopped) == 1)
+
+    # All the camera frames were released.
+    assert(pool.getNumberFree() == 4)
+    return feed_frames
+
+def test_average():
+    for threaded in [False, True]:
+        [cam_fn, feed] = createFeed("average", threaded = threaded, frames_to_average = 4)
+        feed_frames = runFeed(cam_fn, feed, 9)
+        assert(len(feed_frames) == 2)
+        assert(numpy.all(feed_frames[0] == 1))
+        assert(numpy.all(feed_frames[1] == 5))
+
+def test_interval():
+    [cam_fn, feed] = createFeed("interval", threaded = True, cycle_length = 4, capture_frames = "1,2")
+    feed_frames = runFeed(cam_fn, feed, 8)
+    assert([f[0] for f in feed_frames] == [1, 2, 5, 6])
+
+def test_max_projection():
+    [cam_fn, feed] = createFeed("max_projection", threaded = True, frames_to_project = 3)
+    feed_frames = runFeed(cam_fn, feed, 7)
+    assert([f[0] for f in feed_frames] == [2, 5])
+
+def test_running_median():
+    for threaded in [False, True]:
+        [cam_fn, feed] = createFeed("running_median", threaded = threaded, frames_to_median = 3)
+        feed_frames = runFeed(cam_fn, feed, 7)
+        assert([f[0] for f in feed_frames] == [1, 2, 3, 4, 5])
+
+        # The recent frames are not changed by taking the median.
+        assert([f[0,0] for f in feed.recent_frames] == [6, 4, 5])
+
+def test_slice():
+    [cam_fn, feed] = createFeed("slice", threaded = True, x_start = 5, x_end = 8, y_start = 2, y_end = 3)
+    feed_frames = runFeed(cam_fn, feed, 20)
+    assert(len(feed_frames) == 20)
+    for [i, f] in enumerate(feed_frames):
+        assert(f.size == 8)
+        assert(numpy.all(f == i))
+
+
+if (__name__ == "__main__"):
+    test_average()
+    test_interval()
+    test_max_projection()
+    test_running_median()
+    test_slice()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Tests of the reference counted frame buffer pool.
+"""
+import numpy
+
+import storm_control.hal4000.camera.frame as frame
+
+
+def test_frame_pool_1():
+    """
+    Buffers are only re-used once all references are released.
+    """
+    pool = frame.FramePool(n_buffers = 2, n_pixels = 16)
+
+    b1 = pool.acquire()
+    b2 = pool.acquire()
+    assert(b1.index != b2.index)
+    assert(pool.acquire() is None)
+    assert(pool.misses == 1)
+
+    f1 = frame.Frame(b1.getData(), 0, 4, 4, "camera1", pool_buffer = b1)
+    f1.retain()
+    f1.release()
+    assert(pool.getNumberFree() == 0)
+
+    f1.release()
+    assert(pool.getNumberFree() == 1)
+    assert(pool.acquire() is b1)
+
+def test_frame_pool_2():
+    """
+    Pool buffers are views of the pool memory, no copies.
+    """
+    pool = frame.FramePool(n_buffers = 3, n_pixels = 16)
+
+    b1 = pool.acquire()
+    b1.getData()[:] = 7
+    assert(numpy.all(pool.data[b1.index] == 7))
+    assert(b1.getDataPtr() == pool.data[b1.index].ctypes.data)
+
+def test_frame_no_pool():
+    """
+    Frames that are not from a pool can also be retained / released.
+    """
+    f1 = frame.Frame(numpy.zeros(16, dtype = numpy.uint16), 0, 4, 4, "camera1")
+    f1.retain()
+    f1.release()
+
+def test_latency_counter():
+    lc = frame.LatencyCounter()
+    assert(lc.getMeanMs() == 0.0)
+
+    for latency in [0.001, 0.002, 0.006]:
+        lc.add(latency)
+    assert(abs(lc.getMeanMs() - 3.0) < 1.0e-6)
+    assert(abs(lc.getMaxMs() - 6.0) < 1.0e-6)
+
+
+if (__name__ == "__main__"):
+    test_frame_pool_1()
+    test_frame_pool_2()
+    test_frame_no_pool()
+    test_latency_counter()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Test running HAL without a GUI.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+
+def test_hal_headless_1():
+    halTest(config_xml = "none_headless_config.xml",
+            class_name = "HeadlessTest1",
+            test_module = "storm_control.test.hal.headless_tests")
+
+
+if (__name__ == "__main__"):
+    test_hal_headless_1()
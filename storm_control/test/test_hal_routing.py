@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Test that messages are only sent to the modules that handle them.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+
+def test_hal_routing_1():
+    halTest(config_xml = "none_classic_config.xml",
+            class_name = "RoutingTest1",
+            test_module = "storm_control.test.hal.routing_tests")
+
+
+if (__name__ == "__main__"):
+    test_hal_routing_1()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Tests of initializing the hardware of HAL's modules in parallel.
+"""
+import pytest
+
+from PyQt5 import QtCore
+
+import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.halLib.halStartup as halStartup
+
+import storm_control.test as test
+
+
+def createScheduler(modules):
+    """
+    modules is a list of [name, hardware time (None for no hardware), start after].
+    """
+    test.createApp()
+    scheduler = halStartup.StartupScheduler(qt_settings = QtCore.QSettings("storm-control", "hal4000test"))
+    for [name, hardware_time, start_after] in modules:
+        module_params = params.StormXMLObject()
+        module_params.add("module_name", "storm_control.test.hal.startup_tests")
+        if hardware_time is None:
+            module_params.add("class_name", "FastModule")
+        else:
+            module_params.add("class_name", "SlowModule")
+            module_params.add("hardware_time", hardware_time)
+        module_params.add("start_after", start_after)
+        scheduler.addModule(name, module_params)
+    return scheduler
+
+def createCameraParams(class_name, open_time):
+    module_params = params.StormXMLObject()
+    module_params.add("module_name", "storm_control.hal4000.camera.camera")
+    module_params.add("class_name", "Camera")
+    camera_params = module_params.addSubSection("camera")
+    camera_params.add("module_name", "storm_control.test.hal.startup_tests")
+    camera_params.add("class_name", class_name)
+    camera_params.add("master", True)
+    config = camera_params.addSubSection("parameters")
+    config.add("open_time", open_time)
+    config.add("roll", 1.0)
+    return module_params
+
+def test_startup_1():
+    """
+    Hardware is initialized in parallel.
+    """
+    scheduler = createScheduler([["hal", None, ""],
+                                 ["camera1", 0.3, ""],
+                                 ["camera2", 0.3, ""],
+                                 ["stage", 0.3, ""],
+                                 ["display", None, ""]])
+    modules = scheduler.createModules()
+
+    # Modules are in the order they were added.
+    assert(list(map(lambda x: x[0], modules)) == ["hal", "camera1", "camera2", "stage", "display"])
+
+    # The modules without hardware did not wait for the hardware.
+    modules = dict(modules)
+    assert(modules["display"].created < modules["camera1"].created)
+
+    for name in ["camera1", "camera2", "stage"]:
+        assert(modules[name].hardware["initialized"] < modules[name].created)
+        assert(modules[name].thread() == test.createApp().thread())
+        assert(scheduler.startup_times[name]["hardware ms"] > 250.0)
+
+    # All the hardware started initializing before any of it finished.
+    hardware = [modules[name].hardware for name in ["camera1", "camera2", "stage"]]
+    assert(max(map(lambda x: x["started"], hardware)) < min(map(lambda x: x["initialized"], hardware)))
+
+def test_startup_2():
+    """
+    Dependencies are respected.
+    """
+    scheduler = createScheduler([["hal", None, ""],
+                                 ["camera1", 0.1, "stage"],
+                                 ["display", None, "camera1"],
+                                 ["stage", 0.1, ""]])
+    modules = dict(scheduler.createModules())
+    assert(modules["stage"].created < modules["camera1"].hardware["started"])
+    assert(modules["camera1"].created < modules["display"].created)
+
+def test_startup_3():
+    """
+    Circular and unknown dependencies.
+    """
+    scheduler = createScheduler([["camera1", 0.0, "stage"],
+                                 ["stage", 0.0, "camera1"]])
+    with pytest.raises(halExceptions.HalException):
+        scheduler.createModules()
+
+    scheduler = createScheduler([["camera1", 0.0, "camera2"]])
+    with pytest.raises(halExceptions.HalException):
+        scheduler.createModules()
+
+def test_startup_4():
+    """
+    Hardware initialization errors.
+    """
+    scheduler = createScheduler([["hal", None, ""],
+                                 ["camera1", 0.0, ""]])
+    scheduler.modules[1]["params"].add("fail", True)
+    with pytest.raises(Exception, match = "Hardware not found"):
+        scheduler.createModules()
+
+def test_startup_5():
+    """
+    Cameras are opened in parallel, unless they use the same driver.
+    """
+    scheduler = createScheduler([["hal", None, ""]])
+    scheduler.addModule("camera1", createCameraParams("SlowCameraControl", 0.3))
+    scheduler.addModule("camera2", createCameraParams("SlowCameraControl2", 0.3))
+    scheduler.addModule("camera3", createCameraParams("SlowCameraControl", 0.3))
+    modules = dict(scheduler.createModules())
+
+    opened = {}
+    for name in ["camera1", "camera2", "camera3"]:
+        opened[name] = modules[name].camera_control.camera
+        assert(opened[name]["opened"] < modules[name].camera_control.created)
+        modules[name].cleanUp(None)
+
+    # The two drivers were opened at the same time.
+    assert(opened["camera2"]["started"] < opened["camera1"]["opened"])
+    assert(opened["camera1"]["started"] < opened["camera2"]["opened"])
+
+    # The two cameras with the same driver were not.
+    [first, second] = sorted([opened["camera1"], opened["camera3"]], key = lambda x: x["started"])
+    assert(first["opened"] <= second["started"])
+
+
+if (__name__ == "__main__"):
+    test_startup_1()
+    test_startup_2()
+    test_startup_3()
+    test_startup_4()
+    test_startup_5()
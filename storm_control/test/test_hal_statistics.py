@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""
+Test the message passing statistics.
+"""
+import storm_control.hal4000.halLib.halStatistics as halStatistics
+
+from storm_control.test.hal.standardHalTest import halTest
+
+
+def test_histogram():
+    hist = halStatistics.Histogram()
+    for i in range(99):
+        hist.add(0.0001)
+    hist.add(0.5)
+
+    stats = hist.toDict()
+    assert(stats["count"] == 100)
+    assert(abs(stats["max ms"] - 500.0) < 1.0e-6)
+    assert(stats["p50 ms"] >= 0.1)
+    assert(stats["p50 ms"] < 0.2)
+    assert(stats["p99 ms"] < 0.2)
+
+    # Very long times go in the last bin.
+    hist.add(1.0e6)
+    assert(hist.bins[-1] == 1)
+
+def test_hal_statistics_1():
+    halTest(config_xml = "none_classic_config.xml",
+            class_name = "StatisticsTest1",
+            test_module = "storm_control.test.hal.statistics_tests")
+
+
+if (__name__ == "__main__"):
+    test_histogram()
+    test_hal_statistics_1()
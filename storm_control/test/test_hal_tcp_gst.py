@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+"""
+Message statistics tests.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+def test_hal_gst_1():
+
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "GetStatistics1",
+            test_module = "storm_control.test.hal.tcp_tests")
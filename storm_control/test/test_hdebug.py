@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Tests of hdebug's asynchronous logging.
+"""
+import glob
+import json
+import os
+import threading
+
+import storm_control.sc_library.hdebug as hdebug
+
+import storm_control.test as test
+
+
+def readRecords(filename):
+    with open(filename) as fp:
+        return list(map(json.loads, fp))
+
+def test_async_logger():
+    filename = os.path.join(test.logDirectory(), "hdebug_test_1.jsonl")
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    a_logger = hdebug.AsyncLogger(filename = filename)
+    a_logger.log("handled by,{0},{1},{2}", (10, "camera1", "start film"))
+    a_logger.log("no arguments {0}", ())
+    a_logger.log("bad format {1}", ("a",))
+    a_logger.stop()
+
+    records = readRecords(filename)
+    assert(len(records) == 4)
+    assert("start" in records[0])
+    assert(records[1]["text"] == "handled by,10,camera1,start film")
+    assert(records[1]["args"] == [10, "camera1", "start film"])
+    assert(records[2]["text"] == "no arguments {0}")
+    assert("error" in records[3])
+
+def test_async_logger_rotation():
+    filename = os.path.join(test.logDirectory(), "hdebug_test_2.jsonl")
+    for fname in glob.glob(filename + "*"):
+        os.remove(fname)
+
+    a_logger = hdebug.AsyncLogger(filename = filename, max_bytes = 1000, backup_count = 2)
+    for i in range(200):
+        a_logger.log("record {0}", (i,))
+    a_logger.stop()
+
+    assert(os.path.exists(filename + ".1"))
+    assert(os.path.exists(filename + ".2"))
+    assert(not os.path.exists(filename + ".3"))
+
+    # The last record is in the current file.
+    assert(readRecords(filename)[-1]["text"] == "record 199")
+
+def test_async_logging():
+    """
+    Log from several threads using hdebug.logText().
+    """
+    hdebug.startLogging(test.logDirectory(), "hdebug_test", asynchronous = True)
+    filename = hdebug.a_logger.filename
+
+    def logSome(thread_index):
+        for i in range(1000):
+            hdebug.logText("{0},{1}", thread_index, i)
+
+    threads = [threading.Thread(target = logSome, args = (i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    hdebug.stopLogging()
+
+    records = readRecords(filename)[1:]
+    assert(len(records) == 4000)
+
+    # Records from each thread are in order and the times are monotonic.
+    last = {}
+    last_time = {}
+    for record in records:
+        [thread_index, i] = record["args"]
+        assert(last.get(thread_index, -1) == (i - 1))
+        assert(last_time.get(thread_index, 0.0) <= record["time"])
+        last[thread_index] = i
+        last_time[thread_index] = record["time"]
+
+def test_log_text(capsys):
+    """
+    The old to_console argument and bad format strings.
+    """
+    hdebug.stopLogging()
+    hdebug.logText("old style {0}", True)
+    hdebug.logText("bad format {1}", "a")
+    hdebug.logText("{0},{1}", 1, 2)
+    assert(capsys.readouterr().out.splitlines() == ["old style {0}", "bad format {1} ('a',)", "1,2"])
+
+    hdebug.startLogging(test.logDirectory(), "hdebug_test", asynchronous = True)
+    filename = hdebug.a_logger.filename
+    hdebug.logText("old style", True)
+    hdebug.logText("bad format {1}", "a", to_console = True)
+    hdebug.stopLogging()
+    assert(capsys.readouterr().out.splitlines() == ["old style", "bad format {1} ('a',)"])
+
+    records = readRecords(filename)[1:]
+    assert(records[0]["text"] == "old style")
+    assert(not "args" in records[0])
+    assert("error" in records[1])
+
+
+if (__name__ == "__main__"):
+    test_async_logger()
+    test_async_logger_rotation()
+    test_async_logging()
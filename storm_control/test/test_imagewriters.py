@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Tests of the image writers.
+"""
+import json
+import numpy
+import os
+import pytest
+import tifffile
+import time
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+
+import storm_control.test as test
+
+
+def createCameraFunctionality(x_pixels, y_pixels):
+    p = params.StormXMLObject()
+    p.add(params.ParameterInt(name = "bytes_per_frame", value = 2 * x_pixels * y_pixels))
+    p.add(params.ParameterString(name = "extension", value = ""))
+    p.add(params.ParameterInt(name = "x_pixels", value = x_pixels))
+    p.add(params.ParameterInt(name = "y_pixels", value = y_pixels))
+    return cameraFunctionality.CameraFunctionality(camera_name = "camera1",
+                                                   parameters = p)
+
+def writeMovie(basename, n_frames, filetype = ".dax", **kwds):
+    x_pixels = 64
+    y_pixels = 32
+    cam_fn = createCameraFunctionality(x_pixels, y_pixels)
+    film_settings = filmSettings.FilmSettings(basename = os.path.join(test.dataDirectory(), basename),
+                                              filetype = filetype,
+                                              film_length = n_frames,
+                                              pixel_size = 0.16)
+    writer = imagewriters.createFileWriter(cam_fn, film_settings, **kwds)
+
+    for i in range(n_frames):
+        np_data = numpy.zeros(x_pixels * y_pixels, dtype = numpy.uint16) + i
+        cam_fn.newFrame.emit(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+    cam_fn.stopped.emit()
+
+    while not writer.isStopped():
+        time.sleep(0.01)
+    writer.closeWriter()
+    return writer
+
+def test_dax_writer_sync():
+    writer = writeMovie("writer_sync", 10)
+
+    stats = writer.getStatistics()
+    assert(stats["written"] == 10)
+    assert(stats["dropped"] == 0)
+
+    data = numpy.fromfile(writer.filename, dtype = numpy.uint16)
+    assert(data.size == 10 * 64 * 32)
+
+def test_dax_writer_async():
+    n_frames = 50
+    writer = writeMovie("writer_async", n_frames, queue_depth = 4)
+
+    stats = writer.getStatistics()
+    assert(stats["queued"] == n_frames)
+    assert(stats["written"] == n_frames)
+    assert(stats["dropped"] == 0)
+    assert(stats["max queue depth"] <= 4)
+    assert(stats["write ms"] >= stats["delivery ms"])
+    assert(stats["write max ms"] >= stats["write ms"])
+
+    # Check that the frames were saved in the right order.
+    data = numpy.fromfile(writer.filename, dtype = numpy.uint16).reshape(n_frames, -1)
+    for i in range(n_frames):
+        assert(numpy.all(data[i] == i))
+
+def test_dax_writer_batched():
+    n_frames = 25
+    writer = writeMovie("writer_batched", n_frames, batch_frames = 4, preallocate = True)
+
+    # Preallocated space is removed, and the last partial batch is saved.
+    data = numpy.fromfile(writer.filename, dtype = numpy.uint16).reshape(-1, 64 * 32)
+    assert(data.shape[0] == n_frames)
+    for i in range(n_frames):
+        assert(numpy.all(data[i] == i))
+
+def test_dax_writer_error():
+    """
+    If writing fails in the writer thread the file is still closed
+    before the error is raised.
+    """
+    x_pixels = 64
+    y_pixels = 32
+    cam_fn = createCameraFunctionality(x_pixels, y_pixels)
+    film_settings = filmSettings.FilmSettings(basename = os.path.join(test.dataDirectory(), "writer_error"),
+                                              filetype = ".dax",
+                                              film_length = 5,
+                                              pixel_size = 0.16)
+    writer = imagewriters.createFileWriter(cam_fn, film_settings, queue_depth = 4)
+
+    # Writing to a file that is only open for reading fails.
+    writer.fp.close()
+    writer.fp = open(writer.filename, "rb")
+
+    for i in range(5):
+        np_data = numpy.zeros(x_pixels * y_pixels, dtype = numpy.uint16) + i
+        cam_fn.newFrame.emit(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+    cam_fn.stopped.emit()
+
+    with pytest.raises(imagewriters.ImageWriterException):
+        writer.closeWriter()
+    assert(writer.fp.closed)
+    assert(os.path.exists(writer.basename + ".inf"))
+    assert(len(writer.errors) == 1)
+
+def test_fast_bigtiff_writer():
+    n_frames = 7
+    writer = writeMovie("writer_fast", n_frames, filetype = ".big.tif", fast_bigtiff = True)
+    assert(isinstance(writer, imagewriters.BigTIFFile))
+
+    with tifffile.TiffFile(writer.filename) as tf:
+        assert(tf.is_bigtiff)
+        assert(len(tf.pages) == n_frames)
+        for i in range(n_frames):
+            image = tf.pages[i].asarray()
+            assert(image.shape == (32, 64))
+            assert(numpy.all(image == i))
+
+def test_fast_bigtiff_writer_empty():
+    """
+    A movie with no frames is not a valid TIFF, so the file is removed.
+    """
+    writer = writeMovie("writer_fast_empty", 0, filetype = ".big.tif", fast_bigtiff = True)
+    assert(isinstance(writer, imagewriters.BigTIFFile))
+    assert(not os.path.exists(writer.filename))
+
+def test_zarr_writer():
+    pytest.importorskip("numcodecs")
+    import storm_control.steve.movieReader as movieReader
+
+    n_frames = 11
+    writer = writeMovie("writer_zarr", n_frames, filetype = ".zarr", chunk_frames = 3)
+
+    p = params.StormXMLObject()
+    p.add(params.ParameterInt(name = "test", value = 5))
+    writer.addMetadata(p)
+
+    movie = movieReader.inferReader(writer.filename)
+    assert(movie.filmSize() == [64, 32, n_frames])
+    for i in [10, 0, 4, 5]:
+        assert(numpy.all(movie.loadAFrame(i) == i))
+    assert("parameters" in movie.getAttributes())
+    movie.close()
+
+def test_zarr_reader():
+    """
+    A .zarr movie that was not written by HAL.
+    """
+    numcodecs = pytest.importorskip("numcodecs")
+    import storm_control.steve.movieReader as movieReader
+
+    dirname = os.path.join(test.dataDirectory(), "reader_zarr.zarr")
+    zarray = {"chunks" : [2, 8, 4],
+              "compressor" : {"id" : "zlib", "level" : 1},
+              "dimension_separator" : "/",
+              "dtype" : ">f4",
+              "fill_value" : 3.0,
+              "filters" : [{"id" : "delta", "dtype" : ">f4"}],
+              "order" : "F",
+              "shape" : [5, 8, 4],
+              "zarr_format" : 2}
+    os.makedirs(dirname, exist_ok = True)
+    with open(os.path.join(dirname, ".zarray"), "w") as fp:
+        json.dump(zarray, fp)
+
+    # Chunk 2 (frame 4) is not written, so it is the fill value.
+    movie = numpy.arange(4*8*4, dtype = ">f4").reshape((4, 8, 4))
+    for i in range(2):
+        data = numpy.ravel(movie[2*i:2*i+2], order = "F")
+        data = numcodecs.get_codec(zarray["filters"][0]).encode(data)
+        data = numcodecs.get_codec(zarray["compressor"]).encode(data)
+        os.makedirs(os.path.join(dirname, str(i), "0"), exist_ok = True)
+        with open(os.path.join(dirname, str(i), "0", "0"), "wb") as fp:
+            fp.write(data)
+
+    reader = movieReader.inferReader(dirname)
+    assert(reader.filmSize() == [4, 8, 5])
+    for i in range(4):
+        assert(numpy.array_equal(reader.loadAFrame(i), movie[i]))
+    assert(numpy.all(reader.loadAFrame(4) == 3.0))
+    reader.close()
+
+    # Chunks that split the frames are not supported.
+    zarray["chunks"] = [2, 4, 4]
+    with open(os.path.join(dirname, ".zarray"), "w") as fp:
+        json.dump(zarray, fp)
+    with pytest.raises(IOError):
+        movieReader.inferReader(dirname)
+
+def test_ring_buffer_drop():
+    rb = imagewriters.FrameRingBuffer(depth = 2, drop_policy = "drop", frame_pixels = 16)
+    for i in range(5):
+        rb.put(frame.Frame(numpy.zeros(16, dtype = numpy.uint16) + i, i, 4, 4, "camera1"))
+
+    assert(rb.getCount() == 2)
+    assert(rb.dropped == 3)
+
+    # The oldest frames are kept.
+    [slot, info] = rb.get()
+    assert(info[0] == 0)
+    assert(numpy.all(rb.data[slot] == 0))
+    rb.release()
+
+
+if (__name__ == "__main__"):
+    test_dax_writer_sync()
+    test_dax_writer_async()
+    test_dax_writer_batched()
+    test_dax_writer_error()
+    test_fast_bigtiff_writer()
+    test_fast_bigtiff_writer_empty()
+    test_zarr_writer()
+    test_zarr_reader()
+    test_ring_buffer_drop()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Tests of sc_library.log_analysis.
+"""
+import json
+import os
+
+import storm_control.sc_library.hdebug as hdebug
+import storm_control.sc_library.log_analysis as logAnalysis
+
+import storm_control.test as test
+
+
+def writeJSONLog(basename):
+    """
+    Two messages, the second one has workers in two modules.
+    """
+    events = [[0.000, "queued,1,hal,configure1"],
+              [0.001, "sent,1,hal,configure1"],
+              [0.002, "handled by,1,camera1,configure1"],
+              [0.004, "handled by,1,film,configure1"],
+              [0.005, "processed,1,hal,configure1"],
+              [0.010, "queued,2,film,start film"],
+              [0.020, "sent,2,film,start film"],
+              [0.021, "worker started,2,film,start film,camera1,100"],
+              [0.022, "worker started,2,film,start film,film,0"],
+              [0.030, "worker done,2,film,start film,camera1"],
+              [0.030, "handled by,2,camera1,start film"],
+              [0.040, "worker done,2,film,start film,film"],
+              [0.040, "handled by,2,film,start film"],
+              [0.041, "processed,2,film,start film"],
+              [0.050, "storm_control.hal4000.hal4000.cleanUp started []"],
+              [0.060, "storm_control.hal4000.hal4000.cleanUp ended"]]
+
+    with open(basename + ".jsonl", "w") as fp:
+        fp.write(json.dumps({"time" : 100.0, "start" : 0.0, "pid" : 1}) + "\n")
+        for [r_time, text] in events:
+            fp.write(json.dumps({"time" : 100.0 + r_time, "thread" : 1, "text" : text}) + "\n")
+
+def test_log_analysis_1():
+    basename = os.path.join(test.logDirectory(), "log_analysis_test")
+    writeJSONLog(basename)
+    analysis = logAnalysis.LogAnalysis(basename = basename)
+
+    # The slowest message.
+    [m_id, source, m_type, queued, processing] = analysis.getSlowestMessages(1)[0]
+    assert(m_id == 2)
+    assert(source == "film")
+    assert(abs(queued - 0.010) < 1.0e-6)
+    assert(abs(processing - 0.021) < 1.0e-6)
+
+    # Handling times.
+    stats = analysis.getModuleHandlingTimes()
+    assert(stats[("film", "configure1")]["count"] == 1)
+    assert(abs(stats[("film", "start film")]["max"] - 0.020) < 1.0e-6)
+
+    # Workers.
+    workers = analysis.getWorkers()
+    assert(len(workers) == 2)
+    assert(workers[0][0] == "camera1")
+    [busy, overlap, max_running] = analysis.getWorkerOverlap()
+    assert(abs(busy - 0.019) < 1.0e-6)
+    assert(abs(overlap - 0.008) < 1.0e-6)
+    assert(max_running == 2)
+
+    # Function calls.
+    assert(analysis.query("SELECT name, started FROM calls") == [["storm_control.hal4000.hal4000.cleanUp", 1],
+                                                                 ["storm_control.hal4000.hal4000.cleanUp", 0]])
+
+    # Chrome trace.
+    trace_file = basename + ".json"
+    analysis.chromeTrace(trace_file)
+    with open(trace_file) as fp:
+        trace = json.load(fp)["traceEvents"]
+    assert(len(list(filter(lambda x: (x.get("cat") == "worker"), trace))) == 2)
+    assert(len(list(filter(lambda x: (x.get("cat") == "handled"), trace))) == 4)
+
+    os.remove(basename + ".jsonl")
+    os.remove(trace_file)
+
+def test_log_analysis_2():
+    """
+    Text and JSON lines logs from hdebug.
+    """
+    basename = os.path.join(test.logDirectory(), "log_analysis_test_2")
+    with open(basename + ".out", "w") as fp:
+        fp.write("2026-10-18 12:00:00,998:hal4000:INFO:message:\n")
+        fp.write("2026-10-18 12:00:00,998:hal4000:INFO:  queued,1,hal,configure1\n")
+        fp.write("2026-10-18 12:00:01,003:hal4000:INFO:message:\n")
+        fp.write("2026-10-18 12:00:01,003:hal4000:INFO:  sent,1,hal,configure1\n")
+        fp.write("2026-10-18 12:00:01,010:hal4000:INFO:message:\n")
+        fp.write("2026-10-18 12:00:01,010:hal4000:INFO:  processed,1,hal,configure1\n")
+    analysis = logAnalysis.LogAnalysis(basename = basename)
+    assert(analysis.query("SELECT m_id, source, m_type FROM messages") == [[1, "hal", "configure1"]])
+    [[queued, sent, processed]] = analysis.query("SELECT queued, sent, processed FROM messages")
+    assert(abs(sent - 0.005) < 1.0e-6)
+    assert(abs(processed - 0.012) < 1.0e-6)
+    os.remove(basename + ".out")
+
+    a_logger = hdebug.AsyncLogger(filename = basename + ".jsonl")
+    a_logger.log("{0},{1},{2},{3}", ("queued", 1, "hal", "configure1"))
+    a_logger.log("handled by,{0},{1},{2}", (1, "camera1", "configure1"))
+    a_logger.stop()
+    analysis = logAnalysis.LogAnalysis(basename = basename)
+    assert(analysis.query("SELECT event, module FROM events") == [["queued", "hal"], ["handled by", "camera1"]])
+    os.remove(basename + ".jsonl")
+
+
+if (__name__ == "__main__"):
+    test_log_analysis_1()
+    test_log_analysis_2()
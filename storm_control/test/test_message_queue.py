@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Tests of HalCore's message queue priority lanes.
+"""
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halMessageQueue as halMessageQueue
+
+
+class Source(object):
+    def __init__(self, module_name):
+        self.module_name = module_name
+
+
+def createQueue():
+    halMessage.initializeMessages()
+    for [m_type, lane] in [["test control", "control"],
+                           ["test normal", "normal"],
+                           ["test cosmetic", "cosmetic"]]:
+        halMessage.addMessage(m_type, validator = {"data" : None, "resp" : None}, lane = lane)
+    return halMessageQueue.MessageQueue()
+
+def sendAll(queue):
+    """
+    Empty the queue, returns the list of [source, m_type] in the
+    order in which they would be sent.
+    """
+    sent = []
+    while (len(queue) > 0):
+        message = queue.next()
+        queue.remove(message)
+        sent.append([message.getSourceName(), message.m_type])
+    assert(queue.next() is None)
+    return sent
+
+def test_lanes_1():
+    """
+    Control messages overtake messages from other modules.
+    """
+    queue = createQueue()
+    [display, film] = [Source("display"), Source("film")]
+    for i in range(3):
+        queue.append(halMessage.HalMessage(m_type = "test cosmetic", source = display))
+    queue.append(halMessage.HalMessage(m_type = "test normal", source = display))
+    queue.append(halMessage.HalMessage(m_type = "test control", source = film))
+
+    assert(sendAll(queue) == [["film", "test control"],
+                              ["display", "test cosmetic"],
+                              ["display", "test cosmetic"],
+                              ["display", "test cosmetic"],
+                              ["display", "test normal"]])
+
+def test_lanes_2():
+    """
+    Messages from the same module are sent in order.
+    """
+    queue = createQueue()
+    [camera, film] = [Source("camera1"), Source("film")]
+    queue.append(halMessage.HalMessage(m_type = "test normal", source = film))
+    queue.append(halMessage.SyncMessage(film))
+    queue.append(halMessage.HalMessage(m_type = "test control", source = film))
+    queue.append(halMessage.HalMessage(m_type = "test normal", source = camera))
+    queue.append(halMessage.HalMessage(m_type = "test control", source = camera))
+
+    assert(sendAll(queue) == [["film", "test normal"],
+                              ["film", "sync"],
+                              ["film", "test control"],
+                              ["camera1", "test normal"],
+                              ["camera1", "test control"]])
+
+def test_lanes_3():
+    """
+    Built in lanes.
+    """
+    createQueue()
+    assert(halMessage.getLane("show") == "cosmetic")
+    assert(halMessage.getLane("configure1") == "normal")
+
+
+if (__name__ == "__main__"):
+    test_lanes_1()
+    test_lanes_2()
+    test_lanes_3()
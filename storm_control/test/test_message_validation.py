@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Tests that the compiled message validators find the same
+errors as halMessage.validate().
+"""
+import pytest
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+
+
+class Source(object):
+    module_name = "test"
+
+
+def validateError(validator, data):
+    try:
+        halMessage.validate(validator, data, "base")
+    except halMessage.HalMessageException as exception:
+        return str(exception)
+
+def compiledError(validator, data):
+    error = halMessage.compileValidator(validator)(data)
+    if error is not None:
+        return "base" + error
+
+def test_compiled_validator():
+    validators = [None,
+                  {},
+                  {"name" : [True, str], "extra data" : [False, str]},
+                  {"reset" : [False, bool]},
+                  {"x" : [True, int], "y" : [True, (int, float)], "z" : [False, float]}]
+    datas = [None,
+             {},
+             {"name" : "a"},
+             {"name" : 1},
+             {"name" : "a", "extra data" : "b"},
+             {"extra data" : "b"},
+             {"reset" : True},
+             {"reset" : 1},
+             {"x" : 1, "y" : 2.0},
+             {"x" : 1.0, "y" : 2},
+             {"x" : 1, "y" : 2, "z" : 3},
+             {"x" : 1, "w" : 2},
+             {"w" : 1.0, "x" : "a"}]
+
+    for validator in validators:
+        for data in datas:
+            assert(validateError(validator, data) == compiledError(validator, data))
+
+def test_message_validator():
+    halMessage.initializeMessages()
+    validator = halMessage.message_validators["get functionality"]
+
+    message = halMessage.HalMessage(m_type = "get functionality",
+                                    data = {"name" : "camera1"},
+                                    source = Source())
+    validator.validateData(message)
+
+    message = halMessage.HalMessage(m_type = "get functionality",
+                                    data = {"name" : 1},
+                                    source = Source())
+    with pytest.raises(halMessage.HalMessageException):
+        validator.validateData(message)
+
+    response = halMessage.HalMessageResponse(source = "camera1",
+                                             data = {"functionality" : "camera1"})
+    with pytest.raises(halMessage.HalMessageException):
+        validator.validateResponse(message, response)
+
+    # Validators are created for messages that modules add.
+    halMessage.addMessage("test validation", validator = {"data" : {"values" : [True, list]}, "resp" : None})
+    assert("test validation" in halMessage.message_validators)
+
+def test_sampling():
+    validator = halMessage.MessageValidator({"data" : None, "resp" : None})
+    assert(all(map(lambda x: validator.shouldValidate(0), range(10))))
+
+    validator = halMessage.MessageValidator({"data" : None, "resp" : None})
+    assert(list(map(lambda x: validator.shouldValidate(3), range(5))) == [True, True, True, False, False])
+
+
+if (__name__ == "__main__"):
+    test_compiled_validator()
+    test_message_validator()
+    test_sampling()
@@ -155,6 +155,86 @@ def test_parameters_8():
 
     assert(s1.getSortedAttrs() == ['dd', 'bb', 'aa', 'cc'])
 
+def test_parameters_9():
+    """
+    Copies are copy on write.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    p3 = p2.copy()
+
+    # Nothing has been copied yet.
+    assert(p2._source_ is p1) and (p3._source_ is p1)
+    assert(p1.getVersion() == p2.getVersion())
+    
+    # Changing the original does not change the copies.
+    p1.set("camera1.flip_horizontal", True)
+    assert(p2.get("camera1.flip_horizontal") == False)
+    assert(p3.get("camera1.flip_horizontal") == False)
+    assert(params.difference(p1, p2) == ["camera1.flip_horizontal"])
+
+    # Changing a copy does not change the original, or other copies.
+    p3.set("camera1.exposure_time", 0.1)
+    p3.add("new_param", 10)
+    assert(p1.get("camera1.exposure_time") == 0.01)
+    assert(p2.get("camera1.exposure_time") == 0.01)
+    assert not p1.has("new_param")
+    assert(sorted(params.difference(p3, p2)) == ["camera1.exposure_time", "new_param"])
+
+    # Deleting from a copy.
+    p2.delete("camera1")
+    assert p1.has("camera1") and p3.has("camera1")
+
+def test_parameters_10():
+    """
+    Copies are not changed by references to parameters that were
+    obtained before the copy was made.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    camera1 = p1.get("camera1")
+    flip_horizontal = camera1.getp("flip_horizontal")
+
+    p2 = p1.copy()
+    flip_horizontal.setv(True)
+    camera1.add("test", 5)
+
+    assert(p1.get("camera1.flip_horizontal") == True)
+    assert(p2.get("camera1.flip_horizontal") == False)
+    assert not p2.has("camera1.test")
+    assert(sorted(params.difference(p1, p2)) == ["camera1.flip_horizontal", "camera1.test"])
+
+    # Values are immutable, so list values have to be replaced
+    # and not changed in place.
+    p3 = params.StormXMLObject()
+    p3.add(params.ParameterCustom(name = "list", value = [1, 2]))
+    p4 = p3.copy()
+    p3.set("list", p3.get("list") + [3])
+    assert(p4.get("list") == [1, 2])
+
+def test_parameters_11():
+    """
+    Versions only change when something changes.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    version = p1.getVersion()
+
+    # Setting a parameter to its current value.
+    p1.set("camera1.flip_horizontal", False)
+    assert(p1.getVersion() == version)
+    assert(params.difference(p1, p2) == [])
+
+    # Only the changed section has a new version.
+    camera1_version = p1.get("camera1").getVersion()
+    p2.set("display00.feed_name", "foo")
+    assert(p2.getVersion() != version)
+    assert(p2.get("camera1").getVersion() == camera1_version)
+    assert(params.difference(p2, p1) == ["display00.feed_name"])
+
+    # The same after a round trip through copyParameters().
+    [p3, unrecognized] = params.copyParameters(p1, p1.copy())
+    assert(p3.getVersion() == p1.getVersion())
+
         
 if (__name__ == "__main__"):
     test_parameters_1()
@@ -165,3 +245,6 @@ if (__name__ == "__main__"):
     test_parameters_6()
     test_parameters_7()
     test_parameters_8()
+    test_parameters_9()
+    test_parameters_10()
+    test_parameters_11()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Tests of the spot counter analysis queue.
+"""
+import numpy
+import threading
+import time
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.spotCounter.findSpots as findSpots
+
+import storm_control.test as test
+
+
+def createFrame(pool, frame_number, x_size, y_size):
+    """
+    A frame with a single spot.
+    """
+    data = numpy.zeros(x_size * y_size) + 100
+    data[x_size * 10 + 10] = 1000
+    return test.createFrame(pool, frame_number, x_size, y_size, data = data)
+
+def waitForResults(spot_counter, timeout = 10.0):
+    app = test.createApp()
+    start_time = time.time()
+    while (spot_counter.getStatistics()["queue length"] > 0) and ((time.time() - start_time) < timeout):
+        app.processEvents()
+        time.sleep(0.01)
+    for worker in spot_counter.workers:
+        worker.waitForDone()
+    app.processEvents()
+
+def test_spot_counter_1():
+    """
+    Frames are analyzed in batches, the results are delivered in the main thread.
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 8, n_pixels = 64 * 64)
+    spot_counter = findSpots.SpotCounter(batch_size = 4,
+                                         max_queue = 8,
+                                         max_threads = 1,
+                                         max_size = 64 * 64)
+
+    batches = []
+    threads = []
+    def handleImagesProcessed(frame_analyses):
+        batches.append(frame_analyses)
+        threads.append(threading.current_thread())
+    spot_counter.imagesProcessed.connect(handleImagesProcessed)
+
+    # Keep the worker busy until all the frames have been queued.
+    event = threading.Event()
+    spot_counter.workers[0].submit(event.wait)
+
+    for i in range(8):
+        a_frame = createFrame(pool, i, 64, 64)
+        spot_counter.newFrameToAnalyze("camera1", a_frame, 250)
+        a_frame.release()
+    assert(pool.getNumberFree() == 0)
+    event.set()
+    waitForResults(spot_counter)
+
+    assert([len(batch) for batch in batches] == [4, 4])
+    assert(threads[0] is threading.main_thread())
+    assert([fa.getFrameNumber() for batch in batches for fa in batch] == list(range(8)))
+    assert(batches[0][0].getCounts() == 1)
+    assert(batches[0][0].getLatency() > 0.0)
+
+    stats = spot_counter.getStatistics()
+    assert(stats["analyzed"] == 8)
+    assert(stats["dropped"] == 0)
+    assert(stats["latency"]["count"] == 8)
+    assert(pool.getNumberFree() == 8)
+    spot_counter.cleanUp()
+
+def test_spot_counter_2():
+    """
+    Frame stride, queue overflow and frames that are too large.
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 16, n_pixels = 64 * 64)
+    spot_counter = findSpots.SpotCounter(batch_size = 2,
+                                         frame_stride = 2,
+                                         max_queue = 3,
+                                         max_threads = 1,
+                                         max_size = 64 * 32)
+
+    frame_numbers = []
+    def handleImagesProcessed(frame_analyses):
+        frame_numbers.extend([fa.getFrameNumber() for fa in frame_analyses])
+    spot_counter.imagesProcessed.connect(handleImagesProcessed)
+
+    event = threading.Event()
+    spot_counter.workers[0].submit(event.wait)
+
+    # Only even frames are queued, and only the newest 3 of these are kept.
+    for i in range(10):
+        a_frame = createFrame(pool, i, 32, 64)
+        spot_counter.newFrameToAnalyze("camera1", a_frame, 250)
+        a_frame.release()
+    assert(pool.getNumberFree() == 13)
+
+    a_frame = createFrame(pool, 10, 64, 64)
+    spot_counter.newFrameToAnalyze("camera1", a_frame, 250)
+    a_frame.release()
+
+    event.set()
+    waitForResults(spot_counter)
+
+    assert(frame_numbers == [4, 6, 8])
+    stats = spot_counter.getStatistics()
+    assert(stats["analyzed"] == 3)
+    assert(stats["dropped"] == 2)
+    assert(stats["skipped"] == 5)
+    assert(stats["too large"] == 1)
+    assert(stats["total"] == 11)
+    assert(pool.getNumberFree() == 16)
+
+    spot_counter.resetStatistics()
+    assert(spot_counter.getStatistics()["total"] == 0)
+    spot_counter.cleanUp()
+
+def test_spot_counter_3():
+    """
+    An analysis error does not stop the analysis of the frames that
+    are still in the queue.
+    """
+    test.createApp()
+    pool = frame.FramePool(n_buffers = 4, n_pixels = 64 * 64)
+    spot_counter = findSpots.SpotCounter(batch_size = 1,
+                                         max_queue = 4,
+                                         max_threads = 1,
+                                         max_size = 64 * 64)
+
+    frame_numbers = []
+    def handleImagesProcessed(frame_analyses):
+        frame_numbers.extend([fa.getFrameNumber() for fa in frame_analyses])
+    spot_counter.imagesProcessed.connect(handleImagesProcessed)
+
+    event = threading.Event()
+    spot_counter.workers[0].submit(event.wait)
+
+    # The first frame has an invalid threshold.
+    for i in range(4):
+        a_frame = createFrame(pool, i, 64, 64)
+        spot_counter.newFrameToAnalyze("camera1", a_frame, None if (i == 0) else 250)
+        a_frame.release()
+
+    event.set()
+    waitForResults(spot_counter)
+
+    assert(frame_numbers == [1, 2, 3])
+    assert(spot_counter.getStatistics()["analyzed"] == 3)
+    assert(pool.getNumberFree() == 4)
+    spot_counter.cleanUp()
+
+
+if (__name__ == "__main__"):
+    test_spot_counter_1()
+    test_spot_counter_2()
+    test_spot_counter_3()
@@ -2,11 +2,13 @@
 """
 Steve tests.
 """
+import os
 import pytestqt
 
 import storm_control.sc_library.hdebug as hdebug
 import storm_control.sc_library.parameters as params
 
+import storm_control.steve.qtRegexFileDialog as qtRegexFileDialog
 import storm_control.steve.steve as steve
 
 import storm_control.test as test
@@ -30,3 +32,17 @@ def test_steve_hal(qtbot):
     hal.stop()
     
 
+def test_steve_zarr_dialog(qtbot):
+    """
+    .zarr movies are directories, but they can be selected like files.
+    """
+    dirname = os.path.join(test.dataDirectory(), "dialog_zarr.zarr")
+    os.makedirs(dirname, exist_ok = True)
+
+    dialog = qtRegexFileDialog.QRegexFileDialog(directory = test.dataDirectory(),
+                                                dir_extensions = [".zarr"],
+                                                extensions = ["*.dax"])
+    qtbot.addWidget(dialog)
+    dialog.fdialog.selectFile("dialog_zarr.zarr")
+    dialog.fdialog.accept()
+    assert(dialog.getSelectedFiles()[0] == [dirname])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Tests of the synthetic (high-rate emulation) camera.
+"""
+import numpy
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.syntheticCameraControl as syntheticCameraControl
+
+
+def test_frame_bank_1():
+    """
+    The frame bank is the same for the same seed.
+    """
+    b1 = syntheticCameraControl.renderFrameBank(64, 32, n_frames = 3, seed = 1)
+    b2 = syntheticCameraControl.renderFrameBank(64, 32, n_frames = 3, seed = 1)
+    b3 = syntheticCameraControl.renderFrameBank(64, 32, n_frames = 3, seed = 2)
+
+    assert(b1.shape == (3, 64 * 32))
+    assert(b1.dtype == numpy.uint16)
+    assert(numpy.array_equal(b1, b2))
+    assert(not numpy.array_equal(b1, b3))
+
+def test_frame_bank_2():
+    """
+    The emitters are brighter than the background, and they move.
+    """
+    bank = syntheticCameraControl.renderFrameBank(128, 128,
+                                                  n_frames = 2,
+                                                  n_emitters = 10,
+                                                  intensity = 20000.0,
+                                                  velocity = 5.0)
+    assert(numpy.max(bank) > 500)
+    assert(abs(numpy.median(bank) - 100) < 5)
+    assert(numpy.argmax(bank[0]) != numpy.argmax(bank[1]))
+
+def test_synthetic_camera():
+    config = params.StormXMLObject()
+    config.add(params.ParameterInt(name = "bank_size", value = 3))
+    config.add(params.ParameterInt(name = "chip_size", value = 256))
+    config.add(params.ParameterFloat(name = "roll", value = 1.0))
+    camera = syntheticCameraControl.SyntheticCameraControl(camera_name = "camera1",
+                                                          config = config)
+
+    p = camera.getParameters()
+    assert(p.get("x_pixels") == 256)
+    assert(p.get("bytes_per_frame") == 2 * 256 * 256)
+    assert(camera.frame_bank.shape == (3, 256 * 256))
+
+    # Exposure times below the none camera minimum are allowed.
+    p = p.copy()
+    p.set("exposure_time", 0.002)
+    camera.newParameters(p)
+    assert(camera.getParameters().get("exposure_time") == 0.002)
+    assert(camera.getParameters().get("fps") == 500.0)
+
+
+if (__name__ == "__main__"):
+    test_frame_bank_1()
+    test_frame_bank_2()
+    test_synthetic_camera()